@@ -0,0 +1,102 @@
+"""
+Fleet lookup benchmark.
+
+Provisions fleets of increasing size and measures robot-scoped status reads
+and command requests through the ASGI app. Latency should stay flat as the
+fleet grows because every request is a unique index lookup on robot_id.
+
+    python -m benchmarks.bench_fleet --sizes 10 1000 10000
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections.abc import AsyncIterator, Callable
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.main import app
+from src.models.database import Base
+from src.services.database import get_db, get_read_db
+from src.services.robot_state import provision_robots
+
+
+def session_dependency(session_factory: async_sessionmaker) -> Callable:
+    async def override_get_db() -> AsyncIterator[AsyncSession]:
+        async with session_factory() as session:
+            yield session
+
+    return override_get_db
+
+
+async def time_requests(client: AsyncClient, fleet_size: int, requests: int) -> dict:
+    rng = random.Random(fleet_size)
+    status_times = []
+    command_times = []
+    for _ in range(requests):
+        robot_id = f"robot-{rng.randrange(fleet_size)}"
+
+        started = time.perf_counter()
+        response = await client.get(f"/api/v1/robots/{robot_id}/status")
+        status_times.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+        started = time.perf_counter()
+        response = await client.post(
+            f"/api/v1/robots/{robot_id}/commands", json={"command": "FRFL"}
+        )
+        command_times.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+    return {
+        "status_ms": statistics.median(status_times) * 1000,
+        "commands_ms": statistics.median(command_times) * 1000,
+    }
+
+
+async def run(sizes: list[int], requests: int) -> None:
+    print(f"{'robots':>8} {'status p50 ms':>14} {'commands p50 ms':>16}")
+    for fleet_size in sizes:
+        engine = create_async_engine(
+            "sqlite+aiosqlite:///:memory:", poolclass=StaticPool
+        )
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with session_factory() as session:
+            await provision_robots(
+                session, [{"robot_id": f"robot-{i}"} for i in range(fleet_size)]
+            )
+            await session.commit()
+
+        app.dependency_overrides[get_db] = session_dependency(session_factory)
+        app.dependency_overrides[get_read_db] = app.dependency_overrides[get_db]
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            result = await time_requests(client, fleet_size, requests)
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+        print(
+            f"{fleet_size:>8} {result['status_ms']:>14.3f} "
+            + f"{result['commands_ms']:>16.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.sizes, args.requests))
+
+
+if __name__ == "__main__":
+    main()
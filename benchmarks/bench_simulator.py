@@ -0,0 +1,93 @@
+"""
+Batch simulator benchmark.
+
+Simulates many random command strings from one start state with the
+vectorized batch simulator and with RobotCommandExecutor in a Python loop,
+checks that every result matches, and reports both timings.
+
+    python -m benchmarks.bench_simulator --strings 1000 10000 --length 100
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+from src.models.robot import Direction, Position, Robot
+from src.services.batch_simulator import simulate_batch
+from src.services.robot_service import RobotCommandExecutor
+
+
+def random_commands(rng: random.Random, strings: int, length: int) -> list[str]:
+    return ["".join(rng.choices("FFBLR", k=length)) for _ in range(strings)]
+
+
+def random_obstacles(rng: random.Random, count: int, extent: int) -> set[Position]:
+    return {
+        Position(rng.randint(-extent, extent), rng.randint(-extent, extent))
+        for _ in range(count)
+    }
+
+
+def best_of(repeat: int, func: Callable[[], Any]) -> tuple[float, Any]:
+    """Fastest of repeat runs in seconds, after one warm-up run"""
+    result = func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def compare(
+    commands: list[str], obstacles: set[Position], repeat: int
+) -> tuple[float, float]:
+    """Best executor and vectorized timings, after checking the results match"""
+    executor_seconds, expected = best_of(
+        repeat,
+        lambda: [
+            RobotCommandExecutor.execute_commands(
+                Robot((0, 0), Direction.NORTH), command, obstacles
+            )
+            for command in commands
+        ],
+    )
+    vectorized_seconds, result = best_of(
+        repeat, lambda: simulate_batch(commands, (0, 0), Direction.NORTH, obstacles)
+    )
+    if result.to_results() != expected:
+        raise SystemExit("Vectorized results differ from RobotCommandExecutor")
+    return executor_seconds, vectorized_seconds
+
+
+def run(sizes: list[int], length: int, obstacle_count: int, repeat: int) -> None:
+    print(
+        f"{'strings':>8} {'length':>7} {'executor ms':>12} "
+        + f"{'vectorized ms':>14} {'speedup':>8}"
+    )
+    for strings in sizes:
+        rng = random.Random(strings)
+        commands = random_commands(rng, strings, length)
+        obstacles = random_obstacles(rng, obstacle_count, extent=length // 4 + 1)
+        executor_seconds, vectorized_seconds = compare(commands, obstacles, repeat)
+        print(
+            f"{strings:>8} {length:>7} {executor_seconds * 1000:>12.1f} "
+            + f"{vectorized_seconds * 1000:>14.1f} "
+            + f"{executor_seconds / vectorized_seconds:>7.1f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--strings", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--length", type=int, default=100)
+    parser.add_argument("--obstacles", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.strings, args.length, args.obstacles, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Startup benchmark.
+
+Starts the API with uvicorn in a fresh process against a SQLite file and
+measures the time from launch until the first GET /api/v1/status succeeds,
+plus the time to import src.main on its own. The first run starts against an
+empty database, so it includes creating the schema; the others find the
+schema version recorded and only check it.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+PORT = 8765
+
+
+def time_import(env: dict[str, str]) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import src.main"], env=env, check=True)
+    return time.perf_counter() - started
+
+
+def time_first_request(env: dict[str, str], port: int, timeout: float) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/api/v1/status")
+            except httpx.TransportError:
+                time.sleep(0.005)
+                continue
+            response.raise_for_status()
+            return time.perf_counter() - started
+        raise RuntimeError(f"No response within {timeout} seconds")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite+aiosqlite:///{Path(directory) / 'startup.db'}",
+        )
+        imports = [time_import(env) for _ in range(args.runs)]
+        first_requests = [
+            time_first_request(env, args.port, args.timeout) for _ in range(args.runs)
+        ]
+
+    print(f"{'measurement':<40} {'ms':>8}")
+    print(f"{'import src.main (median)':<40} {statistics.median(imports) * 1000:>8.0f}")
+    print(f"{'first request, empty database':<40} {first_requests[0] * 1000:>8.0f}")
+    if len(first_requests) > 1:
+        warm = statistics.median(first_requests[1:])
+        print(f"{'first request, schema recorded (median)':<40} {warm * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
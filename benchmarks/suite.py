@@ -0,0 +1,402 @@
+"""
+Benchmark suite.
+
+Measures throughput at four layers and writes the results as JSON:
+
+- robot: Robot moves and rotations
+- executor: execute_commands across command lengths and obstacle densities
+- processor: CommandProcessor.process_commands against aiosqlite
+- planner: plan_path across 100k obstacles, near and far
+- http: /commands, /commands/simulate and /status through the ASGI app
+
+plus the cost of one metrics observation, which every request pays several
+times.
+
+With a baseline file every result is compared by name, and the run fails
+when any result is slower than the baseline by more than the threshold.
+
+    python -m benchmarks.suite --output bench-results.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.2
+    python -m benchmarks.suite --quick --baseline benchmarks/baseline-quick.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import platform
+import random
+import sys
+import time
+import timeit
+from collections.abc import Awaitable, Callable
+from collections.abc import Set as AbstractSet
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.bench_fleet import session_dependency
+from src.main import app
+from src.models.database import Base, Obstacle
+from src.models.robot import Direction, Position, Robot
+from src.services.command_processor import CommandProcessor
+from src.services.database import get_db, get_read_db
+from src.services.metrics import Histogram
+from src.services.obstacle_cache import ObstacleCache
+from src.services.obstacle_index import ObstacleIndex
+from src.services.path_planner import plan_path
+from src.services.robot_service import (
+    COMMAND_EXECUTORS,
+    RobotCommandExecutor,
+    SegmentCommandExecutor,
+)
+from src.services.robot_state import provision_robots
+from src.services.state_cache import state_cache
+from src.settings import settings
+
+COMMAND_LENGTHS = (10, 100, 1000)
+OBSTACLE_DENSITIES = (0.0, 0.01, 0.05)
+
+
+@dataclass
+class Result:
+    name: str
+    layer: str
+    ops_per_sec: float
+    seconds_per_op: float
+    iterations: int
+
+
+def measure(name: str, layer: str, func: Callable[[], Any], repeat: int) -> Result:
+    """Best of repeat timed batches, each sized to run for about 0.2 seconds"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat, number)) / number
+    return Result(name, layer, 1 / seconds, seconds, number * repeat)
+
+
+async def measure_async(
+    name: str,
+    layer: str,
+    func: Callable[[], Awaitable[Any]],
+    number: int,
+    repeat: int,
+) -> Result:
+    """Best of repeat timed batches of number awaited calls, after a warm-up"""
+    await func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            await func()
+        timings.append((time.perf_counter() - started) / number)
+    seconds = min(timings)
+    return Result(name, layer, 1 / seconds, seconds, number * repeat)
+
+
+def random_commands(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices("FFBLR", k=length))
+
+
+def random_obstacles(rng: random.Random, length: int, density: float) -> set[Position]:
+    """Obstacles covering density of the box a random walk of length stays in"""
+    extent = math.isqrt(length) + 2
+    count = round(density * (2 * extent + 1) ** 2)
+    return {
+        Position(rng.randint(-extent, extent), rng.randint(-extent, extent))
+        for _ in range(count)
+    } - {Position(0, 0)}
+
+
+def robot_benchmarks(repeat: int) -> list[Result]:
+    robot = Robot((0, 0), Direction.NORTH)
+    return [
+        measure("robot.move_forward", "robot", robot.move_forward, repeat),
+        measure("robot.move_backward", "robot", robot.move_backward, repeat),
+        measure("robot.rotate_right", "robot", robot.rotate_right, repeat),
+        measure(
+            "robot.process_command", "robot", lambda: robot.process_command("F"), repeat
+        ),
+    ]
+
+
+def metrics_benchmarks(repeat: int) -> list[Result]:
+    histogram = Histogram("bench_seconds", "Benchmark", labelnames=("route",))
+    return [
+        measure(
+            "metrics.histogram_observe",
+            "metrics",
+            lambda: histogram.observe(0.0012, ("/api/v1/status",)),
+            repeat,
+        )
+    ]
+
+
+def execute(
+    executor: type[RobotCommandExecutor],
+    commands: str,
+    obstacles: AbstractSet[Position],
+) -> Callable[[], Any]:
+    return lambda: executor.execute_commands(
+        Robot((0, 0), Direction.NORTH), commands, obstacles
+    )
+
+
+def executor_benchmarks(repeat: int, lengths: tuple[int, ...]) -> list[Result]:
+    results = []
+    for executor_name, executor in COMMAND_EXECUTORS.items():
+        # Every length for the reference executor, the longest for the others
+        for length in lengths if executor_name == "stepwise" else lengths[-1:]:
+            for density in OBSTACLE_DENSITIES:
+                rng = random.Random(length)
+                commands = random_commands(rng, length)
+                obstacles: AbstractSet[Position] = random_obstacles(
+                    rng, length, density
+                )
+                if issubclass(executor, SegmentCommandExecutor):
+                    # Built once, as CommandProcessor and the obstacle cache do
+                    obstacles = ObstacleIndex(obstacles)
+                results.append(
+                    measure(
+                        f"executor.{executor_name}[length={length},"
+                        + f"density={density}]",
+                        "executor",
+                        execute(executor, commands, obstacles),
+                        repeat,
+                    )
+                )
+    return results
+
+
+def planner_benchmarks(repeat: int) -> list[Result]:
+    # 100k obstacles over about 1% of a square 3201 cells wide
+    rng = random.Random(0)
+    obstacles = ObstacleIndex(
+        (rng.randint(-1600, 1600), rng.randint(-1600, 1600)) for _ in range(100_000)
+    )
+    results = []
+    for target in ((50, 80), (400, -300)):
+        obstacles.discard(0, 0)
+        obstacles.discard(*target)
+        results.append(
+            measure(
+                f"planner.plan_path[obstacles=100000,target={target[0]},{target[1]}]",
+                "planner",
+                lambda target=target: plan_path(
+                    obstacles,
+                    (0, 0),
+                    Direction.NORTH,
+                    target,
+                    settings.PLANNER_MAX_EXPANSIONS,
+                    settings.PLANNER_MAX_SECONDS,
+                    settings.PLANNER_FALLBACK_WEIGHT,
+                ),
+                repeat,
+            )
+        )
+    return results
+
+
+async def processor_benchmarks(number: int, repeat: int) -> list[Result]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(0)
+    length = 100
+    commands = random_commands(rng, length)
+    obstacles = random_obstacles(rng, length, 0.05)
+    results = []
+    async with session_factory() as session:
+        await session.execute(
+            insert(Obstacle),
+            [{"position_x": x, "position_y": y} for x, y in obstacles],
+        )
+        await session.commit()
+
+        for cached in (False, True):
+            processor = CommandProcessor(
+                session,
+                executor=COMMAND_EXECUTORS["stepwise"](),
+                obstacle_cache=ObstacleCache() if cached else None,
+            )
+            results.append(
+                await measure_async(
+                    f"processor.process_commands[length={length},"
+                    + f"obstacles={len(obstacles)},cache={'on' if cached else 'off'}]",
+                    "processor",
+                    lambda processor=processor: processor.process_commands(
+                        commands, (0, 0), Direction.NORTH
+                    ),
+                    number,
+                    repeat,
+                )
+            )
+    await engine.dispose()
+    return results
+
+
+async def http_benchmarks(number: int, repeat: int, fleet_size: int) -> list[Result]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as session:
+        await provision_robots(
+            session, [{"robot_id": f"robot-{i}"} for i in range(fleet_size)]
+        )
+        await session.commit()
+    state_cache.invalidate()
+
+    rng = random.Random(fleet_size)
+    app.dependency_overrides[get_db] = session_dependency(session_factory)
+    app.dependency_overrides[get_read_db] = app.dependency_overrides[get_db]
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+
+            async def request(method: str, url: str, **kwargs: Any) -> None:
+                response = await client.request(method, url, **kwargs)
+                response.raise_for_status()
+
+            return [
+                await measure_async(
+                    "http.post_commands",
+                    "http",
+                    lambda: request(
+                        "POST", "/api/v1/commands", json={"command": "FRFL"}
+                    ),
+                    number,
+                    repeat,
+                ),
+                await measure_async(
+                    "http.post_simulate",
+                    "http",
+                    lambda: request(
+                        "POST", "/api/v1/commands/simulate", json={"command": "FRFL"}
+                    ),
+                    number,
+                    repeat,
+                ),
+                await measure_async(
+                    "http.get_status",
+                    "http",
+                    lambda: request("GET", "/api/v1/status"),
+                    number,
+                    repeat,
+                ),
+                await measure_async(
+                    f"http.get_robot_status[fleet={fleet_size}]",
+                    "http",
+                    lambda: request(
+                        "GET",
+                        f"/api/v1/robots/robot-{rng.randrange(fleet_size)}/status",
+                    ),
+                    number,
+                    repeat,
+                ),
+            ]
+    finally:
+        app.dependency_overrides.clear()
+        state_cache.invalidate()
+        await engine.dispose()
+
+
+def find_regressions(
+    results: list[Result], baseline: dict[str, Any], threshold: float
+) -> list[tuple[Result, float]]:
+    """Results slower than their baseline by more than threshold, with ratios"""
+    reference = {item["name"]: item["ops_per_sec"] for item in baseline["results"]}
+    regressions = []
+    for result in results:
+        expected = reference.get(result.name)
+        if expected and result.ops_per_sec < expected * (1 - threshold):
+            regressions.append((result, result.ops_per_sec / expected))
+    return regressions
+
+
+def report(results: list[Result], baseline: dict[str, Any] | None) -> None:
+    reference = (
+        {item["name"]: item["ops_per_sec"] for item in baseline["results"]}
+        if baseline
+        else {}
+    )
+    print(f"{'benchmark':<58} {'ops/s':>12} {'us/op':>10} {'vs base':>8}")
+    for result in results:
+        expected = reference.get(result.name)
+        change = f"{result.ops_per_sec / expected - 1:>+7.0%}" if expected else ""
+        print(
+            f"{result.name:<58} {result.ops_per_sec:>12,.0f} "
+            + f"{result.seconds_per_op * 1e6:>10.1f} {change:>8}"
+        )
+
+
+async def run_all(quick: bool) -> list[Result]:
+    repeat = 2 if quick else 5
+    number = 20 if quick else 200
+    lengths = COMMAND_LENGTHS[:2] if quick else COMMAND_LENGTHS
+    return [
+        *robot_benchmarks(repeat),
+        *metrics_benchmarks(repeat),
+        *executor_benchmarks(repeat, lengths),
+        *planner_benchmarks(repeat),
+        *await processor_benchmarks(number, repeat),
+        *await http_benchmarks(number, repeat, fleet_size=100 if quick else 1000),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", type=Path, default=Path("bench-results.json"))
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Largest accepted slowdown against the baseline, as a fraction",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Fewer and shorter runs, for CI smoke"
+    )
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    results = asyncio.run(run_all(args.quick))
+    document = {
+        "meta": {
+            "created_at": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": [asdict(result) for result in results],
+    }
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            path.write_text(json.dumps(document, indent=2) + "\n")
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    report(results, baseline)
+    if baseline is None:
+        return
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for result, ratio in regressions:
+        print(f"REGRESSION {result.name}: {ratio:.0%} of baseline throughput")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import time
+
+from fastapi import APIRouter, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import CONTENT_TYPE, http_request_duration, registry
+
+router = APIRouter()
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The path template of the route that handled a request. FastAPI versions
+    that include routers lazily keep the local route in scope["route"] and
+    the prefixed template in their effective route context; older versions
+    copy routes with the prefix applied, so their path is already complete.
+    """
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request into http_request_duration_seconds, labelled
+    with the matched route template rather than the raw path so robot ids
+    do not create new series. A plain ASGI middleware, so the cost is one
+    wrapped send and one histogram observation per request.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                (scope["method"], route_template(scope), str(status)),
+            )
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """All metrics of this process in the Prometheus text format"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
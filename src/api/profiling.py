@@ -0,0 +1,53 @@
+import re
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.v1.endpoints.admin import is_admin_token
+from src.services.profiling import RequestProfiler, parse_profile_kinds, profiler
+from src.settings import settings
+
+# Requests on these paths may be sampled; any request may ask for a profile
+SAMPLED_PATH = re.compile(rf"{re.escape(settings.API_V1_STR)}(/robots/[^/]+)?/commands")
+
+
+class ProfilingMiddleware:
+    """
+    Runs a request under the request profiler when it sends X-Profile with
+    a valid X-Admin-Token, or when a request to /commands or
+    /robots/{id}/commands (not their sub-routes) is sampled. A requested
+    profile's id is returned in X-Profile-Id and the profile is available
+    from /admin/profiles/{id}. While profiling is disabled the only cost is
+    one attribute check.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler = profiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        requested: tuple[str, ...] = ()
+        if "x-profile" in headers and is_admin_token(headers.get("x-admin-token")):
+            requested = parse_profile_kinds(headers["x-profile"])
+        kinds, sampled = self.profiler.choose(
+            requested, sampleable=SAMPLED_PATH.fullmatch(scope["path"]) is not None
+        )
+        capture = self.profiler.start(kinds) if kinds else None
+        if capture is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start" and not sampled:
+                MutableHeaders(scope=message)["X-Profile-Id"] = capture.id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            self.profiler.finish(capture, scope["method"], scope["path"], sampled)
@@ -0,0 +1,72 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services import database
+from src.settings import settings
+
+LAST_WRITE_COOKIE = "last_write"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# POST routes that never write, so they do not count as a write
+READ_ONLY_PATH_SUFFIXES = ("/commands/simulate", "/commands/plan")
+
+
+def wrote_recently(cookie: str | None, now: float) -> bool:
+    """Whether a last_write cookie value lies within READ_YOUR_WRITES_WINDOW"""
+    if cookie is None:
+        return False
+    try:
+        return now - float(cookie) < settings.READ_YOUR_WRITES_WINDOW
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """
+    Keeps a client's reads on the primary right after it wrote, so it never
+    reads its own write back from a lagging replica. A successful request
+    with an unsafe method, other than the read-only simulate and plan routes, sets a
+    last_write cookie holding the time of the write; requests that send a
+    recent one have get_read_db use the primary.
+    Does nothing while no read replica is configured.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or database.ReadSessionLocal is None:
+            await self.app(scope, receive, send)
+            return
+
+        now = time.time()
+        cookie = None
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie = cookie_parser(value.decode("latin-1")).get(LAST_WRITE_COOKIE)
+                break
+        token = database.read_from_primary.set(wrote_recently(cookie, now))
+        is_write = scope["method"] not in SAFE_METHODS and not scope["path"].endswith(
+            READ_ONLY_PATH_SUFFIXES
+        )
+
+        async def send_with_cookie(message: Message) -> None:
+            if (
+                is_write
+                and message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                max_age = max(1, round(settings.READ_YOUR_WRITES_WINDOW))
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{LAST_WRITE_COOKIE}={time.time():.3f}; Max-Age={max_age}; "
+                    + "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            database.read_from_primary.reset(token)
@@ -0,0 +1,142 @@
+import secrets
+from typing import Annotated, Any, Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+
+from src.services import database
+from src.services.pool import pool_status
+from src.services.profiling import profiler
+from src.settings import settings
+
+
+def is_admin_token(token: str | None) -> bool:
+    """Whether token matches ADMIN_TOKEN; always False while it is unset"""
+    if not settings.ADMIN_TOKEN or token is None:
+        return False
+    return secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+async def require_admin(
+    x_admin_token: Annotated[str | None, Header()] = None,
+) -> None:
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+class ProfilingUpdate(BaseModel):
+    enabled: bool | None = None
+    sample_rate: float | None = Field(None, ge=0.0, le=1.0)
+
+
+@router.get("/profiling")
+async def get_profiling() -> dict[str, Any]:
+    """
+    Profiler state: whether it is enabled, the sample rate, and how many
+    profiles are kept, were sampled and were skipped while another ran.
+    """
+    return profiler.stats()
+
+
+@router.put("/profiling")
+async def update_profiling(update: ProfilingUpdate) -> dict[str, Any]:
+    """
+    Turn profiling on or off and change the sample rate of this process
+    without a restart.
+    """
+    if update.enabled is not None:
+        profiler.enabled = update.enabled
+    if update.sample_rate is not None:
+        profiler.sample_rate = update.sample_rate
+    return profiler.stats()
+
+
+@router.get("/profiles")
+async def list_profiles() -> list[dict[str, Any]]:
+    """
+    Profiles of requests that asked for one with X-Profile, newest first.
+    """
+    return [profile.summary() for profile in profiler.profiles()]
+
+
+@router.get("/profiles/aggregate")
+async def get_aggregate_profile(
+    pattern: Annotated[str | None, Query(max_length=200)] = None,
+) -> Response:
+    """
+    Cumulative CPU profile of all sampled requests, optionally restricted to
+    functions whose file or name matches the regular expression pattern
+    (for example robot_service or sqlalchemy).
+    """
+    report = profiler.aggregate_report(pattern)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No requests sampled yet")
+    return Response(report, media_type="text/plain")
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    fmt: Annotated[Literal["text", "pstats"], Query(alias="format")] = "text",
+) -> Response:
+    """
+    One profile as a readable report of its CPU and memory profiles, or the
+    raw CPU profile (format=pstats) for pstats or snakeviz.
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if fmt == "pstats":
+        if profile.cpu_stats is None:
+            raise HTTPException(status_code=404, detail="No CPU profile recorded")
+        return Response(
+            profile.cpu_stats,
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f'attachment; filename="{profile.id}.prof"'
+            },
+        )
+
+    sections = [f"{profile.method} {profile.path} in {profile.duration * 1000:.3f} ms"]
+    if profile.cpu_report is not None:
+        sections.append(profile.cpu_report)
+    if profile.memory_report is not None:
+        sections.append(
+            f"Peak traced memory: {profile.peak_memory} bytes\n" + profile.memory_report
+        )
+    return Response("\n\n".join(sections) + "\n", media_type="text/plain")
+
+
+@router.delete("/profiles", status_code=204)
+async def clear_profiles() -> Response:
+    """
+    Drop every kept profile and the sampled aggregate.
+    """
+    profiler.clear()
+    return Response(status_code=204)
+
+
+@router.get("/pool")
+async def get_pool() -> dict[str, Any]:
+    """
+    Live state of the database connection pools: connections checked out and
+    idle, overflow in use, checkout count, timeouts and wait times since
+    start, per engine, and the adaptive concurrency limit when it is enabled.
+    """
+    limiter = database.concurrency_limiter
+    read_engine = database.read_engine
+    return {
+        "pools": {
+            "primary": pool_status(database.engine.pool),
+            "replica": pool_status(read_engine.pool) if read_engine else None,
+        },
+        "pre_ping": settings.DB_POOL_PRE_PING,
+        "recycle_seconds": settings.DB_POOL_RECYCLE,
+        "concurrency": limiter.stats() if limiter is not None else None,
+    }
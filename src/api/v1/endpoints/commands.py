@@ -1,108 +1,792 @@
+import json
 import logging
-from typing import Annotated
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable, Iterator
+from typing import Annotated, Any, Literal, TypeVar
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from sqlalchemy.orm.exc import StaleDataError
 
+from src.api.v1.endpoints.robots import Coordinates
 from src.models.database import CommandHistory, RobotState
-from src.models.robot import Direction, Robot
+from src.models.robot import Direction, Position, Robot
+from src.services import metrics
+from src.services.command_history import history_values, new_recorder
 from src.services.command_processor import CommandProcessor
-from src.services.database import get_db
+from src.services.command_upload import (
+    CommandArchive,
+    CommandUploadError,
+    iter_command_chunks,
+)
+from src.services.database import get_db, get_read_db, primary_session_for
+from src.services.history_writer import HistoryWriter, get_history_writer
+from src.services.idempotency import (
+    IdempotencyKeyMismatchError,
+    IdempotentRequest,
+    ResponseBody,
+    idempotency_store,
+    request_fingerprint,
+)
+from src.services.obstacle_cache import obstacle_cache
+from src.services.offload import get_execution_offloader
+from src.services.path_planner import NoPathError, PlanningBudgetError, path_planner
+from src.services.robot_actor import RobotActorRegistry, get_command_actors
+from src.services.robot_service import TrajectoryPoint
+from src.services.robot_state import (
+    ROBOT_ID_PATTERN,
+    RobotNotFoundError,
+    RobotStateConflictError,
+    get_robot_state,
+    robot_from_state,
+    update_robot_state,
+)
+from src.services.state_cache import get_state_cache, invalidate_cached_state
 from src.settings import settings
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+
+async def get_obstacle_db(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session that simulate and plan load obstacles from. Always the primary:
+    the obstacle cache, planner cache and offload snapshots are shared with
+    the write routes, and a lagging replica would keep flipping them back to
+    an older obstacle version.
+    """
+    async with primary_session_for(db) as session:
+        yield session
+
+
 DBSession = Annotated[AsyncSession, Depends(get_db)]
+ReadDBSession = Annotated[AsyncSession, Depends(get_read_db)]
+ObstacleDBSession = Annotated[AsyncSession, Depends(get_obstacle_db)]
+CommandActors = Annotated[RobotActorRegistry, Depends(get_command_actors)]
+HistoryWriterDep = Annotated[HistoryWriter | None, Depends(get_history_writer)]
+RobotId = Annotated[str, Path(pattern=ROBOT_ID_PATTERN)]
+Granularity = Annotated[Literal["step", "segment"], Query()]
+IdempotencyKey = Annotated[
+    str | None, Header(alias="Idempotency-Key", min_length=1, max_length=255)
+]
 
 router = APIRouter()
 
+# Longest command string accepted in a single request or batch item
+MAX_COMMAND_LENGTH = 1000
+
 
 class CommandRequest(BaseModel):
     command: str
 
 
+class SimulateRequest(CommandRequest):
+    # Start here instead of at the robot's current state
+    position: Coordinates | None = None
+    direction: Direction | None = None
+
+
+class PlanRequest(BaseModel):
+    target: Coordinates
+    # Start here instead of at the robot's current state
+    position: Coordinates | None = None
+    direction: Direction | None = None
+
+
+class PlanResponse(BaseModel):
+    command: str
+    position: dict[str, int]  # The target, where the command string ends
+    direction: str
+    rotations: int
+    optimal: bool  # False when the search for the shortest path gave up
+    cached: bool
+
+
 class CommandResponse(BaseModel):
     position: dict[str, int]
     direction: str
     obstacle_detected: bool = False
 
 
-@router.post("/commands", response_model=CommandResponse)
-async def execute_commands(request: CommandRequest, db: DBSession) -> CommandResponse:
+class CommandUploadResponse(CommandResponse):
+    received: int  # Bytes of the upload read before execution stopped
+    sha256: str  # SHA-256 of those bytes
+
+
+class BatchCommandRequest(BaseModel):
+    commands: list[str] = Field(min_length=1)
+
+
+class BatchCommandResponse(BaseModel):
+    results: list[CommandResponse]
+
+
+ResponseT = TypeVar("ResponseT", bound=BaseModel)
+
+
+async def load_robot(
+    db: AsyncSession, robot_id: str
+) -> tuple[RobotState | None, Robot]:
     """
-    Execute a string of commands and return the final position.
+    Load a robot's stored state. Only the default robot may be missing, in
+    which case it starts at the configured start position.
+    """
+    robot_state = await get_robot_state(db, robot_id)
+    if robot_state is None and robot_id != settings.DEFAULT_ROBOT_ID:
+        raise HTTPException(status_code=404, detail="Robot not found")
+    return robot_state, robot_from_state(robot_state)
+
+
+def get_command_processor(db: AsyncSession) -> CommandProcessor:
+    return CommandProcessor(
+        db,
+        obstacle_cache=obstacle_cache if settings.OBSTACLE_CACHE_ENABLED else None,
+        offloader=get_execution_offloader(),
+    )
+
+
+async def save_results(
+    db: AsyncSession,
+    robot_id: str,
+    robot_state: RobotState | None,
+    history_rows: list[dict[str, Any]],
+    final_result: dict[str, Any],
+    history_writer: HistoryWriter | None,
+) -> None:
+    """
+    Save the robot's final state and its history rows in one commit, then
+    update the state cache. With a write-behind history writer only the
+    state is committed here and the history rows are queued once the commit
+    has succeeded.
     """
+    try:
+        if history_writer is None:
+            await db.execute(insert(CommandHistory), history_rows)
+        robot_state = update_robot_state(db, robot_id, robot_state, final_result)
+        started = time.perf_counter()
+        await db.commit()
+        metrics.commit_duration.observe(time.perf_counter() - started)
+    except StaleDataError as e:
+        await db.rollback()
+        # Another process changed the robot, so the cached state is older
+        invalidate_cached_state(robot_id)
+        raise HTTPException(
+            status_code=409, detail="Robot state changed concurrently"
+        ) from e
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error saving command history: {e}")
+        raise HTTPException(
+            status_code=500, detail="Failed to save command history"
+        ) from e
+
+    cache = get_state_cache()
+    if cache is not None:
+        cache.put(
+            robot_id,
+            Position(final_result["position"]["x"], final_result["position"]["y"]),
+            Direction[final_result["direction"]],
+            robot_state.version,
+        )
+
+    if history_writer is not None:
+        await history_writer.enqueue(history_rows)
+
+
+def validate_command(command: str) -> None:
+    if len(command) > MAX_COMMAND_LENGTH:  # Limit command length
+        raise HTTPException(status_code=400, detail="Command string too long")
+
+
+async def run_idempotent(
+    db: AsyncSession,
+    key: str | None,
+    fingerprint: str,
+    response: Response,
+    model: type[ResponseT],
+    execute: Callable[[IdempotentRequest | None], Awaitable[ResponseT]],
+) -> ResponseT:
+    """
+    Run execute once per Idempotency-Key. A retry with the same key gets the
+    stored response with Idempotency-Replayed set, without executing or
+    touching the robot state; reusing a key for another request is a 422.
+    """
+    if key is None:
+        return await execute(None)
+    idempotent = IdempotentRequest(key, fingerprint)
+
+    async def execute_body() -> ResponseBody:
+        return (await execute(idempotent)).model_dump()
+
+    try:
+        body, replayed = await idempotency_store.execute_once(
+            db, idempotent, execute_body
+        )
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(
+            status_code=422, detail="Idempotency-Key was used for another request"
+        ) from e
+    if replayed:
+        response.headers["Idempotency-Replayed"] = "true"
+    return model(**body)
+
+
+async def run_commands(
+    db: AsyncSession,
+    robot_id: str,
+    request: CommandRequest,
+    actors: RobotActorRegistry,
+    history_writer: HistoryWriter | None = None,
+    idempotent: IdempotentRequest | None = None,
+) -> CommandResponse:
     try:
         # Validate command string
-        if len(request.command) > 1000:  # Limit command length
-            raise HTTPException(status_code=400, detail="Command string too long")
-
-        # Get the latest robot state from database
-        stmt = select(RobotState).order_by(RobotState.updated_at.desc()).limit(1)
-        result = await db.execute(stmt)
-        robot_state = result.scalars().first()  # Properly typed as Optional[RobotState]
-
-        if not robot_state:
-            start_position = settings.start_position
-            start_direction = Direction[settings.start_direction]
-            robot = Robot(position=start_position, direction=start_direction)
-        else:
-            robot = Robot(
-                position=(robot_state.position_x, robot_state.position_y),
-                direction=Direction[robot_state.direction],
+        validate_command(request.command)
+
+        if settings.COMMAND_ACTORS_ENABLED and idempotent is None:
+            # A keyed request is saved in this session, together with its key
+            (command_result,) = await submit_to_actor(
+                actors, robot_id, [request.command]
             )
+            return CommandResponse(**command_result)
 
-        command_processor = CommandProcessor(db)
+        robot_state, robot = await load_robot(db, robot_id)
+
+        command_processor = get_command_processor(db)
+        recorder = new_recorder()
         command_result = await command_processor.process_commands(
-            request.command, (robot.position.x, robot.position.y), robot.direction
+            request.command,
+            (robot.position.x, robot.position.y),
+            robot.direction,
+            recorder,
         )
 
-        x_position = command_result["position"]["x"]
-        y_position = command_result["position"]["y"]
-        direction = command_result["direction"]
-        obstacle_detected = command_result["obstacle_detected"]
+        response = CommandResponse(**command_result)
+        if idempotent is not None:
+            # Committed with the robot state, so the key and the move stick
+            # or fail together
+            idempotency_store.stage(db, idempotent, response.model_dump())
+        await save_results(
+            db,
+            robot_id,
+            robot_state,
+            [history_values(robot_id, request.command, command_result, recorder)],
+            command_result,
+            history_writer,
+        )
 
-        try:
-            command_history = CommandHistory(
-                command=request.command,
-                position_x=x_position,
-                position_y=y_position,
-                direction=direction,
-                obstacle_detected=obstacle_detected,
+        return response
+
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error executing commands: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error") from e
+
+
+async def submit_to_actor(
+    actors: RobotActorRegistry, robot_id: str, commands: list[str]
+) -> list[dict[str, Any]]:
+    """Execute through the robot's single-writer actor instead of this session"""
+    try:
+        return await actors.submit_many(robot_id, commands)
+    except RobotNotFoundError as e:
+        raise HTTPException(status_code=404, detail="Robot not found") from e
+    except RobotStateConflictError as e:
+        raise HTTPException(
+            status_code=409, detail="Robot state changed concurrently"
+        ) from e
+
+
+@router.post("/commands", response_model=CommandResponse)
+async def execute_commands(
+    request: CommandRequest,
+    db: DBSession,
+    actors: CommandActors,
+    history_writer: HistoryWriterDep,
+    response: Response,
+    idempotency_key: IdempotencyKey = None,
+) -> CommandResponse:
+    """
+    Execute a string of commands and return the final position. With an
+    Idempotency-Key header, a retry returns the first response instead of
+    moving the robot again.
+    """
+    return await execute_robot_commands(
+        settings.DEFAULT_ROBOT_ID,
+        request,
+        db,
+        actors,
+        history_writer,
+        response,
+        idempotency_key,
+    )
+
+
+@router.post("/robots/{robot_id}/commands", response_model=CommandResponse)
+async def execute_robot_commands(
+    robot_id: RobotId,
+    request: CommandRequest,
+    db: DBSession,
+    actors: CommandActors,
+    history_writer: HistoryWriterDep,
+    response: Response,
+    idempotency_key: IdempotencyKey = None,
+) -> CommandResponse:
+    """
+    Execute a string of commands on one robot and return its final position.
+    """
+    return await run_idempotent(
+        db,
+        idempotency_key,
+        request_fingerprint("commands", robot_id, request.command),
+        response,
+        CommandResponse,
+        lambda idempotent: run_commands(
+            db, robot_id, request, actors, history_writer, idempotent
+        ),
+    )
+
+
+def trajectory_lines(
+    trajectory: Iterator[TrajectoryPoint], summary: CommandResponse
+) -> Iterator[str]:
+    """Render trajectory points as NDJSON lines, ending with the summary"""
+    for point in trajectory:
+        yield (
+            json.dumps({
+                "type": "point",
+                "offset": point.offset,
+                "command": point.command,
+                "length": point.length,
+                "position": {"x": point.position.x, "y": point.position.y},
+                "direction": point.direction.value,
+            })
+            + "\n"
+        )
+    yield json.dumps({"type": "summary", **summary.model_dump()}) + "\n"
+
+
+async def run_stream(
+    db: AsyncSession,
+    robot_id: str,
+    request: CommandRequest,
+    granularity: str,
+    history_writer: HistoryWriter | None = None,
+) -> StreamingResponse:
+    try:
+        # Validate command string
+        validate_command(request.command)
+
+        # Never queued on the robot's actor: the trajectory is replayed from
+        # this start state. A concurrent write fails the row version check
+        # in save_results with a 409, and the actor reloads after this one.
+        robot_state, robot = await load_robot(db, robot_id)
+
+        command_processor = get_command_processor(db)
+        recorder = new_recorder()
+        command_result, trajectory = await command_processor.trace_commands(
+            request.command,
+            (robot.position.x, robot.position.y),
+            robot.direction,
+            by_segment=granularity == "segment",
+            recorder=recorder,
+        )
+
+        await save_results(
+            db,
+            robot_id,
+            robot_state,
+            [history_values(robot_id, request.command, command_result, recorder)],
+            command_result,
+            history_writer,
+        )
+
+        return StreamingResponse(
+            trajectory_lines(trajectory, CommandResponse(**command_result)),
+            media_type="application/x-ndjson",
+        )
+
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming commands: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error") from e
+
+
+@router.post("/commands/stream")
+async def stream_commands(
+    request: CommandRequest,
+    db: DBSession,
+    history_writer: HistoryWriterDep,
+    granularity: Granularity = "step",
+) -> StreamingResponse:
+    """
+    Execute a string of commands and stream the path as NDJSON.
+    The robot state and history are saved before streaming starts. Each line
+    is a point after one command (granularity=step) or one run of identical
+    commands (granularity=segment), and the last line is the same summary
+    that POST /commands returns.
+    """
+    return await run_stream(
+        db, settings.DEFAULT_ROBOT_ID, request, granularity, history_writer
+    )
+
+
+@router.post("/robots/{robot_id}/commands/stream")
+async def stream_robot_commands(
+    robot_id: RobotId,
+    request: CommandRequest,
+    db: DBSession,
+    history_writer: HistoryWriterDep,
+    granularity: Granularity = "step",
+) -> StreamingResponse:
+    """
+    Execute a string of commands on one robot and stream the path as NDJSON.
+    """
+    return await run_stream(db, robot_id, request, granularity, history_writer)
+
+
+async def run_batch(
+    db: AsyncSession,
+    robot_id: str,
+    request: BatchCommandRequest,
+    actors: RobotActorRegistry,
+    history_writer: HistoryWriter | None = None,
+    idempotent: IdempotentRequest | None = None,
+) -> BatchCommandResponse:
+    try:
+        if len(request.commands) > settings.COMMAND_BATCH_MAX_SIZE:
+            raise HTTPException(status_code=400, detail="Too many command strings")
+        for command in request.commands:
+            validate_command(command)
+
+        if settings.COMMAND_ACTORS_ENABLED and idempotent is None:
+            # A keyed batch is saved in this session, together with its key
+            results = await submit_to_actor(actors, robot_id, request.commands)
+            return BatchCommandResponse(
+                results=[CommandResponse(**result) for result in results]
             )
-            db.add(command_history)
 
-            if not robot_state:
-                robot_state = RobotState(
-                    position_x=x_position, position_y=y_position, direction=direction
+        robot_state, robot = await load_robot(db, robot_id)
+
+        command_processor = get_command_processor(db)
+        recorders = [new_recorder() for _ in request.commands]
+        command_results = await command_processor.process_command_batch(
+            request.commands,
+            (robot.position.x, robot.position.y),
+            robot.direction,
+            recorders,
+        )
+
+        response = BatchCommandResponse(
+            results=[CommandResponse(**result) for result in command_results]
+        )
+        if idempotent is not None:
+            idempotency_store.stage(db, idempotent, response.model_dump())
+        await save_results(
+            db,
+            robot_id,
+            robot_state,
+            [
+                history_values(robot_id, command, result, recorder)
+                for command, result, recorder in zip(
+                    request.commands, command_results, recorders, strict=True
                 )
-                db.add(robot_state)
-            else:
-                robot_state.position_x = x_position
-                robot_state.position_y = y_position
-                robot_state.direction = direction
-
-            await db.commit()
-        except Exception as e:
-            await db.rollback()
-            logger.error(f"Error saving command history: {e}")
-            raise HTTPException(
-                status_code=500, detail="Failed to save command history"
-            ) from e
-
-        response_data = {
-            "position": {"x": x_position, "y": y_position},
-            "direction": direction,
-            "obstacle_detected": obstacle_detected,
-        }
-        return CommandResponse(**response_data)
+            ],
+            command_results[-1],
+            history_writer,
+        )
+
+        return response
 
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error executing commands: {e}")
+        logger.error(f"Error executing command batch: {e}")
         raise HTTPException(status_code=500, detail="Internal server error") from e
+
+
+@router.post("/commands/batch", response_model=BatchCommandResponse)
+async def execute_command_batch(
+    request: BatchCommandRequest,
+    db: DBSession,
+    actors: CommandActors,
+    history_writer: HistoryWriterDep,
+    response: Response,
+    idempotency_key: IdempotencyKey = None,
+) -> BatchCommandResponse:
+    """
+    Execute several command strings in order, each starting where the previous
+    one stopped, and return the result of each. The robot state is read once,
+    and all history rows and the final state are written in one commit.
+    Idempotency-Key is honoured as for POST /commands. With command actors
+    enabled the batch is applied by the robot's actor as one request.
+    """
+    return await execute_robot_command_batch(
+        settings.DEFAULT_ROBOT_ID,
+        request,
+        db,
+        actors,
+        history_writer,
+        response,
+        idempotency_key,
+    )
+
+
+@router.post("/robots/{robot_id}/commands/batch", response_model=BatchCommandResponse)
+async def execute_robot_command_batch(
+    robot_id: RobotId,
+    request: BatchCommandRequest,
+    db: DBSession,
+    actors: CommandActors,
+    history_writer: HistoryWriterDep,
+    response: Response,
+    idempotency_key: IdempotencyKey = None,
+) -> BatchCommandResponse:
+    """
+    Execute several command strings in order on one robot.
+    """
+    return await run_idempotent(
+        db,
+        idempotency_key,
+        request_fingerprint("commands/batch", robot_id, *request.commands),
+        response,
+        BatchCommandResponse,
+        lambda idempotent: run_batch(
+            db, robot_id, request, actors, history_writer, idempotent
+        ),
+    )
+
+
+async def start_pose(
+    db: AsyncSession,
+    robot_id: str,
+    position: Coordinates | None,
+    direction: Direction | None,
+) -> tuple[tuple[int, int], Direction]:
+    """
+    Start of a simulation or plan: the requested position and direction,
+    with any that is missing taken from the robot's current state. The state
+    comes from the state cache when it is enabled, and the robot is not
+    looked up at all when both are given.
+    """
+    if position is not None and direction is not None:
+        return (position.x, position.y), direction
+
+    cache = get_state_cache()
+    if cache is not None:
+        try:
+            entry, _ = await cache.get(db, robot_id)
+        except RobotNotFoundError as e:
+            raise HTTPException(status_code=404, detail="Robot not found") from e
+        robot_position, robot_direction = entry.position, entry.direction
+    else:
+        _, robot = await load_robot(db, robot_id)
+        robot_position, robot_direction = robot.position, robot.direction
+
+    if position is not None:
+        start = (position.x, position.y)
+    else:
+        start = (robot_position.x, robot_position.y)
+    return start, direction or robot_direction
+
+
+async def run_simulation(
+    db: AsyncSession,
+    obstacle_db: AsyncSession,
+    robot_id: str,
+    request: SimulateRequest,
+) -> CommandResponse:
+    try:
+        # Validate command string
+        validate_command(request.command)
+
+        position, direction = await start_pose(
+            db, robot_id, request.position, request.direction
+        )
+        command_processor = get_command_processor(obstacle_db)
+        command_result = await command_processor.process_commands(
+            request.command, position, direction
+        )
+        return CommandResponse(**command_result)
+
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error simulating commands: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error") from e
+
+
+@router.post("/commands/simulate", response_model=CommandResponse)
+async def simulate_commands(
+    request: SimulateRequest, db: ReadDBSession, obstacle_db: ObstacleDBSession
+) -> CommandResponse:
+    """
+    Execute a string of commands without saving anything and return where
+    the robot would end up. Starts at the robot's current state unless the
+    request sets position or direction. Nothing is written, so the request
+    runs outside any write transaction and may read the robot's state from
+    the read replica; obstacles always come from the primary.
+    """
+    return await run_simulation(db, obstacle_db, settings.DEFAULT_ROBOT_ID, request)
+
+
+@router.post("/robots/{robot_id}/commands/simulate", response_model=CommandResponse)
+async def simulate_robot_commands(
+    robot_id: RobotId,
+    request: SimulateRequest,
+    db: ReadDBSession,
+    obstacle_db: ObstacleDBSession,
+) -> CommandResponse:
+    """
+    Simulate a string of commands on one robot without saving anything.
+    """
+    return await run_simulation(db, obstacle_db, robot_id, request)
+
+
+async def run_plan(
+    db: AsyncSession, obstacle_db: AsyncSession, robot_id: str, request: PlanRequest
+) -> PlanResponse:
+    try:
+        start, direction = await start_pose(
+            db, robot_id, request.position, request.direction
+        )
+        command_processor = get_command_processor(obstacle_db)
+        obstacles, version = await command_processor.load_versioned_obstacles()
+        target = (request.target.x, request.target.y)
+        plan, cached = path_planner.plan(obstacles, version, start, direction, target)
+    except NoPathError as e:
+        raise HTTPException(status_code=422, detail="Target cannot be reached") from e
+    except PlanningBudgetError as e:
+        raise HTTPException(
+            status_code=422, detail="No path found within the planning budget"
+        ) from e
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error planning commands: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error") from e
+
+    return PlanResponse(
+        command=plan.commands,
+        position={"x": target[0], "y": target[1]},
+        direction=plan.direction.value,
+        rotations=plan.rotations,
+        optimal=plan.optimal,
+        cached=cached,
+    )
+
+
+@router.post("/commands/plan", response_model=PlanResponse)
+async def plan_commands(
+    request: PlanRequest, db: ReadDBSession, obstacle_db: ObstacleDBSession
+) -> PlanResponse:
+    """
+    Plan the shortest command string, counting rotations, that takes the
+    robot to the target cell without running into an obstacle. Starts at the
+    robot's current state unless the request sets position or direction.
+    Nothing is executed or saved.
+    """
+    return await run_plan(db, obstacle_db, settings.DEFAULT_ROBOT_ID, request)
+
+
+@router.post("/robots/{robot_id}/commands/plan", response_model=PlanResponse)
+async def plan_robot_commands(
+    robot_id: RobotId,
+    request: PlanRequest,
+    db: ReadDBSession,
+    obstacle_db: ObstacleDBSession,
+) -> PlanResponse:
+    """
+    Plan a command string that takes one robot to the target cell.
+    """
+    return await run_plan(db, obstacle_db, robot_id, request)
+
+
+async def run_upload(
+    db: AsyncSession,
+    robot_id: str,
+    request: Request,
+    history_writer: HistoryWriter | None = None,
+) -> CommandUploadResponse:
+    try:
+        # Executed while the body is read, so never queued on the robot's
+        # actor; like streams it relies on the row version check
+        robot_state, robot = await load_robot(db, robot_id)
+
+        command_processor = get_command_processor(db)
+        archive = CommandArchive()
+        recorder = new_recorder()
+        command_result = await command_processor.process_command_stream(
+            iter_command_chunks(
+                request.stream(), archive, settings.COMMAND_UPLOAD_MAX_BYTES
+            ),
+            (robot.position.x, robot.position.y),
+            robot.direction,
+            recorder,
+        )
+
+        await save_results(
+            db,
+            robot_id,
+            robot_state,
+            [history_values(robot_id, archive, command_result, recorder)],
+            command_result,
+            history_writer,
+        )
+
+        return CommandUploadResponse(
+            **command_result, received=archive.size, sha256=archive.hexdigest()
+        )
+
+    except CommandUploadError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error executing command upload: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error") from e
+
+
+@router.post("/commands/upload", response_model=CommandUploadResponse)
+async def upload_commands(
+    request: Request, db: DBSession, history_writer: HistoryWriterDep
+) -> CommandUploadResponse:
+    """
+    Execute a command string sent as the raw request body, of any length up
+    to COMMAND_UPLOAD_MAX_BYTES. The body is executed chunk by chunk while it
+    is received, and reading stops at the first obstacle. History keeps the
+    SHA-256 and a compressed copy of the bytes read, not the text.
+    """
+    return await run_upload(db, settings.DEFAULT_ROBOT_ID, request, history_writer)
+
+
+@router.post("/robots/{robot_id}/commands/upload", response_model=CommandUploadResponse)
+async def upload_robot_commands(
+    robot_id: RobotId, request: Request, db: DBSession, history_writer: HistoryWriterDep
+) -> CommandUploadResponse:
+    """
+    Execute a streamed command upload on one robot.
+    """
+    return await run_upload(db, robot_id, request, history_writer)
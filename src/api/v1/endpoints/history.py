@@ -0,0 +1,220 @@
+import json
+import logging
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models.database import CommandHistory
+from src.models.robot import DIRECTION_VECTORS, Position
+from src.services.command_history import InvalidCursorError, get_history_page
+from src.services.command_upload import iter_archived_command
+from src.services.database import get_read_db
+from src.services.robot_state import ROBOT_ID_PATTERN, get_robot_state
+from src.services.trajectory import (
+    InvalidTrajectoryError,
+    TrajectoryRun,
+    iter_trajectory,
+)
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+ReadDBSession = Annotated[AsyncSession, Depends(get_read_db)]
+RobotId = Annotated[str, Path(pattern=ROBOT_ID_PATTERN)]
+Granularity = Annotated[Literal["step", "segment"], Query()]
+
+router = APIRouter()
+
+
+class HistoryEntry(BaseModel):
+    id: int
+    command: str | None  # None for uploads, see command_sha256
+    command_sha256: str | None
+    position: dict[str, int | None]
+    direction: str | None
+    obstacle_detected: bool
+    executed_at: datetime
+
+
+class HistoryPage(BaseModel):
+    items: list[HistoryEntry]
+    next_cursor: str | None
+
+
+class HistoryQuery(BaseModel):
+    limit: int = Field(100, ge=1, le=1000)
+    cursor: str | None = None
+    obstacle_detected: bool | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+    order: Literal["asc", "desc"] = "desc"
+
+
+HistoryParams = Annotated[HistoryQuery, Query()]
+
+
+def history_entry(row: CommandHistory) -> HistoryEntry:
+    return HistoryEntry(
+        id=row.id,
+        command=row.command,
+        command_sha256=row.command_sha256,
+        position={"x": row.position_x, "y": row.position_y},
+        direction=row.direction,
+        obstacle_detected=row.obstacle_detected,
+        executed_at=row.executed_at,
+    )
+
+
+async def read_history(
+    db: AsyncSession, robot_id: str, params: HistoryQuery
+) -> HistoryPage:
+    try:
+        rows, next_cursor = await get_history_page(
+            db,
+            robot_id,
+            params.limit,
+            cursor=params.cursor,
+            obstacle_detected=params.obstacle_detected,
+            since=params.since,
+            until=params.until,
+            order=params.order,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while reading command history: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+
+    return HistoryPage(
+        items=[history_entry(row) for row in rows], next_cursor=next_cursor
+    )
+
+
+@router.get("/history", response_model=HistoryPage)
+async def get_history(db: ReadDBSession, params: HistoryParams) -> HistoryPage:
+    """
+    Page through the command history of the robot, newest first by default.
+    Pass next_cursor from a response as cursor to get the following page;
+    next_cursor is null on the last page.
+    """
+    return await read_history(db, settings.DEFAULT_ROBOT_ID, params)
+
+
+@router.get("/robots/{robot_id}/history", response_model=HistoryPage)
+async def get_robot_history(
+    robot_id: RobotId, db: ReadDBSession, params: HistoryParams
+) -> HistoryPage:
+    """
+    Page through the command history of one robot.
+    """
+    if robot_id != settings.DEFAULT_ROBOT_ID:
+        try:
+            robot_state = await get_robot_state(db, robot_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Database error while reading command history: {e}")
+            raise HTTPException(status_code=500, detail="Database error") from e
+        if robot_state is None:
+            raise HTTPException(status_code=404, detail="Robot not found")
+    return await read_history(db, robot_id, params)
+
+
+def trajectory_lines(
+    start: Position, runs: Iterator[TrajectoryRun], granularity: str
+) -> Iterator[str]:
+    """Render a decoded trajectory as NDJSON, one cell or one run per line"""
+    yield json.dumps({"type": "start", "position": start._asdict()}) + "\n"
+    for run in runs:
+        if granularity == "segment":
+            yield (
+                json.dumps({
+                    "type": "segment",
+                    "direction": run.direction.value,
+                    "length": run.length,
+                    "position": run.position._asdict(),
+                })
+                + "\n"
+            )
+            continue
+        dx, dy = DIRECTION_VECTORS[run.direction]
+        for step in range(1, run.length + 1):
+            yield (
+                json.dumps({
+                    "type": "point",
+                    "position": {"x": start.x + dx * step, "y": start.y + dy * step},
+                })
+                + "\n"
+            )
+        start = run.position
+
+
+@router.get("/history/{history_id}/trajectory")
+async def get_history_trajectory(
+    history_id: int, db: ReadDBSession, granularity: Granularity = "step"
+) -> StreamingResponse:
+    """
+    Stream the recorded path of one executed command string as NDJSON: the
+    start cell, then every cell entered (granularity=step) or every straight
+    run (granularity=segment). Paths are only recorded while
+    TRAJECTORY_RECORDING_ENABLED is set, and are decoded as they are sent.
+    """
+    try:
+        result = await db.execute(
+            select(CommandHistory.id, CommandHistory.trajectory).where(
+                CommandHistory.id == history_id
+            )
+        )
+        row = result.first()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while reading trajectory: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="History entry not found")
+    if row.trajectory is None:
+        raise HTTPException(status_code=404, detail="No trajectory recorded")
+
+    try:
+        start, runs = iter_trajectory(row.trajectory)
+    except InvalidTrajectoryError as e:
+        logger.error(f"Invalid trajectory for history entry {history_id}: {e}")
+        raise HTTPException(status_code=500, detail="Invalid trajectory") from e
+
+    return StreamingResponse(
+        trajectory_lines(start, runs, granularity), media_type="application/x-ndjson"
+    )
+
+
+@router.get("/history/{history_id}/command")
+async def get_history_command(history_id: int, db: ReadDBSession) -> StreamingResponse:
+    """
+    Return the command string of one history entry as plain text. Uploaded
+    commands are decompressed as they are sent.
+    """
+    try:
+        result = await db.execute(
+            select(
+                CommandHistory.id, CommandHistory.command, CommandHistory.command_blob
+            ).where(CommandHistory.id == history_id)
+        )
+        row = result.first()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while reading command: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="History entry not found")
+
+    body = (
+        iter_archived_command(row.command_blob)
+        if row.command_blob is not None
+        else iter([(row.command or "").encode()])
+    )
+    return StreamingResponse(body, media_type="text/plain")
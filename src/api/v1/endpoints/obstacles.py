@@ -0,0 +1,177 @@
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models.database import Obstacle
+from src.services.database import get_db, get_read_db
+from src.services.obstacle_import import (
+    IMPORT_FORMATS,
+    ObstacleImportError,
+    import_obstacles,
+    iter_obstacle_batches,
+)
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+DBSession = Annotated[AsyncSession, Depends(get_db)]
+ReadDBSession = Annotated[AsyncSession, Depends(get_read_db)]
+
+router = APIRouter()
+
+# Content types accepted by the import endpoint when no format is given
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+}
+
+
+class ObstacleCreate(BaseModel):
+    x: int
+    y: int
+
+
+class ObstacleResponse(BaseModel):
+    id: int
+    position: dict[str, int]
+
+
+class ObstacleImportResponse(BaseModel):
+    received: int
+    inserted: int
+    skipped: int
+    elapsed_seconds: float
+    rows_per_second: float
+
+
+def to_response(obstacle: Obstacle) -> ObstacleResponse:
+    return ObstacleResponse(
+        id=obstacle.id,
+        position={"x": obstacle.position_x, "y": obstacle.position_y},
+    )
+
+
+@router.get("/obstacles", response_model=list[ObstacleResponse])
+async def list_obstacles(
+    db: ReadDBSession,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    after_id: Annotated[int, Query(ge=0)] = 0,
+) -> list[ObstacleResponse]:
+    """
+    List obstacles ordered by id. Pass the last id seen as after_id to get
+    the next page.
+    """
+    try:
+        result = await db.execute(
+            select(Obstacle)
+            .where(Obstacle.id > after_id)
+            .order_by(Obstacle.id)
+            .limit(limit)
+        )
+        return [to_response(obstacle) for obstacle in result.scalars().all()]
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while listing obstacles: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+
+
+@router.post("/obstacles", response_model=ObstacleResponse, status_code=201)
+async def create_obstacle(request: ObstacleCreate, db: DBSession) -> ObstacleResponse:
+    """
+    Add a single obstacle.
+    """
+    obstacle = Obstacle(position_x=request.x, position_y=request.y)
+    try:
+        db.add(obstacle)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Obstacle already exists at this position"
+        ) from e
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Database error while creating obstacle: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+    return to_response(obstacle)
+
+
+@router.get("/obstacles/{obstacle_id}", response_model=ObstacleResponse)
+async def get_obstacle(obstacle_id: int, db: ReadDBSession) -> ObstacleResponse:
+    """
+    Return a single obstacle.
+    """
+    try:
+        obstacle = await db.get(Obstacle, obstacle_id)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while fetching obstacle: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+    if obstacle is None:
+        raise HTTPException(status_code=404, detail="Obstacle not found")
+    return to_response(obstacle)
+
+
+@router.delete("/obstacles/{obstacle_id}", status_code=204)
+async def delete_obstacle(obstacle_id: int, db: DBSession) -> Response:
+    """
+    Remove a single obstacle.
+    """
+    try:
+        obstacle = await db.get(Obstacle, obstacle_id)
+        if obstacle is None:
+            raise HTTPException(status_code=404, detail="Obstacle not found")
+        await db.delete(obstacle)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Database error while deleting obstacle: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+    return Response(status_code=204)
+
+
+@router.post("/obstacles/import", response_model=ObstacleImportResponse)
+async def bulk_import_obstacles(
+    request: Request,
+    db: DBSession,
+    fmt: Annotated[str | None, Query(alias="format")] = None,
+) -> ObstacleImportResponse:
+    """
+    Import obstacles from a CSV ("x,y" per line) or NDJSON upload.
+    The body is streamed and inserted in batches, existing positions are
+    skipped, and the whole import is committed in one transaction.
+    """
+    if fmt is None:
+        content_type = request.headers.get("content-type", "").split(";")[0]
+        fmt = CONTENT_TYPE_FORMATS.get(content_type.strip().lower())
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Upload format must be one of {sorted(IMPORT_FORMATS)}",
+        )
+
+    batches = iter_obstacle_batches(
+        request.stream(), fmt, settings.OBSTACLE_IMPORT_BATCH_SIZE
+    )
+    try:
+        summary = await import_obstacles(db, batches)
+        await db.commit()
+    except ObstacleImportError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Upload contains existing obstacles"
+        ) from e
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Database error while importing obstacles: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+
+    return ObstacleImportResponse(**summary)
@@ -0,0 +1,105 @@
+import logging
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models.database import RobotState
+from src.models.robot import Direction
+from src.services.database import get_db
+from src.services.robot_state import ROBOT_ID_PATTERN, provision_robots, robot_status
+from src.services.state_cache import invalidate_cached_state
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+DBSession = Annotated[AsyncSession, Depends(get_db)]
+
+router = APIRouter()
+
+
+class Coordinates(BaseModel):
+    """A requested position; both coordinates are required"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    x: int
+    y: int
+
+
+class RobotCreate(BaseModel):
+    robot_id: str = Field(pattern=ROBOT_ID_PATTERN)
+    position: Coordinates | None = None
+    direction: Direction | None = None
+
+
+class ProvisionRequest(BaseModel):
+    robots: list[RobotCreate] = Field(min_length=1)
+
+
+class ProvisionResponse(BaseModel):
+    created: int
+
+
+@router.post("/robots", response_model=ProvisionResponse, status_code=201)
+async def create_robots(request: ProvisionRequest, db: DBSession) -> ProvisionResponse:
+    """
+    Provision robots in bulk. Robots without a position or direction start at
+    the configured start state. Fails without creating anything if any robot
+    id already exists.
+    """
+    if len(request.robots) > settings.ROBOT_PROVISION_MAX_SIZE:
+        raise HTTPException(status_code=400, detail="Too many robots")
+
+    robots: list[dict[str, Any]] = []
+    for robot in request.robots:
+        values: dict[str, Any] = {"robot_id": robot.robot_id}
+        if robot.position is not None:
+            values["position_x"] = robot.position.x
+            values["position_y"] = robot.position.y
+        if robot.direction is not None:
+            values["direction"] = robot.direction.value
+        robots.append(values)
+
+    try:
+        created = await provision_robots(db, robots)
+        await db.commit()
+        # The default robot may have been cached at the start state
+        invalidate_cached_state(*(robot["robot_id"] for robot in robots))
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Robot id already exists") from e
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Database error while provisioning robots: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+
+    return ProvisionResponse(created=created)
+
+
+@router.get("/robots")
+async def list_robots(
+    db: DBSession,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    after: Annotated[str | None, Query()] = None,
+) -> list[dict[str, Any]]:
+    """
+    List robots ordered by robot id. Pass the last robot id seen as after to
+    get the next page.
+    """
+    stmt = select(RobotState).order_by(RobotState.robot_id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(RobotState.robot_id > after)
+    try:
+        result = await db.execute(stmt)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while listing robots: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+    return [
+        robot_status(robot_state, robot_state.robot_id)
+        for robot_state in result.scalars().all()
+    ]
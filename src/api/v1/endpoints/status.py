@@ -1,50 +1,88 @@
 import logging
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Path, Response
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
-from src.models.database import RobotState
-from src.services.database import get_db
+from src.services.database import get_read_db
+from src.services.robot_state import (
+    ROBOT_ID_PATTERN,
+    RobotNotFoundError,
+    get_robot_state,
+    robot_status,
+)
+from src.services.state_cache import RobotStateCache, get_state_cache
 from src.settings import settings
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-DBSession = Annotated[AsyncSession, Depends(get_db)]
+ReadDBSession = Annotated[AsyncSession, Depends(get_read_db)]
+StateCache = Annotated[RobotStateCache | None, Depends(get_state_cache)]
+RobotId = Annotated[str, Path(pattern=ROBOT_ID_PATTERN)]
 
 router = APIRouter()
 
 
+async def read_status(
+    db: AsyncSession,
+    robot_id: str,
+    cache: RobotStateCache | None,
+    response: Response,
+) -> dict[str, Any]:
+    """
+    Status of a robot from the state cache, or from the database when the
+    cache is disabled. X-State-Updated-At tells when the state was last
+    written and X-State-Source where this answer came from.
+    """
+    if cache is not None:
+        entry, hit = await cache.get(db, robot_id)
+        response.headers["X-State-Source"] = "cache" if hit else "database"
+        response.headers["X-State-Updated-At"] = entry.updated_at.isoformat()
+        return {
+            "position": {"x": entry.position.x, "y": entry.position.y},
+            "direction": entry.direction.value,
+        }
+
+    robot_state = await get_robot_state(db, robot_id)
+    if robot_state is None and robot_id != settings.DEFAULT_ROBOT_ID:
+        raise RobotNotFoundError(robot_id)
+    response.headers["X-State-Source"] = "database"
+    if robot_state is not None:
+        response.headers["X-State-Updated-At"] = robot_state.updated_at.isoformat()
+    return robot_status(robot_state)
+
+
 @router.get("/status")
-async def get_status(db: DBSession) -> dict[str, Any]:
+async def get_status(
+    db: ReadDBSession, cache: StateCache, response: Response
+) -> dict[str, Any]:
     """
     Returns the current position and direction of the robot.
     """
     try:
-        result = await db.execute(
-            select(RobotState).order_by(RobotState.updated_at.desc()).limit(1)
-        )
-        robot_state = result.scalars().first()
-
-        if not robot_state:
-            return {
-                "position": {
-                    "x": settings.start_position[0],
-                    "y": settings.start_position[1],
-                },
-                "direction": settings.start_direction,
-            }
-
-        return {
-            "position": {"x": robot_state.position_x, "y": robot_state.position_y},
-            "direction": robot_state.direction,
-        }
+        return await read_status(db, settings.DEFAULT_ROBOT_ID, cache, response)
     except SQLAlchemyError as e:
         logger.error(f"Database error while fetching robot status: {e}")
         raise HTTPException(status_code=500, detail="Database error") from e
     except Exception as e:
         logger.error(f"Unexpected error while fetching robot status: {e}")
         raise HTTPException(status_code=500, detail="Internal server error") from e
+
+
+@router.get("/robots/{robot_id}/status")
+async def get_robot_status(
+    robot_id: RobotId, db: ReadDBSession, cache: StateCache, response: Response
+) -> dict[str, Any]:
+    """
+    Returns the current position and direction of one robot.
+    """
+    try:
+        status = await read_status(db, robot_id, cache, response)
+    except RobotNotFoundError as e:
+        raise HTTPException(status_code=404, detail="Robot not found") from e
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while fetching robot status: {e}")
+        raise HTTPException(status_code=500, detail="Database error") from e
+    return {**status, "robot_id": robot_id}
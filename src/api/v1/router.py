@@ -1,9 +1,20 @@
 from fastapi import APIRouter
 
-from src.api.v1.endpoints import commands, status
+from src.api.v1.endpoints import (
+    admin,
+    commands,
+    history,
+    obstacles,
+    robots,
+    status,
+)
 
 API_V1_STR = "/api/v1"
 
 api_router = APIRouter()
 api_router.include_router(status.router, tags=["status"])
 api_router.include_router(commands.router, tags=["commands"])
+api_router.include_router(obstacles.router, tags=["obstacles"])
+api_router.include_router(robots.router, tags=["robots"])
+api_router.include_router(history.router, tags=["history"])
+api_router.include_router(admin.router, tags=["admin"])
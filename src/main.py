@@ -2,11 +2,20 @@ import logging
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
+from src.api.metrics import MetricsMiddleware
+from src.api.metrics import router as metrics_router
+from src.api.profiling import ProfilingMiddleware
+from src.api.replica import ReadYourWritesMiddleware
 from src.api.v1.router import api_router
-from src.services.database import engine
+from src.services.concurrency import ConcurrencyLimitError
+from src.services.database import engine, read_engine
+from src.services.history_writer import history_writer
 from src.services.init_db import init_db as initialize_database
+from src.services.offload import execution_offloader
+from src.services.robot_actor import command_actors
 from src.settings import settings
 
 # Set up logging
@@ -29,12 +38,22 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
+    # No-op unless EXECUTION_OFFLOAD_WORKERS is set
+    await execution_offloader.start()
 
     yield
 
     # Shutdown
     logger.info("Shutting down Moon Robot API")
+    await command_actors.shutdown()
+    logger.info("Command actors stopped")
+    await history_writer.stop()
+    logger.info(f"Command history flushed: {history_writer.stats()}")
+    execution_offloader.shutdown()
+    logger.info("Command execution workers stopped")
     await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
     logger.info("Database engine disposed")
 
 
@@ -45,5 +64,26 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+@app.exception_handler(ConcurrencyLimitError)
+async def concurrency_limit_handler(
+    request: Request, exc: ConcurrencyLimitError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
+
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+# Installed unconditionally so profiling can be turned on at runtime through
+# /admin/profiling; it only checks a flag while disabled
+app.add_middleware(ProfilingMiddleware)
+
+# Passes requests straight through while no read replica is configured
+app.add_middleware(ReadYourWritesMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
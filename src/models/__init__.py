@@ -1,3 +1,3 @@
-from .robot import Direction, Position, Robot
+from .robot import CLOCKWISE, DIRECTION_VECTORS, Direction, Position, Robot
 
-__all__ = ["Direction", "Position", "Robot"]
+__all__ = ["CLOCKWISE", "DIRECTION_VECTORS", "Direction", "Position", "Robot"]
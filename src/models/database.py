@@ -1,9 +1,13 @@
 from datetime import datetime
+from typing import Any, ClassVar
 
 from sqlalchemy import (
+    JSON,
     Boolean,
     DateTime,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
@@ -21,14 +25,21 @@ class RobotState(Base):
     __tablename__ = "robot_state"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    robot_id: Mapped[str] = mapped_column(
+        String(64), unique=True, index=True, nullable=False, default="default"
+    )
     position_x: Mapped[int] = mapped_column(Integer, default=0)
     position_y: Mapped[int] = mapped_column(Integer, default=0)
     direction: Mapped[str] = mapped_column(String(10), default="NORTH")
+    # Optimistic concurrency counter, checked and bumped on every update
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    __mapper_args__: ClassVar[dict[str, Any]] = {"version_id_col": version}
+
 
 class CommandHistory(Base):
     """Tracks all commands sent to the robot"""
@@ -36,12 +47,35 @@ class CommandHistory(Base):
     __tablename__ = "command_history"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    command: Mapped[str] = mapped_column(Text, nullable=False)
+    robot_id: Mapped[str] = mapped_column(String(64), nullable=False, default="default")
+    # Uploaded command streams are stored as a SHA-256 and a zlib blob
+    # (src/services/command_upload.py) instead of text
+    command: Mapped[str | None] = mapped_column(Text)
+    command_sha256: Mapped[str | None] = mapped_column(String(64))
+    command_blob: Mapped[bytes | None] = mapped_column(LargeBinary, deferred=True)
     position_x: Mapped[int | None] = mapped_column(Integer)
     position_y: Mapped[int | None] = mapped_column(Integer)
     direction: Mapped[str | None] = mapped_column(String(10))
     obstacle_detected: Mapped[bool] = mapped_column(Boolean, default=False)
-    executed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    executed_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    # Delta-encoded path (src/services/trajectory.py), only when recording is
+    # enabled; deferred so history queries do not load it
+    trajectory: Mapped[bytes | None] = mapped_column(LargeBinary, deferred=True)
+
+    __table_args__ = (
+        # Keyset pagination of a robot's history on (executed_at, id), with and
+        # without the obstacle_detected filter
+        Index("ix_command_history_robot_executed", "robot_id", "executed_at", "id"),
+        Index(
+            "ix_command_history_robot_obstacle_executed",
+            "robot_id",
+            "obstacle_detected",
+            "executed_at",
+            "id",
+        ),
+    )
 
 
 class Obstacle(Base):
@@ -58,3 +92,47 @@ class Obstacle(Base):
         # Ensure unique positions
         UniqueConstraint("position_x", "position_y", name="uq_obstacle_position"),
     )
+
+
+class ObstacleVersion(Base):
+    """Generation counter bumped whenever the obstacles table changes"""
+
+    __tablename__ = "obstacle_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class IdempotencyRecord(Base):
+    """Response of a command request, stored under its Idempotency-Key"""
+
+    __tablename__ = "idempotency_keys"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    # SHA-256 of the route, robot and body the key was first used with
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    response: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+# Bumped with every change to the tables above; startup compares it with the
+# version recorded in schema_version instead of running create_all
+SCHEMA_VERSION = 2
+
+
+class SchemaVersion(Base):
+    """Schema versions applied to this database, one row per version"""
+
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
@@ -14,6 +14,23 @@ class Position(NamedTuple):
     y: int
 
 
+# Unit vector for each heading
+DIRECTION_VECTORS: dict[Direction, tuple[int, int]] = {
+    Direction.NORTH: (0, 1),
+    Direction.EAST: (1, 0),
+    Direction.SOUTH: (0, -1),
+    Direction.WEST: (-1, 0),
+}
+
+# Headings in clockwise order, so a right turn is +1 and a left turn is -1
+CLOCKWISE: tuple[Direction, ...] = (
+    Direction.NORTH,
+    Direction.EAST,
+    Direction.SOUTH,
+    Direction.WEST,
+)
+
+
 class Robot:
     def __init__(self, position: tuple[int, int], direction: Direction) -> None:
         self.position = Position(*position)
@@ -0,0 +1,207 @@
+"""
+Vectorized simulation of many command strings at once.
+
+Needs numpy, which is an optional dependency: pip install "moon-robot[simulation]".
+"""
+
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import numpy as np
+    import numpy.typing as npt
+except ImportError as e:  # pragma: no cover - depends on the environment
+    raise ImportError(
+        'The batch simulator needs numpy: pip install "moon-robot[simulation]"'
+    ) from e
+
+from src.models.robot import CLOCKWISE, DIRECTION_VECTORS, Direction, Position
+
+# Command codes; every other character is 0 and ignored like in Robot
+NOOP, FORWARD, BACKWARD, LEFT, RIGHT = range(5)
+
+_CODES = np.zeros(256, dtype=np.int8)
+_CODES[ord("F")] = FORWARD
+_CODES[ord("B")] = BACKWARD
+_CODES[ord("L")] = LEFT
+_CODES[ord("R")] = RIGHT
+
+# Heading change and signed step for each code, indexed by code
+_TURNS = np.array([0, 0, 0, -1, 1], dtype=np.int8)
+_STEPS = np.array([0, 1, -1, 0, 0], dtype=np.int8)
+
+# Unit vectors in CLOCKWISE order, indexed by heading
+_DX = np.array([DIRECTION_VECTORS[d][0] for d in CLOCKWISE], dtype=np.int64)
+_DY = np.array([DIRECTION_VECTORS[d][1] for d in CLOCKWISE], dtype=np.int64)
+
+# Obstacle positions are stored as 32-bit integers, so a cell is encoded as
+# one int64 key and cells outside that range can never be obstacles
+_INT32_MIN, _INT32_MAX = -(2**31), 2**31 - 1
+
+# Cells (strings x commands) simulated per chunk, to bound memory use
+DEFAULT_CHUNK_CELLS = 1 << 22
+
+Int64Array = npt.NDArray[np.int64]
+
+
+def encode_commands(commands: Sequence[str]) -> npt.NDArray[np.int8]:
+    """Command strings as a (strings, longest length) array of command codes"""
+    lengths = np.array([len(command) for command in commands], dtype=np.int64)
+    width = int(lengths.max()) if lengths.size else 0
+    codes = np.zeros((len(commands), width), dtype=np.int8)
+    # Every non-ASCII character becomes one "?", which is ignored. Row-major
+    # order of the mask matches the order of the joined strings.
+    raw = np.frombuffer("".join(commands).encode("ascii", "replace"), dtype=np.uint8)
+    codes[np.arange(width) < lengths[:, None]] = _CODES[raw]
+    return codes
+
+
+def _encode_cells(x: Int64Array, y: Int64Array) -> Int64Array:
+    return (x << 32) + (y - _INT32_MIN)
+
+
+def encode_obstacles(obstacles: Iterable[tuple[int, int]]) -> Int64Array:
+    """Obstacle positions as a sorted array of unique cell keys"""
+    cells = np.array(list(obstacles), dtype=np.int64).reshape(-1, 2)
+    return np.unique(_encode_cells(cells[:, 0], cells[:, 1]))
+
+
+@dataclass
+class SimulationResult:
+    """Final state of every simulated command string, as parallel arrays"""
+
+    x: Int64Array
+    y: Int64Array
+    heading: Int64Array  # Index into CLOCKWISE
+    obstacle_detected: npt.NDArray[np.bool_]
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def result(self, row: int) -> dict[str, Any]:
+        """Result of one string, as RobotCommandExecutor returns it"""
+        return {
+            "position": {"x": int(self.x[row]), "y": int(self.y[row])},
+            "direction": CLOCKWISE[self.heading[row]].value,
+            "obstacle_detected": bool(self.obstacle_detected[row]),
+        }
+
+    def to_results(self) -> list[dict[str, Any]]:
+        return [self.result(row) for row in range(len(self))]
+
+
+def _simulate_chunk(
+    codes: npt.NDArray[np.int8],
+    x0: Int64Array,
+    y0: Int64Array,
+    h0: Int64Array,
+    obstacle_keys: Int64Array,
+) -> tuple[Int64Array, Int64Array, Int64Array, npt.NDArray[np.bool_]]:
+    rows = np.arange(codes.shape[0])
+    if codes.shape[1] == 0:
+        return x0.copy(), y0.copy(), h0.copy(), np.zeros(rows.size, dtype=np.bool_)
+
+    # Heading after each command; moves do not turn, so this is also the
+    # heading each move is made in
+    heading = (h0[:, None] + np.cumsum(_TURNS[codes], axis=1, dtype=np.int64)) % 4
+    steps = _STEPS[codes].astype(np.int64)
+    x = x0[:, None] + np.cumsum(_DX[heading] * steps, axis=1)
+    y = y0[:, None] + np.cumsum(_DY[heading] * steps, axis=1)
+
+    if obstacle_keys.size:
+        in_range = (
+            (x >= _INT32_MIN)
+            & (x <= _INT32_MAX)
+            & (y >= _INT32_MIN)
+            & (y <= _INT32_MAX)
+        )
+        keys = _encode_cells(x, y)
+        slots = np.searchsorted(obstacle_keys, keys).clip(max=obstacle_keys.size - 1)
+        hits = (steps != 0) & in_range & (obstacle_keys[slots] == keys)
+        blocked = hits.any(axis=1)
+    else:
+        blocked = np.zeros(rows.size, dtype=np.bool_)
+
+    last = np.full(rows.size, codes.shape[1] - 1)
+    final_x, final_y = x[rows, last], y[rows, last]
+    final_heading = heading[rows, last]
+    if blocked.any():
+        # Stop in the cell before the first blocked move, facing the way the
+        # robot faced when it tried to move
+        first = np.argmax(hits, axis=1)[blocked]
+        before = first - 1
+        moved_before = before >= 0
+        sel = rows[blocked]
+        final_x[sel] = np.where(moved_before, x[sel, before.clip(min=0)], x0[sel])
+        final_y[sel] = np.where(moved_before, y[sel, before.clip(min=0)], y0[sel])
+        final_heading[sel] = heading[sel, first]
+
+    return final_x, final_y, final_heading, blocked
+
+
+def simulate_fleet(
+    commands: Sequence[str],
+    starts: Sequence[tuple[tuple[int, int], Direction]],
+    obstacles: Iterable[tuple[int, int]] | None = None,
+    chunk_cells: int = DEFAULT_CHUNK_CELLS,
+) -> SimulationResult:
+    """
+    Execute each command string from its own start position and direction.
+
+    Results match RobotCommandExecutor.execute_commands on a fresh robot for
+    every string: headings are cumulative sums of turns modulo 4, positions
+    are cumulative sums of unit steps, and every string stops before its
+    first move into an obstacle. Strings are processed in chunks of about
+    chunk_cells commands to bound memory.
+    """
+    if len(commands) != len(starts):
+        raise ValueError("Need one start state per command string")
+
+    obstacle_keys = encode_obstacles(obstacles or ())
+    x0 = np.array([start[0][0] for start in starts], dtype=np.int64)
+    y0 = np.array([start[0][1] for start in starts], dtype=np.int64)
+    h0 = np.array([CLOCKWISE.index(start[1]) for start in starts], dtype=np.int64)
+
+    # Sort by length so short strings are not padded to the longest one
+    lengths = np.array([len(command) for command in commands], dtype=np.int64)
+    order = np.argsort(lengths, kind="stable")
+    x = np.empty(len(commands), dtype=np.int64)
+    y = np.empty(len(commands), dtype=np.int64)
+    heading = np.empty(len(commands), dtype=np.int64)
+    blocked = np.empty(len(commands), dtype=np.bool_)
+
+    # Padded size of a chunk grows with its last (longest) string, so the
+    # chunk that fits is found with one vectorized comparison
+    padded = np.maximum(lengths[order], 1)
+    begin = 0
+    while begin < order.size:
+        sizes = np.arange(1, order.size - begin + 1) * padded[begin:]
+        end = begin + max(int(np.count_nonzero(sizes <= chunk_cells)), 1)
+        chunk = order[begin:end]
+        x[chunk], y[chunk], heading[chunk], blocked[chunk] = _simulate_chunk(
+            encode_commands([commands[row] for row in chunk]),
+            x0[chunk],
+            y0[chunk],
+            h0[chunk],
+            obstacle_keys,
+        )
+        begin = end
+
+    return SimulationResult(x, y, heading, blocked)
+
+
+def simulate_batch(
+    commands: Sequence[str],
+    start: tuple[int, int],
+    direction: Direction,
+    obstacles: Iterable[tuple[int, int]] | None = None,
+    chunk_cells: int = DEFAULT_CHUNK_CELLS,
+) -> SimulationResult:
+    """Execute every command string from the same start position and direction"""
+    return simulate_fleet(
+        commands,
+        [(Position(*start), direction)] * len(commands),
+        obstacles,
+        chunk_cells,
+    )
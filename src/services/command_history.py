@@ -0,0 +1,131 @@
+import base64
+import binascii
+import json
+import logging
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models.database import CommandHistory
+from src.services.command_upload import CommandArchive
+from src.services.trajectory import TrajectoryRecorder
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+HISTORY_ORDERS = {"asc", "desc"}
+
+
+def new_recorder() -> TrajectoryRecorder | None:
+    """A trajectory recorder when recording is enabled, otherwise None"""
+    return TrajectoryRecorder() if settings.TRAJECTORY_RECORDING_ENABLED else None
+
+
+def history_values(
+    robot_id: str,
+    command: str | CommandArchive,
+    result: dict[str, Any],
+    recorder: TrajectoryRecorder | None = None,
+) -> dict[str, Any]:
+    """
+    Column values for the CommandHistory row of an executed command. An
+    uploaded command is stored as its archive's hash and blob. executed_at
+    is taken now rather than left to the column default, so rows saved later
+    by the history writer keep the time the command ran.
+    """
+    if isinstance(command, CommandArchive):
+        text, sha256, blob = None, command.hexdigest(), command.blob()
+    else:
+        text, sha256, blob = command, None, None
+    return {
+        "robot_id": robot_id,
+        "command": text,
+        "command_sha256": sha256,
+        "command_blob": blob,
+        "position_x": result["position"]["x"],
+        "position_y": result["position"]["y"],
+        "direction": result["direction"],
+        "obstacle_detected": result["obstacle_detected"],
+        "executed_at": datetime.utcnow(),
+        "trajectory": recorder.encode() if recorder is not None else None,
+    }
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a history cursor cannot be decoded"""
+
+
+def encode_cursor(executed_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing at one history row"""
+    payload = json.dumps([executed_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        executed_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(executed_at), int(row_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise InvalidCursorError(cursor) from e
+
+
+def as_utc_naive(value: datetime) -> datetime:
+    """executed_at is stored as naive UTC, so convert aware datetimes to that"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+async def get_history_page(
+    db: AsyncSession,
+    robot_id: str,
+    limit: int,
+    cursor: str | None = None,
+    obstacle_detected: bool | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    order: str = "desc",
+) -> tuple[list[CommandHistory], str | None]:
+    """
+    One page of a robot's command history ordered by (executed_at, id), and
+    the cursor of the next page or None on the last page.
+
+    The page starts right after the cursor row using a row-value comparison,
+    so every page is a range scan of the robot's composite index no matter
+    how deep it is. since is inclusive and until is exclusive.
+    """
+    if order not in HISTORY_ORDERS:
+        raise ValueError(f"Unknown history order: {order}")
+
+    key = tuple_(CommandHistory.executed_at, CommandHistory.id)
+    stmt = select(CommandHistory).where(CommandHistory.robot_id == robot_id)
+    if obstacle_detected is not None:
+        stmt = stmt.where(CommandHistory.obstacle_detected == obstacle_detected)
+    if since is not None:
+        stmt = stmt.where(CommandHistory.executed_at >= as_utc_naive(since))
+    if until is not None:
+        stmt = stmt.where(CommandHistory.executed_at < as_utc_naive(until))
+    if cursor is not None:
+        position = tuple_(*decode_cursor(cursor))
+        stmt = stmt.where(key < position if order == "desc" else key > position)
+
+    if order == "desc":
+        stmt = stmt.order_by(
+            CommandHistory.executed_at.desc(), CommandHistory.id.desc()
+        )
+    else:
+        stmt = stmt.order_by(CommandHistory.executed_at, CommandHistory.id)
+
+    # One extra row tells whether another page follows
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = list(result.scalars().all())
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].executed_at, rows[-1].id)
@@ -1,4 +1,7 @@
 import logging
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from collections.abc import Set as AbstractSet
 from typing import Any
 
 from sqlalchemy.exc import SQLAlchemyError
@@ -6,18 +9,64 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from src.models.robot import Direction, Position, Robot
-from src.services.robot_service import RobotCommandExecutor
+from src.services import metrics
+from src.services.obstacle_cache import ObstacleCache, get_obstacle_version
+from src.services.obstacle_index import ObstacleIndex
+from src.services.offload import ExecutionOffloader
+from src.services.robot_service import (
+    CompiledCommandExecutor,
+    RobotCommandExecutor,
+    SegmentCommandExecutor,
+    TrajectoryPoint,
+    get_command_executor,
+    iter_segments,
+    iter_steps,
+    status_of,
+)
+from src.services.trajectory import TrajectoryRecorder
+from src.settings import settings
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 
+def record_execution(
+    executor: RobotCommandExecutor,
+    elapsed: float,
+    length: int,
+    obstacle_detected: bool,
+    path: str = "inline",
+) -> None:
+    metrics.execution_duration.observe(elapsed, (executor.name, path))
+    metrics.command_length.observe(length)
+    if obstacle_detected:
+        metrics.obstacle_hits.inc()
+
+
+def robot_at(result: dict[str, Any]) -> Robot:
+    """A robot in the state a status dictionary describes"""
+    robot = Robot(
+        position=(result["position"]["x"], result["position"]["y"]),
+        direction=Direction[result["direction"]],
+    )
+    robot.obstacle_detected = result["obstacle_detected"]
+    return robot
+
+
 class CommandProcessor:
     """Service for processing robot commands with obstacle detection"""
 
-    def __init__(self, db_session: AsyncSession):
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        executor: RobotCommandExecutor | None = None,
+        obstacle_cache: ObstacleCache | None = None,
+        offloader: ExecutionOffloader | None = None,
+    ):
         self.db_session = db_session
-        self.executor = RobotCommandExecutor()
+        self.executor = executor or get_command_executor(settings.COMMAND_EXECUTOR)
+        self.obstacle_cache = obstacle_cache
+        self.offloader = offloader
 
     async def get_obstacles(self) -> set[Position]:
         """
@@ -26,12 +75,15 @@ class CommandProcessor:
         from src.models.database import Obstacle
 
         try:
+            started = time.perf_counter()
             result = await self.db_session.execute(select(Obstacle))
             obstacles = result.scalars().all()
-            return {
+            positions = {
                 Position(obstacle.position_x, obstacle.position_y)
                 for obstacle in obstacles
             }
+            metrics.obstacle_query_duration.observe(time.perf_counter() - started)
+            return positions
         except SQLAlchemyError as e:
             logger.error(f"Database error while fetching obstacles: {e}")
             raise
@@ -39,11 +91,100 @@ class CommandProcessor:
             logger.error(f"Unexpected error while fetching obstacles: {e}")
             raise
 
+    async def load_obstacles(self) -> AbstractSet[Position]:
+        """
+        Get obstacles through the obstacle cache when one is configured,
+        falling back to a full read of the obstacles table
+        """
+        started = time.perf_counter()
+        obstacles: AbstractSet[Position]
+        if self.obstacle_cache is None:
+            obstacles = await self.get_obstacles()
+        else:
+            obstacles = await self.obstacle_cache.get(
+                self.db_session, self.get_obstacles
+            )
+        metrics.obstacle_load_duration.observe(time.perf_counter() - started)
+        return obstacles
+
+    async def load_versioned_obstacles(self) -> tuple[AbstractSet[Position], int]:
+        """
+        Obstacles together with the obstacle table generation they belong to,
+        for results that are cached per generation
+        """
+        if self.obstacle_cache is None:
+            # Read first, so a concurrent change can only make it look older
+            version = await get_obstacle_version(self.db_session)
+            return await self.load_obstacles(), version
+        obstacles = await self.load_obstacles()
+        return obstacles, self.obstacle_cache.version or 0
+
+    def execute(
+        self,
+        executor: RobotCommandExecutor,
+        robot: Robot,
+        command_string: str,
+        obstacles: AbstractSet[Position],
+        recorder: TrajectoryRecorder | None = None,
+    ) -> dict[str, Any]:
+        """Run one command string through an executor and record its metrics"""
+        started = time.perf_counter()
+        result = executor.execute_commands(robot, command_string, obstacles, recorder)
+        record_execution(
+            executor,
+            time.perf_counter() - started,
+            len(command_string),
+            result["obstacle_detected"],
+        )
+        return result
+
+    def should_offload(self, length: int) -> bool:
+        """Whether commands of this total length run in a worker process"""
+        return self.offloader is not None and self.offloader.should_offload(length)
+
+    async def offload(
+        self,
+        executor: RobotCommandExecutor,
+        command_strings: Sequence[str],
+        start_position: tuple[int, int],
+        start_direction: Direction,
+        recorders: Sequence[TrajectoryRecorder | None] | None = None,
+        obstacles: tuple[AbstractSet[Position], int] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Run command strings in order in a worker process, each starting where
+        the previous one stopped. obstacles, with their version, are loaded
+        unless given.
+        """
+        assert self.offloader is not None
+        positions, version = obstacles or await self.load_versioned_obstacles()
+        results, elapsed = await self.offloader.execute(
+            executor.name,
+            positions,
+            version,
+            start_position,
+            start_direction,
+            command_strings,
+            recorders,
+        )
+        for command_string, result, seconds in zip(
+            command_strings, results, elapsed, strict=True
+        ):
+            record_execution(
+                executor,
+                seconds,
+                len(command_string),
+                result["obstacle_detected"],
+                "process",
+            )
+        return results
+
     async def process_commands(
         self,
         command_string: str,
         start_position: tuple[int, int],
         start_direction: Direction,
+        recorder: TrajectoryRecorder | None = None,
     ) -> dict[str, Any]:
         """
         Process a command string and return the final robot state.
@@ -54,9 +195,174 @@ class CommandProcessor:
             if not isinstance(command_string, str):
                 raise ValueError("Command string must be a string")
 
+            if self.should_offload(len(command_string)):
+                results = await self.offload(
+                    self.executor,
+                    [command_string],
+                    start_position,
+                    start_direction,
+                    [recorder],
+                )
+                return results[0]
+
             robot = Robot(position=start_position, direction=start_direction)
-            obstacles = await self.get_obstacles()
-            return self.executor.execute_commands(robot, command_string, obstacles)
+            obstacles = await self.load_obstacles()
+            return self.execute(
+                self.executor, robot, command_string, obstacles, recorder
+            )
         except Exception as e:
             logger.error(f"Error processing commands '{command_string}': {e}")
             raise
+
+    async def trace_commands(
+        self,
+        command_string: str,
+        start_position: tuple[int, int],
+        start_direction: Direction,
+        by_segment: bool = False,
+        recorder: TrajectoryRecorder | None = None,
+    ) -> tuple[dict[str, Any], Iterator[TrajectoryPoint]]:
+        """
+        Process a command string and return the final robot state together
+        with a lazy iterator over the trajectory, per step or per segment.
+        The trajectory is replayed from the start only as it is consumed.
+        """
+        try:
+            robot = Robot(position=start_position, direction=start_direction)
+            obstacles = await self.load_obstacles()
+            result = self.execute(
+                self.executor, robot, command_string, obstacles, recorder
+            )
+
+            trace = iter_segments if by_segment else iter_steps
+            replay = Robot(position=start_position, direction=start_direction)
+            return result, trace(replay, command_string, obstacles)
+        except Exception as e:
+            logger.error(f"Error tracing commands '{command_string}': {e}")
+            raise
+
+    async def load_executor_obstacles(
+        self,
+        executor: RobotCommandExecutor,
+        obstacles: AbstractSet[Position] | None = None,
+    ) -> AbstractSet[Position]:
+        """
+        Obstacles for running many command strings with one executor, built
+        into an ObstacleIndex once when the executor needs ray queries.
+        Already loaded obstacles may be passed in.
+        """
+        if obstacles is None:
+            obstacles = await self.load_obstacles()
+        if isinstance(executor, SegmentCommandExecutor) and not isinstance(
+            obstacles, ObstacleIndex
+        ):
+            obstacles = ObstacleIndex(obstacles)
+        return obstacles
+
+    async def process_command_stream(
+        self,
+        chunks: AsyncIterator[str],
+        start_position: tuple[int, int],
+        start_direction: Direction,
+        recorder: TrajectoryRecorder | None = None,
+    ) -> dict[str, Any]:
+        """
+        Process a command string that arrives in chunks, executing each chunk
+        as soon as it is received and continuing from where the previous one
+        stopped. The stream is not read any further once an obstacle stops
+        the robot, so at most one chunk is held in memory. Chunks long enough
+        to be offloaded run in a worker process.
+        """
+        executor = self.executor
+        if isinstance(executor, CompiledCommandExecutor):
+            # Chunks are arbitrary slices of one upload and never repeat, so
+            # compiling them would only fill the program cache
+            executor = SegmentCommandExecutor()
+
+        try:
+            versioned = None
+            if self.offloader is not None:
+                versioned = await self.load_versioned_obstacles()
+            obstacles = await self.load_executor_obstacles(
+                executor, versioned[0] if versioned is not None else None
+            )
+            robot = Robot(position=start_position, direction=start_direction)
+            result = status_of(robot)
+            elapsed = 0.0
+            length = 0
+            offloaded = 0
+            # Whether an inline chunk stopped the robot; an offloaded chunk
+            # that hits an obstacle has already been counted by offload
+            inline_hit = False
+            async for chunk in chunks:
+                if versioned is not None and self.should_offload(len(chunk)):
+                    (result,) = await self.offload(
+                        executor,
+                        [chunk],
+                        robot.position,
+                        robot.direction,
+                        [recorder],
+                        versioned,
+                    )
+                    robot = robot_at(result)
+                    offloaded += 1
+                else:
+                    started = time.perf_counter()
+                    result = executor.execute_commands(
+                        robot, chunk, obstacles, recorder
+                    )
+                    elapsed += time.perf_counter() - started
+                    length += len(chunk)
+                    inline_hit = robot.obstacle_detected
+                if robot.obstacle_detected:
+                    break
+            if length or not offloaded:
+                # Offloaded chunks were recorded one by one
+                record_execution(executor, elapsed, length, inline_hit)
+            return result
+        except Exception as e:
+            logger.error(f"Error processing command stream: {e}")
+            raise
+
+    async def process_command_batch(
+        self,
+        command_strings: list[str],
+        start_position: tuple[int, int],
+        start_direction: Direction,
+        recorders: Sequence[TrajectoryRecorder | None] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Process several command strings in order, each starting where the
+        previous one stopped. Obstacles are loaded once for the whole batch.
+        recorders, if given, hold one optional recorder per command string.
+        A batch long enough in total runs in a worker process.
+        """
+        try:
+            if self.should_offload(sum(map(len, command_strings))):
+                return await self.offload(
+                    self.executor,
+                    command_strings,
+                    start_position,
+                    start_direction,
+                    recorders,
+                )
+
+            obstacles = await self.load_executor_obstacles(self.executor)
+
+            results = []
+            position, direction = start_position, start_direction
+            for i, command_string in enumerate(command_strings):
+                robot = Robot(position=position, direction=direction)
+                result = self.execute(
+                    self.executor,
+                    robot,
+                    command_string,
+                    obstacles,
+                    recorders[i] if recorders is not None else None,
+                )
+                results.append(result)
+                position, direction = robot.position, robot.direction
+            return results
+        except Exception as e:
+            logger.error(f"Error processing command batch: {e}")
+            raise
@@ -0,0 +1,238 @@
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from collections.abc import Set as AbstractSet
+from dataclasses import dataclass
+from typing import Any
+
+from src.models.robot import CLOCKWISE, DIRECTION_VECTORS, Direction, Position
+from src.services.obstacle_index import ObstacleIndex
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Runs of identical valid commands; anything else is ignored like in Robot
+_COMMAND_RUNS = re.compile(r"F+|B+|L+|R+")
+
+# Offsets and headings in a program are relative to the robot's start pose:
+# heading 0 is the start direction, 1 a quarter turn clockwise from it, and an
+# offset (x, y) is x cells to the robot's right and y cells ahead of it.
+_LOCAL_VECTORS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+def _rotate(offset: tuple[int, int], turns: int) -> tuple[int, int]:
+    """Rotate a local offset clockwise by a number of quarter turns"""
+    x, y = offset
+    for _ in range(turns % 4):
+        x, y = y, -x
+    return x, y
+
+
+@dataclass(frozen=True)
+class Segment:
+    """A straight run of moves, relative to the program's start pose"""
+
+    start: tuple[int, int]  # Offset of the cell the run starts from
+    facing: int  # Heading of the robot during the run
+    backward: bool
+    length: int
+
+    @property
+    def travel(self) -> int:
+        """Heading the robot moves in"""
+        return (self.facing + 2) % 4 if self.backward else self.facing
+
+    @property
+    def end(self) -> tuple[int, int]:
+        dx, dy = _LOCAL_VECTORS[self.travel]
+        return self.start[0] + dx * self.length, self.start[1] + dy * self.length
+
+    def turned(self, origin: tuple[int, int], turns: int) -> "Segment":
+        """This segment as seen from a pose at origin, turned by turns"""
+        x, y = _rotate(self.start, turns)
+        return Segment(
+            (origin[0] + x, origin[1] + y),
+            (self.facing + turns) % 4,
+            self.backward,
+            self.length,
+        )
+
+
+@dataclass(frozen=True)
+class CompiledProgram:
+    """
+    A command string reduced to its effect relative to the start pose.
+
+    rotation and displacement are the net quarter turns and net offset, and
+    bounds is the local box (min_x, min_y, max_x, max_y) of every cell the
+    robot enters, or None if it never moves. segments keep what is needed to
+    find the first obstacle when the box is not clear.
+    """
+
+    rotation: int
+    displacement: tuple[int, int]
+    segments: tuple[Segment, ...]
+    bounds: tuple[int, int, int, int] | None
+
+    @classmethod
+    def compile(cls, commands: str) -> "CompiledProgram":
+        facing = 0
+        offset = (0, 0)
+        segments: list[Segment] = []
+        for run in _COMMAND_RUNS.finditer(commands):
+            command = run.group()[0]
+            count = run.end() - run.start()
+            if command in "LR":
+                facing = (facing + (count if command == "R" else -count)) % 4
+                continue
+            segment = Segment(offset, facing, command == "B", count)
+            segments.append(segment)
+            offset = segment.end
+        return cls(facing, offset, tuple(segments), _bounds(segments))
+
+    def then(self, other: "CompiledProgram") -> "CompiledProgram":
+        """The program that runs this program and then other"""
+        segments = list(self.segments)
+        for segment in other.segments:
+            segment = segment.turned(self.displacement, self.rotation)
+            last = segments[-1] if segments else None
+            if (
+                last is not None
+                and last.end == segment.start
+                and (last.facing, last.backward) == (segment.facing, segment.backward)
+            ):
+                # The join is one longer run, as if the strings were one string
+                segment = Segment(
+                    last.start, last.facing, last.backward, last.length + segment.length
+                )
+                segments.pop()
+            segments.append(segment)
+
+        x, y = _rotate(other.displacement, self.rotation)
+        return CompiledProgram(
+            (self.rotation + other.rotation) % 4,
+            (self.displacement[0] + x, self.displacement[1] + y),
+            tuple(segments),
+            _bounds(segments),
+        )
+
+    def run(
+        self,
+        position: tuple[int, int],
+        direction: Direction,
+        obstacles: AbstractSet[Position] | None = None,
+    ) -> tuple[Position, Direction, bool]:
+        """
+        Final position, direction and whether an obstacle stopped the robot,
+        exactly as RobotCommandExecutor would leave it. When no obstacle lies
+        in the program's bounding box this is a constant-time transform;
+        otherwise every segment is checked with a ray query, stopping before
+        the first obstacle.
+        """
+        heading = CLOCKWISE.index(direction)
+        if obstacles and self.bounds is not None:
+            index = (
+                obstacles
+                if isinstance(obstacles, ObstacleIndex)
+                else ObstacleIndex(obstacles)
+            )
+            if index.any_within(*self._world_box(position, heading)):
+                return self._run_segments(position, heading, index)
+
+        x, y = self._to_world(position, heading, self.displacement)
+        return Position(x, y), CLOCKWISE[(heading + self.rotation) % 4], False
+
+    def _run_segments(
+        self, position: tuple[int, int], heading: int, index: ObstacleIndex
+    ) -> tuple[Position, Direction, bool]:
+        for segment in self.segments:
+            origin = self._to_world(position, heading, segment.start)
+            travel = CLOCKWISE[(heading + segment.travel) % 4]
+            blocker = index.first_obstacle(origin, travel, segment.length)
+            if blocker is not None:
+                dx, dy = DIRECTION_VECTORS[travel]
+                return (
+                    Position(blocker.x - dx, blocker.y - dy),
+                    CLOCKWISE[(heading + segment.facing) % 4],
+                    True,
+                )
+
+        x, y = self._to_world(position, heading, self.displacement)
+        return Position(x, y), CLOCKWISE[(heading + self.rotation) % 4], False
+
+    @staticmethod
+    def _to_world(
+        position: tuple[int, int], heading: int, offset: tuple[int, int]
+    ) -> tuple[int, int]:
+        # A local offset turned by the start heading is a world offset,
+        # since heading 0 in the world frame is NORTH (0, 1)
+        x, y = _rotate(offset, heading)
+        return position[0] + x, position[1] + y
+
+    def _world_box(
+        self, position: tuple[int, int], heading: int
+    ) -> tuple[int, int, int, int]:
+        assert self.bounds is not None
+        min_x, min_y, max_x, max_y = self.bounds
+        corners = [
+            self._to_world(position, heading, corner)
+            for corner in ((min_x, min_y), (max_x, max_y))
+        ]
+        xs, ys = [x for x, _ in corners], [y for _, y in corners]
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+def _bounds(segments: list[Segment]) -> tuple[int, int, int, int] | None:
+    if not segments:
+        return None
+    xs: list[int] = []
+    ys: list[int] = []
+    for segment in segments:
+        # The first cell entered, and the last
+        dx, dy = _LOCAL_VECTORS[segment.travel]
+        xs += [segment.start[0] + dx, segment.end[0]]
+        ys += [segment.start[1] + dy, segment.end[1]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class ProgramCache:
+    """
+    Bounded LRU of compiled programs keyed by a hash of the command string,
+    so long command strings are not kept alive as keys.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._programs: OrderedDict[bytes, CompiledProgram] = OrderedDict()
+
+    @staticmethod
+    def key(commands: str) -> bytes:
+        return hashlib.blake2b(commands.encode(), digest_size=16).digest()
+
+    def get(self, commands: str) -> CompiledProgram:
+        key = self.key(commands)
+        program = self._programs.get(key)
+        if program is not None:
+            self.hits += 1
+            self._programs.move_to_end(key)
+            return program
+
+        self.misses += 1
+        program = CompiledProgram.compile(commands)
+        self._programs[key] = program
+        if len(self._programs) > self.max_size:
+            self._programs.popitem(last=False)
+        return program
+
+    def clear(self) -> None:
+        self._programs.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._programs)}
+
+
+program_cache = ProgramCache(settings.PROGRAM_CACHE_SIZE)
@@ -0,0 +1,77 @@
+import hashlib
+import zlib
+from collections.abc import AsyncIterator, Iterator
+
+# Decompressed bytes produced per step while reading an archived command
+_READ_CHUNK = 64 * 1024
+
+
+class CommandUploadError(ValueError):
+    """Raised when an uploaded command stream exceeds the size limit"""
+
+
+class CommandArchive:
+    """
+    The stored form of an uploaded command string: a SHA-256 of the bytes
+    received and the same bytes zlib-compressed as they arrive, so the raw
+    text is never held in memory or written to the history table.
+    """
+
+    def __init__(self) -> None:
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._compressor = zlib.compressobj()
+        self._parts: list[bytes] = []
+        self._blob: bytes | None = None
+
+    def update(self, chunk: bytes) -> None:
+        if self._blob is not None:
+            raise RuntimeError("Archive is already closed")
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        compressed = self._compressor.compress(chunk)
+        if compressed:
+            self._parts.append(compressed)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def blob(self) -> bytes:
+        """The compressed bytes. Further updates are rejected after this."""
+        if self._blob is None:
+            self._parts.append(self._compressor.flush())
+            self._blob = b"".join(self._parts)
+            self._parts = []
+        return self._blob
+
+
+def iter_archived_command(blob: bytes) -> Iterator[bytes]:
+    """The original bytes of an archived command, decompressed in chunks"""
+    decompressor = zlib.decompressobj()
+    pending = blob
+    while pending:
+        chunk = decompressor.decompress(pending, _READ_CHUNK)
+        pending = decompressor.unconsumed_tail
+        if chunk:
+            yield chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+async def iter_command_chunks(
+    chunks: AsyncIterator[bytes], archive: CommandArchive, max_bytes: int
+) -> AsyncIterator[str]:
+    """
+    Decode an uploaded byte stream into command text chunk by chunk, adding
+    every chunk to the archive before it is handed on. Commands are single
+    ASCII letters and anything else is ignored by the robot, so bytes are
+    decoded as latin-1, which never fails and never splits a character.
+    """
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if archive.size + len(chunk) > max_bytes:
+            raise CommandUploadError(f"Command upload exceeds {max_bytes} bytes")
+        archive.update(chunk)
+        yield chunk.decode("latin-1")
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from types import TracebackType
+from typing import Any
+
+from src.services.pool import PoolStats, pool_stats
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimitError(Exception):
+    """Raised when a caller waited too long for a concurrency slot"""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits how many database sessions are open at once, adjusting the limit
+    to the pool checkout wait observed in PoolStats.
+
+    The limit is revised at most once per interval, on acquire: when the
+    average checkout wait of the last window exceeds target_wait the limit
+    shrinks by a quarter, and when callers had to queue for a slot without
+    the pool being slow it grows by one (additive increase, multiplicative
+    decrease). Requests beyond the limit queue here, in order, instead of
+    holding a pool checkout open until DB_POOL_TIMEOUT. A caller that queues
+    for longer than queue_timeout gets ConcurrencyLimitError.
+    """
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        target_wait: float,
+        queue_timeout: float,
+        interval: float = 1.0,
+        stats: PoolStats = pool_stats,
+    ) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Concurrency limits must satisfy 1 <= min <= max")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.target_wait = target_wait
+        self.queue_timeout = queue_timeout
+        self.interval = interval
+        self.in_use = 0
+        self.rejected = 0
+        self.increases = 0
+        self.decreases = 0
+        self._stats = stats
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._queued = False
+        self._adjusted_at = time.monotonic()
+
+    async def acquire(self) -> None:
+        self._adjust()
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return
+
+        self._queued = True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except (TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, TimeoutError):
+                self.rejected += 1
+                raise ConcurrencyLimitError(
+                    f"No database slot free within {self.queue_timeout} seconds"
+                ) from e
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        # Slots pass straight to the oldest waiters, so a new caller can never
+        # overtake one that is already queued
+        while self._waiters and self.in_use < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_use += 1
+                waiter.set_result(None)
+
+    def _adjust(self) -> None:
+        now = time.monotonic()
+        if now - self._adjusted_at < self.interval:
+            return
+        self._adjusted_at = now
+        queued, self._queued = self._queued, False
+        checkouts, average_wait = self._stats.take_window()
+        if checkouts and average_wait > self.target_wait:
+            limit = max(self.min_limit, int(self.limit * 0.75))
+            if limit < self.limit:
+                self.decreases += 1
+                logger.info(
+                    f"Lowering database concurrency to {limit}: "
+                    + f"average checkout wait {average_wait * 1000:.1f} ms"
+                )
+            self.limit = limit
+        elif queued and self.limit < self.max_limit:
+            self.limit += 1
+            self.increases += 1
+            self._wake()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "target_wait_seconds": self.target_wait,
+            "in_use": self.in_use,
+            "waiting": len(self._waiters),
+            "rejected": self.rejected,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
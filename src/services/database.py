@@ -1,38 +1,88 @@
 import logging
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
 
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
 
+from src.services.concurrency import AdaptiveConcurrencyLimiter
+from src.services.pool import (
+    ReplicaTimedQueuePool,
+    TimedQueuePool,
+    install_idle_pre_ping,
+)
 from src.settings import settings
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 
-try:
-    engine = create_async_engine(
-        settings.database_url,
-        pool_size=5,
-        max_overflow=10,
-        pool_recycle=3600,
+def create_engine(url: str, poolclass: type[TimedQueuePool]) -> AsyncEngine:
+    """An engine with the pool configured by the DB_POOL_* settings"""
+    db_engine = create_async_engine(
+        url,
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
         echo=False,
-        pool_pre_ping=True,
+        pool_pre_ping=settings.DB_POOL_PRE_PING == "always",
+    )
+    if settings.DB_POOL_PRE_PING == "idle":
+        install_idle_pre_ping(db_engine, settings.DB_POOL_PRE_PING_IDLE)
+    return db_engine
+
+
+try:
+    engine = create_engine(settings.database_url, TimedQueuePool)
+    read_engine = (
+        create_engine(settings.read_replica_url, ReplicaTimedQueuePool)
+        if settings.read_replica_url
+        else None
     )
 except Exception as e:
     logger.error(f"Failed to create database engine: {e}")
     raise
 
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+ReadSessionLocal = (
+    async_sessionmaker(read_engine, expire_on_commit=False) if read_engine else None
+)
+
+# Set for requests whose client wrote within READ_YOUR_WRITES_WINDOW, which
+# get_read_db then serves from the primary (see src/api/replica.py)
+read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+concurrency_limiter = (
+    AdaptiveConcurrencyLimiter(
+        min_limit=settings.DB_CONCURRENCY_MIN,
+        max_limit=settings.db_concurrency_max,
+        target_wait=settings.DB_CONCURRENCY_TARGET_WAIT,
+        queue_timeout=settings.DB_CONCURRENCY_QUEUE_TIMEOUT,
+    )
+    if settings.DB_ADAPTIVE_CONCURRENCY
+    else None
+)
 
 
 class Base(DeclarativeBase):
     pass
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    async with AsyncSessionLocal() as session:
+@asynccontextmanager
+async def session_scope(
+    session_factory: async_sessionmaker[AsyncSession],
+    limiter: AdaptiveConcurrencyLimiter | None = None,
+) -> AsyncIterator[AsyncSession]:
+    async with limiter or nullcontext(), session_factory() as session:
         try:
             yield session
         except SQLAlchemyError as e:
@@ -45,3 +95,35 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             raise
         finally:
             await session.close()
+
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with session_scope(AsyncSessionLocal, concurrency_limiter) as session:
+        yield session
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only routes: on the read replica when one is configured
+    and the client has not written recently, otherwise on the primary
+    """
+    if ReadSessionLocal is None or read_from_primary.get():
+        async with session_scope(AsyncSessionLocal, concurrency_limiter) as session:
+            yield session
+        return
+    async with session_scope(ReadSessionLocal) as session:
+        yield session
+
+
+@asynccontextmanager
+async def primary_session_for(read_db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    A primary session for a route that also holds a get_read_db session:
+    that session itself when get_read_db put it on the primary, so the
+    request never takes a second concurrency limiter slot, otherwise a new one
+    """
+    if ReadSessionLocal is None or read_from_primary.get():
+        yield read_db
+        return
+    async with session_scope(AsyncSessionLocal, concurrency_limiter) as session:
+        yield session
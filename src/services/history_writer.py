@@ -0,0 +1,151 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.models.database import CommandHistory
+from src.services import metrics
+from src.services.database import AsyncSessionLocal
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """
+    Write-behind writer for CommandHistory rows.
+
+    Rows are put on a bounded queue and a background task inserts them in
+    bulk once batch_size rows are waiting or flush_interval seconds have
+    passed since the first one. When the queue is full, enqueue waits, which
+    slows callers down instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_retries: int = 3,
+    ) -> None:
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(max_queue_size)
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped_rows = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self._task: asyncio.Task[None] | None = None
+
+    async def enqueue(self, rows: list[dict[str, Any]]) -> None:
+        """Queue history rows, waiting for space when the queue is full"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        for row in rows:
+            await self.queue.put(row)
+        metrics.history_queue_depth.set(self.queue.qsize())
+
+    async def flush(self) -> None:
+        """Wait until every row queued so far has been written or dropped"""
+        if self._task is not None:
+            await self.queue.join()
+
+    async def stop(self) -> None:
+        """Flush the queue and stop the background task"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+            finally:
+                metrics.history_queue_depth.set(self.queue.qsize())
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _write(self, batch: list[dict[str, Any]]) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(insert(CommandHistory), batch)
+                    await session.commit()
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(
+                    f"Failed to write {len(batch)} history rows "
+                    + f"(attempt {attempt}/{self.max_retries}): {e}"
+                )
+                await asyncio.sleep(min(0.1 * 2**attempt, 2.0))
+                continue
+
+            elapsed = time.perf_counter() - started
+            metrics.history_flush_duration.observe(elapsed)
+            self.flushes += 1
+            self.rows_written += len(batch)
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            return
+
+        self.dropped_rows += len(batch)
+        metrics.history_dropped_rows.inc(len(batch))
+        logger.error(f"Dropped {len(batch)} history rows after repeated failures")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped_rows": self.dropped_rows,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "avg_flush_seconds": (
+                self.total_flush_seconds / self.flushes if self.flushes else 0.0
+            ),
+        }
+
+
+history_writer = HistoryWriter(
+    max_queue_size=settings.HISTORY_QUEUE_SIZE,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+)
+
+
+def get_history_writer() -> HistoryWriter | None:
+    """The write-behind history writer, or None when history is synchronous"""
+    return history_writer if settings.HISTORY_WRITE_BEHIND else None
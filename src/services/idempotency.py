@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.database import IdempotencyRecord
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+ResponseBody = dict[str, Any]
+
+
+class IdempotencyKeyMismatchError(ValueError):
+    """Raised when an Idempotency-Key is reused with a different request"""
+
+
+def request_fingerprint(*parts: str) -> str:
+    """SHA-256 identifying a request by its route, robot and body"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class IdempotentRequest:
+    """A request sent with an Idempotency-Key"""
+
+    key: str
+    fingerprint: str
+
+
+@dataclass(frozen=True)
+class _StoredResponse:
+    fingerprint: str
+    body: ResponseBody
+    expires_at: float  # time.monotonic() deadline of the memory entry
+
+
+class IdempotencyStore:
+    """
+    Responses of requests sent with an Idempotency-Key, so a retried request
+    gets the first response back instead of executing again.
+
+    Responses are kept in the idempotency_keys table for ttl seconds and in
+    a bounded in-memory LRU in front of it, so a storm of retries of a recent
+    request is answered without touching the database. Duplicates that
+    arrive while the first request is still executing wait for its result
+    instead of executing alongside it.
+
+    The caller stages the database row in the same transaction as the work
+    itself (see stage), so a request is either executed and recorded or
+    neither. If two processes race on one key, the loser's commit fails on
+    the unique key and its request is answered from the winner's row.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: float = 86400.0,
+        purge_interval: float = 300.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.executed = 0
+        self.replayed = 0
+        self._entries: OrderedDict[str, _StoredResponse] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future[ResponseBody]] = {}
+        self._purged_at = time.monotonic()
+
+    async def execute_once(
+        self,
+        db: AsyncSession,
+        request: IdempotentRequest,
+        execute: Callable[[], Awaitable[ResponseBody]],
+    ) -> tuple[ResponseBody, bool]:
+        """
+        The response for request, from execute() if the key is new, and
+        whether it was replayed. Failed executions are not stored, so a
+        retry after an error executes again.
+        """
+        while True:
+            body = self._get(request)
+            if body is not None:
+                self.replayed += 1
+                return body, True
+
+            inflight = self._inflight.get(request.key)
+            if inflight is None:
+                break
+            try:
+                await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The first request failed; this one tries again itself
+
+        future: asyncio.Future[ResponseBody] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._inflight[request.key] = future
+        try:
+            body = await self._load(db, request)
+            if body is not None:
+                self.replayed += 1
+                future.set_result(body)
+                return body, True
+            try:
+                body = await execute()
+            except Exception:
+                # A concurrent request in another process may have won the key
+                await db.rollback()
+                body = await self._load(db, request)
+                if body is None:
+                    raise
+                self.replayed += 1
+                future.set_result(body)
+                return body, True
+            self.executed += 1
+            self._put(request, body)
+            future.set_result(body)
+            return body, False
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[request.key]
+
+    def stage(
+        self, db: AsyncSession, request: IdempotentRequest, body: ResponseBody
+    ) -> None:
+        """Add the row for request to db's transaction, to commit with the work"""
+        now = datetime.utcnow()
+        db.add(
+            IdempotencyRecord(
+                key=request.key,
+                fingerprint=request.fingerprint,
+                response=body,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl),
+            )
+        )
+
+    def _get(self, request: IdempotentRequest) -> ResponseBody | None:
+        entry = self._entries.get(request.key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[request.key]
+            return None
+        if entry.fingerprint != request.fingerprint:
+            raise IdempotencyKeyMismatchError(request.key)
+        self._entries.move_to_end(request.key)
+        return entry.body
+
+    def _put(
+        self, request: IdempotentRequest, body: ResponseBody, ttl: float | None = None
+    ) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[request.key] = _StoredResponse(
+            request.fingerprint, body, expires_at
+        )
+        self._entries.move_to_end(request.key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(
+        self, db: AsyncSession, request: IdempotentRequest
+    ) -> ResponseBody | None:
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(IdempotencyRecord).where(IdempotencyRecord.key == request.key)
+        )
+        record = result.scalars().first()
+        if record is not None and record.expires_at <= now:
+            # Deleted before the new row is inserted, in the same transaction
+            await db.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.id == record.id)
+            )
+            record = None
+        if record is None:
+            await self._purge(db, now)
+            return None
+        if record.fingerprint != request.fingerprint:
+            raise IdempotencyKeyMismatchError(request.key)
+        self._put(
+            request,
+            record.response,
+            ttl=(record.expires_at - now).total_seconds(),
+        )
+        return record.response
+
+    async def _purge(self, db: AsyncSession, now: datetime) -> None:
+        """Delete expired rows, at most once per purge_interval"""
+        if time.monotonic() - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = time.monotonic()
+        result = await db.execute(
+            delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= now)
+        )
+        await db.commit()
+        logger.info(f"Purged {result.rowcount} expired idempotency keys")
+
+    def clear(self) -> None:
+        """Forget the in-memory tier; the database rows are kept"""
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "in_flight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+        }
+
+
+idempotency_store = IdempotencyStore(
+    max_entries=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.IDEMPOTENCY_TTL,
+)
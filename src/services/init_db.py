@@ -1,65 +1,227 @@
 import logging
+from typing import Any
 
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy import (
+    Column,
+    Connection,
+    Table,
+    func,
+    insert,
+    inspect,
+    literal,
+    text,
+)
+from sqlalchemy.exc import OperationalError, ProgrammingError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
 from sqlalchemy.future import select
 
-from src.models.database import Base, Obstacle
+from src.models.database import SCHEMA_VERSION, Base, Obstacle, SchemaVersion
 from src.services.database import engine
+from src.settings import settings
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_OBSTACLES = ((1, 4), (3, 5), (7, 4))
+
+UPGRADE_HINT = "; run `python -m src.services.init_db create` to upgrade it"
+
+
+class SchemaVersionError(RuntimeError):
+    """Raised when the database schema does not match SCHEMA_VERSION"""
+
+
+async def get_schema_version(db_engine: AsyncEngine) -> int | None:
+    """The newest schema version recorded, or None if none was recorded"""
+    try:
+        async with db_engine.connect() as conn:
+            result = await conn.execute(select(func.max(SchemaVersion.version)))
+            return result.scalar()
+    except (OperationalError, ProgrammingError):
+        # No schema_version table: an empty database, or one created before
+        # schema versions were recorded
+        return None
+
+
+def _add_column(conn: Connection, table: Table, column: Column[Any]) -> None:
+    """ALTER TABLE ADD COLUMN, filling NOT NULL columns from their default"""
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} " + column.type.compile(
+        dialect=conn.dialect
+    )
+    if not column.nullable:
+        default = column.default
+        if default is None or not default.is_scalar:
+            raise SchemaVersionError(
+                f"Cannot add {table.name}.{column.name}: NOT NULL without a default"
+            )
+        value = literal(default.arg).compile(
+            dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+        )
+        ddl += f" NOT NULL DEFAULT {value}"
+    conn.execute(text(ddl))
+
+
+def _drop_not_null(conn: Connection, table: Table, columns: list[str]) -> None:
+    """Allow NULL in columns; SQLite can only do that by copying the table"""
+    if conn.dialect.name != "sqlite":
+        for name in columns:
+            conn.execute(
+                text(f"ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL")
+            )
+        return
+
+    old = f"_{table.name}_old"
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    for index in inspect(conn).get_indexes(old):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+    table.create(conn)
+    names = ", ".join(column.name for column in table.columns)
+    conn.execute(text(f"INSERT INTO {table.name} ({names}) SELECT {names} FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+
+def upgrade_tables(conn: Connection) -> None:
+    """
+    Bring existing tables up to the models: add the columns and indexes
+    added since they were created (robot_id, version, the history pagination
+    indexes, trajectory, the upload columns) and allow NULL where the models
+    do. Missing tables are left to create_all.
+    """
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        columns = {
+            column["name"]: column for column in inspector.get_columns(table.name)
+        }
+        for column in table.columns:
+            if column.name not in columns:
+                _add_column(conn, table, column)
+                logger.info(f"Added column {table.name}.{column.name}")
+
+        relaxed = [
+            column.name
+            for column in table.columns
+            if column.nullable
+            and column.name in columns
+            and not columns[column.name]["nullable"]
+        ]
+        if relaxed:
+            _drop_not_null(conn, table, relaxed)
+            logger.info(f"Allowed NULL in {table.name}: {', '.join(relaxed)}")
+
+        indexes = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(conn)
+                logger.info(f"Created index {index.name}")
+
+
+async def create_schema(db_engine: AsyncEngine) -> None:
+    """
+    Create missing tables, upgrade existing ones to the models and record
+    SCHEMA_VERSION
+    """
+    async with db_engine.begin() as conn:
+        await conn.run_sync(upgrade_tables)
+        await conn.run_sync(Base.metadata.create_all)
+        recorded = await conn.execute(
+            select(SchemaVersion.version).where(SchemaVersion.version == SCHEMA_VERSION)
+        )
+        if recorded.first() is None:
+            await conn.execute(insert(SchemaVersion).values(version=SCHEMA_VERSION))
+    logger.info(f"Database schema created at version {SCHEMA_VERSION}")
+
+
+async def has_tables(db_engine: AsyncEngine) -> bool:
+    async with db_engine.connect() as conn:
+        names = await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).get_table_names()
+        )
+    return bool(names)
+
+
+async def seed_obstacles(db_engine: AsyncEngine) -> int:
+    """Add the default obstacles to an empty obstacles table"""
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+
+    async with session_factory() as session:
+        try:
+            async with session.begin():
+                result = await session.execute(select(Obstacle.id).limit(1))
+                if result.first() is not None:
+                    logger.info(
+                        "Obstacles already exist in database, skipping initialization"
+                    )
+                    return 0
+                session.add_all(
+                    Obstacle(position_x=x, position_y=y) for x, y in DEFAULT_OBSTACLES
+                )
+        except SQLAlchemyError as e:
+            logger.error(f"Database error while initializing obstacles: {e}")
+            raise
+    logger.info(f"Added {len(DEFAULT_OBSTACLES)} default obstacles to the database")
+    return len(DEFAULT_OBSTACLES)
+
 
 async def init_db(custom_engine: AsyncEngine | None = None) -> None:
-    """Initialize the database with default data"""
+    """
+    Check the database on startup with a single query of schema_version.
+    Tables are only created in an empty database, and only while
+    DB_CREATE_SCHEMA is set. A database at another version, or with tables
+    but no recorded version, is refused until `init_db create` upgrades it.
+    """
     db_engine = custom_engine or engine
 
+    version = await get_schema_version(db_engine)
+    if version == SCHEMA_VERSION:
+        logger.info(f"Database schema is at version {version}")
+        return
+    if version is not None:
+        raise SchemaVersionError(
+            f"Database schema is at version {version}, expected {SCHEMA_VERSION}"
+            + (UPGRADE_HINT if version < SCHEMA_VERSION else "")
+        )
+    if await has_tables(db_engine):
+        # create_all would only add the missing tables, and recording the
+        # version would hide the missing columns of the existing ones
+        raise SchemaVersionError(
+            "Database has tables but no recorded schema version" + UPGRADE_HINT
+        )
+    if not settings.DB_CREATE_SCHEMA:
+        raise SchemaVersionError(
+            "Database schema version not recorded; "
+            + "run `python -m src.services.init_db create`"
+        )
+    await create_schema(db_engine)
+
+
+async def main(command: str) -> None:
     try:
-        async with db_engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database tables created successfully")
-
-        from sqlalchemy.ext.asyncio import async_sessionmaker
-
-        session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
-
-        async with session_factory() as session:
-            try:
-                async with session.begin():
-                    result = await session.execute(select(Obstacle))
-                    if result.scalars().first() is None:
-                        default_obstacles = [
-                            Obstacle(position_x=1, position_y=4),
-                            Obstacle(position_x=3, position_y=5),
-                            Obstacle(position_x=7, position_y=4),
-                        ]
-                        session.add_all(default_obstacles)
-                        await session.commit()
-                        logger.info(
-                            f"Added {len(default_obstacles)} default obstacles "
-                            + "to the database"
-                        )
-                    else:
-                        logger.info(
-                            "Obstacles already exist in database, "
-                            + "skipping initialization"
-                        )
-            except SQLAlchemyError as e:
-                await session.rollback()
-                logger.error(f"Database error while initializing obstacles: {e}")
-                raise
-            except Exception as e:
-                await session.rollback()
-                logger.error(f"Unexpected error while initializing obstacles: {e}")
-                raise
-
-        logger.info("Database initialization complete")
-    except Exception as e:
-        logger.error(f"Failed to initialize database: {e}")
-        raise
+        if command in ("create", "setup"):
+            await create_schema(engine)
+        if command in ("seed", "setup"):
+            await seed_obstacles(engine)
+        if command == "check":
+            version = await get_schema_version(engine)
+            print(f"schema version {version}, expected {SCHEMA_VERSION}")
+            if version != SCHEMA_VERSION:
+                raise SystemExit(1)
+    finally:
+        await engine.dispose()
 
 
 if __name__ == "__main__":
+    import argparse
     import asyncio
 
-    asyncio.run(init_db())
+    parser = argparse.ArgumentParser(description="Prepare the Moon Robot database")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="setup",
+        choices=("setup", "create", "seed", "check"),
+        help="create the tables, add the default obstacles, both (setup), "
+        + "or check the recorded schema version",
+    )
+    asyncio.run(main(parser.parse_args().command))
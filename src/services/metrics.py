@@ -0,0 +1,294 @@
+import bisect
+import math
+from collections.abc import Sequence
+
+# Request and database latencies in seconds
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+# Command string lengths in characters
+LENGTH_BUCKETS = (1, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+class Counter:
+    """A monotonically increasing count, one per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Labels = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def reset(self) -> None:
+        self._values.clear()
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} "
+            + _format_value(value)
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge:
+    """A value that goes up and down, one per combination of label values"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self._values[labels] = value
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def reset(self) -> None:
+        self._values.clear()
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} "
+            + _format_value(value)
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class _HistogramSeries:
+    __slots__ = ("count", "counts", "sum")
+
+    def __init__(self, buckets: int) -> None:
+        # One slot per bucket and one for values above the last bound
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    """
+    Observations counted into fixed buckets, one series per combination of
+    label values. Observing is a bisect and three increments; the cumulative
+    bucket counts Prometheus expects are only computed when rendering.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series: dict[Labels, _HistogramSeries] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.buckets))
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.count += 1
+        series.sum += value
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return series.count if series is not None else 0
+
+    def reset(self) -> None:
+        self._series.clear()
+
+    def render(self) -> list[str]:
+        lines = []
+        bucket_names = (*self.labelnames, "le")
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(
+                (*self.buckets, math.inf), series.counts, strict=True
+            ):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket"
+                    + _format_labels(bucket_names, (*labels, _format_value(bound)))
+                    + f" {cumulative}"
+                )
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{suffix} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of one process, rendered in the Prometheus text format"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._register(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, help, labelnames)
+        self._register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ) -> Histogram:
+        metric = Histogram(name, help, buckets, labelnames)
+        self._register(metric)
+        return metric
+
+    def _register(self, metric: Counter | Gauge | Histogram) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to handle an HTTP request, by route template",
+    labelnames=("method", "route", "status"),
+)
+obstacle_query_duration = registry.histogram(
+    "robot_obstacle_query_seconds",
+    "Time to read all obstacles from the database",
+)
+obstacle_load_duration = registry.histogram(
+    "robot_obstacle_load_seconds",
+    "Time to get obstacles for a command, through the obstacle cache if enabled",
+)
+obstacle_cache_lookups = registry.counter(
+    "robot_obstacle_cache_lookups_total",
+    "Obstacle cache lookups, by whether the cached obstacles were current",
+    labelnames=("result",),
+)
+obstacle_cache_rebuilds = registry.counter(
+    "robot_obstacle_cache_rebuilds_total",
+    "Times the obstacle cache reloaded the obstacles and rebuilt its index",
+)
+execution_duration = registry.histogram(
+    "robot_command_execution_seconds",
+    "Time spent in the command executor, per command string, inline on the "
+    + "event loop or in a worker process",
+    labelnames=("executor", "path"),
+)
+offload_queue_duration = registry.histogram(
+    "robot_offload_queue_seconds",
+    "Time an offloaded execution spent waiting for and being sent to a worker",
+)
+commit_duration = registry.histogram(
+    "robot_commit_seconds",
+    "Time to commit robot state and command history",
+)
+command_length = registry.histogram(
+    "robot_command_length",
+    "Length of executed command strings in characters",
+    buckets=LENGTH_BUCKETS,
+)
+obstacle_hits = registry.counter(
+    "robot_obstacle_hits_total",
+    "Command strings stopped by an obstacle",
+)
+history_queue_depth = registry.gauge(
+    "robot_history_queue_depth",
+    "History rows waiting for the write-behind writer",
+)
+history_flush_duration = registry.histogram(
+    "robot_history_flush_seconds",
+    "Time to insert one batch of queued history rows",
+)
+history_dropped_rows = registry.counter(
+    "robot_history_dropped_rows_total",
+    "History rows dropped after every retry of their flush failed",
+)
+plan_duration = registry.histogram(
+    "robot_plan_seconds",
+    "Time to plan a command string, by outcome",
+    labelnames=("outcome",),
+)
+pool_checkout_duration = registry.histogram(
+    "db_pool_checkout_seconds",
+    "Time to check a connection out of an engine's pool, including waiting",
+    labelnames=("engine",),
+)
+pool_checkout_timeouts = registry.counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up waiting for a free connection",
+    labelnames=("engine",),
+)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from itertools import chain
+from typing import Any
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.models.database import Obstacle, ObstacleVersion
+from src.services import metrics
+from src.services.obstacle_index import ObstacleIndex
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Single row holding the obstacles table generation
+OBSTACLE_VERSION_ID = 1
+
+ObstacleLoader = Callable[[], Awaitable[Iterable[tuple[int, int]]]]
+
+
+async def get_obstacle_version(db_session: AsyncSession) -> int:
+    """Read the current obstacles table generation with a primary key lookup"""
+    result = await db_session.execute(
+        select(ObstacleVersion.version).where(ObstacleVersion.id == OBSTACLE_VERSION_ID)
+    )
+    return result.scalar_one_or_none() or 0
+
+
+async def bump_obstacle_version(db_session: AsyncSession) -> None:
+    """
+    Increment the obstacles table generation.
+    Writers that bypass the ORM (bulk inserts, raw SQL) must call this in the
+    same transaction as their change; ORM flushes are handled automatically.
+    """
+    await db_session.run_sync(lambda session: _bump_version(session.connection()))
+    db_session.info["obstacles_changed"] = True
+
+
+def _bump_version(connection: Any) -> None:
+    result = connection.execute(
+        update(ObstacleVersion)
+        .where(ObstacleVersion.id == OBSTACLE_VERSION_ID)
+        .values(version=ObstacleVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            insert(ObstacleVersion).values(id=OBSTACLE_VERSION_ID, version=1)
+        )
+
+
+class ObstacleCache:
+    """
+    Process-level cache of the obstacle set.
+
+    The cached ObstacleIndex is tagged with the obstacle table generation it
+    was built from. Each lookup compares that tag with the current generation
+    and only reloads the obstacles when they differ. With max_staleness set,
+    the generation check itself is skipped for that many seconds after the
+    last successful check.
+    """
+
+    def __init__(self, max_staleness: float = 0.0) -> None:
+        self.max_staleness = max_staleness
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self._index: ObstacleIndex | None = None
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int | None:
+        """Generation of the cached obstacles, or None when empty"""
+        return self._version if self._index is not None else None
+
+    def _is_fresh(self, now: float) -> bool:
+        return (
+            self._index is not None
+            and self.max_staleness > 0
+            and now - self._checked_at < self.max_staleness
+        )
+
+    async def get(
+        self, db_session: AsyncSession, loader: ObstacleLoader
+    ) -> ObstacleIndex:
+        """
+        Return the cached obstacles, reloading them with loader when the
+        obstacle table generation has changed.
+        """
+        if self._is_fresh(time.monotonic()):
+            self.hits += 1
+            metrics.obstacle_cache_lookups.inc(labels=("hit",))
+            return self._index  # type: ignore[return-value]
+
+        version = await get_obstacle_version(db_session)
+        if self._index is not None and version == self._version:
+            self.hits += 1
+            metrics.obstacle_cache_lookups.inc(labels=("hit",))
+            self._checked_at = time.monotonic()
+            return self._index
+
+        self.misses += 1
+        metrics.obstacle_cache_lookups.inc(labels=("miss",))
+        async with self._lock:
+            # Another request may have rebuilt the cache while we waited
+            if self._index is None or self._version != version:
+                index = ObstacleIndex(await loader())
+                self._index, self._version = index, version
+                self.rebuilds += 1
+                metrics.obstacle_cache_rebuilds.inc()
+                logger.info(
+                    f"Rebuilt obstacle cache at version {version} "
+                    + f"with {len(index)} obstacles"
+                )
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def invalidate(self) -> None:
+        """Drop the cached obstacles so the next lookup reloads them"""
+        self._index = None
+        self._version = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "version": self.version,
+            "size": len(self._index) if self._index is not None else 0,
+        }
+
+
+obstacle_cache = ObstacleCache(max_staleness=settings.OBSTACLE_CACHE_MAX_STALENESS)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_obstacle_changes(session: Session, flush_context: Any) -> None:
+    """Bump the obstacle generation in the same transaction as ORM changes"""
+    if any(
+        isinstance(instance, Obstacle)
+        for instance in chain(session.new, session.dirty, session.deleted)
+    ):
+        _bump_version(session.connection())
+        session.info["obstacles_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    """Make this process see its own obstacle changes without any staleness"""
+    if session.info.pop("obstacles_changed", False):
+        obstacle_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("obstacles_changed", None)
@@ -0,0 +1,210 @@
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.database import Obstacle
+from src.services.obstacle_cache import bump_obstacle_version
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = {"csv", "ndjson"}
+
+ObstacleBatch = list[tuple[int, int]]
+
+
+class ObstacleImportError(ValueError):
+    """Raised when an uploaded obstacle file contains an invalid row"""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Split a stream of byte chunks into lines without buffering it all. Lines
+    are decoded by the caller, so a row that is not UTF-8 is reported like
+    any other invalid row.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def _parse_csv_line(line: str) -> tuple[int, int] | None:
+    fields = [field.strip() for field in line.split(",")]
+    if len(fields) != 2:
+        raise ObstacleImportError("expected two comma separated coordinates")
+    try:
+        return int(fields[0]), int(fields[1])
+    except ValueError:
+        # A header row such as "x,y" is allowed and skipped
+        if all(field.isidentifier() for field in fields):
+            return None
+        raise
+
+
+def _parse_ndjson_line(line: str) -> tuple[int, int]:
+    row = json.loads(line)
+    if isinstance(row, list) and len(row) == 2:
+        x, y = row
+    elif isinstance(row, dict):
+        x = row.get("x", row.get("position_x"))
+        y = row.get("y", row.get("position_y"))
+    else:
+        raise ObstacleImportError("expected an object with x and y or a pair")
+    # bool is an int subclass, but true and false are not coordinates
+    if type(x) is not int or type(y) is not int:
+        raise ObstacleImportError("coordinates must be integers")
+    return x, y
+
+
+async def iter_obstacle_batches(
+    chunks: AsyncIterator[bytes], fmt: str, batch_size: int
+) -> AsyncIterator[ObstacleBatch]:
+    """
+    Parse an uploaded CSV or NDJSON stream into batches of coordinates.
+    Blank lines are skipped; any other invalid row raises ObstacleImportError.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ObstacleImportError(f"Unsupported format: {fmt}")
+
+    batch: ObstacleBatch = []
+    line_number = 0
+    async for raw_line in iter_lines(chunks):
+        line_number += 1
+        if not raw_line.strip():
+            continue
+        try:
+            line = raw_line.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise ObstacleImportError(
+                f"Invalid row on line {line_number}: not UTF-8"
+            ) from e
+        try:
+            if fmt == "csv":
+                row = _parse_csv_line(line)
+                if row is None and line_number == 1:
+                    continue
+            else:
+                row = _parse_ndjson_line(line)
+        except ValueError as e:
+            raise ObstacleImportError(f"Invalid row on line {line_number}: {e}") from e
+        if row is None:
+            raise ObstacleImportError(f"Invalid row on line {line_number}: {line!r}")
+
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _copy_import(
+    db: AsyncSession, batches: AsyncIterator[ObstacleBatch]
+) -> tuple[int, int]:
+    """Stream batches into a temporary table with COPY, then merge them"""
+    # Runs through the session first so the COPY joins its transaction
+    await db.execute(
+        text(
+            "CREATE TEMP TABLE obstacle_import "
+            + "(position_x integer, position_y integer) ON COMMIT DROP"
+        )
+    )
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection: Any = raw_connection.driver_connection
+
+    received = 0
+    async for batch in batches:
+        await driver_connection.copy_records_to_table(
+            "obstacle_import", records=batch, columns=["position_x", "position_y"]
+        )
+        received += len(batch)
+
+    result = await db.execute(
+        text(
+            "INSERT INTO obstacles (position_x, position_y, created_at) "
+            + "SELECT DISTINCT position_x, position_y, timezone('utc', now()) "
+            + "FROM obstacle_import "
+            + "ON CONFLICT ON CONSTRAINT uq_obstacle_position DO NOTHING"
+        )
+    )
+    return received, result.rowcount
+
+
+def insert_skipping_existing(dialect_name: str) -> Any:
+    """INSERT into obstacles that skips positions already present"""
+    if dialect_name == "sqlite":
+        # Imported here so the PostgreSQL deployment does not load the dialect
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        return sqlite_insert(Obstacle).on_conflict_do_nothing(
+            index_elements=["position_x", "position_y"]
+        )
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+
+        return postgresql_insert(Obstacle).on_conflict_do_nothing(
+            constraint="uq_obstacle_position"
+        )
+    return insert(Obstacle)
+
+
+async def _executemany_import(
+    db: AsyncSession, batches: AsyncIterator[ObstacleBatch]
+) -> tuple[int, int]:
+    """Insert batches with one executemany per batch"""
+    connection = await db.connection()
+    statement = insert_skipping_existing(connection.dialect.name)
+
+    received = inserted = 0
+    async for batch in batches:
+        now = datetime.utcnow()
+        result = await connection.execute(
+            statement,
+            [{"position_x": x, "position_y": y, "created_at": now} for x, y in batch],
+        )
+        received += len(batch)
+        inserted += max(result.rowcount, 0)
+    return received, inserted
+
+
+async def import_obstacles(
+    db: AsyncSession, batches: AsyncIterator[ObstacleBatch]
+) -> dict[str, Any]:
+    """
+    Insert obstacle batches in a single transaction, skipping positions that
+    already exist. Uses COPY on PostgreSQL with asyncpg and chunked
+    executemany everywhere else. The caller is responsible for committing.
+    """
+    started = time.perf_counter()
+    connection = await db.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == (
+        "asyncpg"
+    ):
+        received, inserted = await _copy_import(db, batches)
+    else:
+        received, inserted = await _executemany_import(db, batches)
+
+    if inserted:
+        await bump_obstacle_version(db)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Imported {inserted} of {received} obstacles in {elapsed:.3f}s")
+    return {
+        "received": received,
+        "inserted": inserted,
+        "skipped": received - inserted,
+        "elapsed_seconds": round(elapsed, 6),
+        "rows_per_second": round(received / elapsed, 1) if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,151 @@
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterable, Iterator
+from collections.abc import Set as AbstractSet
+from typing import TYPE_CHECKING
+
+from src.models.robot import DIRECTION_VECTORS, Direction, Position
+
+if TYPE_CHECKING:
+    from src.models.database import Obstacle
+
+
+class ObstacleIndex(AbstractSet[Position]):
+    """
+    Obstacle set that can answer ray queries.
+
+    Obstacles are kept as sorted x values per row and sorted y values per
+    column, so the first obstacle along a row or column is found by binary
+    search. It behaves like a read-only set of positions, so it can be passed
+    anywhere a set of obstacles is expected.
+    """
+
+    def __init__(self, positions: Iterable[tuple[int, int]] = ()) -> None:
+        self._positions: set[Position] = set()
+        self._rows: dict[int, list[int]] = {}
+        self._columns: dict[int, list[int]] = {}
+
+        for x, y in positions:
+            position = Position(x, y)
+            if position in self._positions:
+                continue
+            self._positions.add(position)
+            self._rows.setdefault(y, []).append(x)
+            self._columns.setdefault(x, []).append(y)
+
+        for line in (*self._rows.values(), *self._columns.values()):
+            line.sort()
+
+    @classmethod
+    def from_obstacles(cls, obstacles: Iterable["Obstacle"]) -> "ObstacleIndex":
+        """Build an index from Obstacle rows"""
+        return cls((obstacle.position_x, obstacle.position_y) for obstacle in obstacles)
+
+    @property
+    def cells(self) -> AbstractSet[Position]:
+        """
+        The obstacle positions as a plain set, for loops that test membership
+        many times; it must not be modified
+        """
+        return self._positions
+
+    def __contains__(self, position: object) -> bool:
+        return position in self._positions
+
+    def __iter__(self) -> Iterator[Position]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} obstacles)"
+
+    def add(self, x: int, y: int) -> bool:
+        """Insert an obstacle. Returns False if it was already present."""
+        position = Position(x, y)
+        if position in self._positions:
+            return False
+
+        self._positions.add(position)
+        insort(self._rows.setdefault(y, []), x)
+        insort(self._columns.setdefault(x, []), y)
+        return True
+
+    def discard(self, x: int, y: int) -> bool:
+        """Remove an obstacle. Returns False if it was not present."""
+        position = Position(x, y)
+        if position not in self._positions:
+            return False
+
+        self._positions.remove(position)
+        self._remove_from_line(self._rows, y, x)
+        self._remove_from_line(self._columns, x, y)
+        return True
+
+    @staticmethod
+    def _remove_from_line(lines: dict[int, list[int]], key: int, value: int) -> None:
+        line = lines[key]
+        del line[bisect_left(line, value)]
+        if not line:
+            del lines[key]
+
+    def first_obstacle(
+        self,
+        origin: tuple[int, int],
+        direction: Direction,
+        max_distance: int | None = None,
+    ) -> Position | None:
+        """
+        Return the closest obstacle strictly ahead of origin in the given
+        direction, or None if there is none within max_distance cells.
+        The origin cell itself is never reported.
+        """
+        x, y = origin
+        dx, dy = DIRECTION_VECTORS[direction]
+
+        if dx:
+            line, start, step = self._rows.get(y), x, dx
+        else:
+            line, start, step = self._columns.get(x), y, dy
+
+        if not line:
+            return None
+
+        if step > 0:
+            i = bisect_right(line, start)
+            if i == len(line):
+                return None
+            hit = line[i]
+        else:
+            i = bisect_left(line, start) - 1
+            if i < 0:
+                return None
+            hit = line[i]
+
+        if max_distance is not None and abs(hit - start) > max_distance:
+            return None
+        return Position(hit, y) if dx else Position(x, hit)
+
+    def any_within(self, min_x: int, min_y: int, max_x: int, max_y: int) -> bool:
+        """
+        Whether any obstacle lies in the box, bounds included. Scans whichever
+        is smallest: the rows, the columns or the obstacles themselves.
+        """
+        if not self._positions or min_x > max_x or min_y > max_y:
+            return False
+
+        width, height = max_x - min_x + 1, max_y - min_y + 1
+        if len(self._positions) <= min(width, height):
+            return any(
+                min_x <= x <= max_x and min_y <= y <= max_y for x, y in self._positions
+            )
+
+        if height <= width:
+            lines, first, last, low, high = self._rows, min_y, max_y, min_x, max_x
+        else:
+            lines, first, last, low, high = self._columns, min_x, max_x, min_y, max_y
+        for key in range(first, last + 1):
+            line = lines.get(key)
+            if line and bisect_left(line, low) < bisect_right(line, high):
+                return True
+        return False
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from array import array
+from collections.abc import Sequence
+from collections.abc import Set as AbstractSet
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any
+
+from src.models.robot import Direction, Position, Robot
+from src.services import metrics
+from src.services.obstacle_index import ObstacleIndex
+from src.services.robot_service import get_command_executor
+from src.services.trajectory import TrajectoryRecorder
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Obstacles of the version a worker process last received, kept between tasks
+_worker_obstacles: tuple[int, ObstacleIndex] | None = None
+
+
+class MissingObstaclesError(LookupError):
+    """Raised in a worker asked to run on an obstacle version it does not hold"""
+
+
+def encode_obstacles(obstacles: AbstractSet[Position]) -> bytes:
+    """Obstacle positions as packed 32-bit x, y pairs, like the Integer columns"""
+    coordinates = array("i")
+    for x, y in obstacles:
+        coordinates.append(x)
+        coordinates.append(y)
+    return coordinates.tobytes()
+
+
+def decode_obstacles(snapshot: bytes) -> ObstacleIndex:
+    coordinates = array("i")
+    coordinates.frombytes(snapshot)
+    return ObstacleIndex(zip(coordinates[::2], coordinates[1::2], strict=True))
+
+
+def _execute_in_worker(
+    version: int,
+    snapshot: bytes | None,
+    executor_name: str,
+    start_position: tuple[int, int],
+    start_direction: Direction,
+    command_strings: list[str],
+    recorders: list[TrajectoryRecorder | None],
+) -> tuple[list[dict[str, Any]], list[TrajectoryRecorder | None], list[float]]:
+    """
+    Run command strings in order in a worker process, each starting where the
+    previous one stopped, and return the results, the filled recorders and
+    the execution time of each string
+    """
+    global _worker_obstacles
+    if snapshot is not None:
+        _worker_obstacles = (version, decode_obstacles(snapshot))
+    if _worker_obstacles is None or _worker_obstacles[0] != version:
+        # The task that carried the snapshot was cancelled or failed first
+        raise MissingObstaclesError(version)
+    obstacles = _worker_obstacles[1]
+
+    executor = get_command_executor(executor_name)
+    results = []
+    elapsed = []
+    position, direction = start_position, start_direction
+    for command_string, recorder in zip(command_strings, recorders, strict=True):
+        robot = Robot(position=position, direction=direction)
+        started = time.perf_counter()
+        results.append(
+            executor.execute_commands(robot, command_string, obstacles, recorder)
+        )
+        elapsed.append(time.perf_counter() - started)
+        position, direction = robot.position, robot.direction
+    return results, recorders, elapsed
+
+
+def _warm_up() -> None:
+    """Run once in each new worker so it is started before the first task"""
+
+
+def _new_pool() -> ProcessPoolExecutor:
+    # Spawned rather than forked, so no event loop, lock or connection of this
+    # process is copied into the worker
+    return ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+@dataclass
+class _Worker:
+    """One worker process and the obstacle version it holds"""
+
+    pool: ProcessPoolExecutor
+    version: int | None = None
+    pending: int = 0
+
+
+class ExecutionOffloader:
+    """
+    Runs long command strings in worker processes, so executing them does
+    not hold the event loop and stall every other request.
+
+    Each worker is a single-process pool, so it is known which obstacle
+    version each worker holds. The obstacles are packed into a compact
+    snapshot once per version and sent to a worker only with its first task
+    at that version; later tasks carry just the version. Tasks go to the
+    worker with the fewest pending tasks. Queueing time (waiting for the
+    worker plus transfer) and execution time are recorded separately.
+    """
+
+    def __init__(self, workers: int, min_length: int) -> None:
+        self.workers = workers
+        self.min_length = min_length
+        self.offloaded = 0
+        self.snapshots_sent = 0
+        self._workers: list[_Worker] = []
+        self._snapshot: tuple[int, bytes] | None = None
+
+    def should_offload(self, length: int) -> bool:
+        """Whether commands of this total length are worth a worker process"""
+        return self.workers > 0 and length >= self.min_length
+
+    async def start(self) -> None:
+        """
+        Start the worker processes and wait until each can take tasks, so no
+        request pays for starting them. Called on startup; execute calls it
+        when that was skipped.
+        """
+        if self._workers or self.workers <= 0:
+            return
+        self._workers = [_Worker(_new_pool()) for _ in range(self.workers)]
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(worker.pool, _warm_up) for worker in self._workers)
+        )
+        logger.info(f"Started {self.workers} command execution worker processes")
+
+    def _snapshot_for(self, version: int, obstacles: AbstractSet[Position]) -> bytes:
+        if self._snapshot is None or self._snapshot[0] != version:
+            self._snapshot = (version, encode_obstacles(obstacles))
+        return self._snapshot[1]
+
+    async def execute(
+        self,
+        executor_name: str,
+        obstacles: AbstractSet[Position],
+        version: int,
+        start_position: tuple[int, int],
+        start_direction: Direction,
+        command_strings: Sequence[str],
+        recorders: Sequence[TrajectoryRecorder | None] | None = None,
+    ) -> tuple[list[dict[str, Any]], list[float]]:
+        """
+        Results of running command_strings in order in a worker process,
+        like CommandProcessor.process_command_batch, with the execution time
+        of each. The recorders, if given, receive what was recorded in the
+        worker.
+        """
+        await self.start()
+        worker = min(self._workers, key=lambda worker: worker.pending)
+        # Tasks queued behind the one carrying the snapshot are sent without
+        # it; if that one never ran, they come back once and are resent with it
+        snapshot = None
+        if worker.version != version:
+            snapshot = self._snapshot_for(version, obstacles)
+            worker.version = version
+            self.snapshots_sent += 1
+
+        sent_recorders: list[TrajectoryRecorder | None] = (
+            list(recorders) if recorders is not None else [None] * len(command_strings)
+        )
+
+        def submit(
+            snapshot: bytes | None,
+        ) -> asyncio.Future[
+            tuple[list[dict[str, Any]], list[TrajectoryRecorder | None], list[float]]
+        ]:
+            return asyncio.get_running_loop().run_in_executor(
+                worker.pool,
+                _execute_in_worker,
+                version,
+                snapshot,
+                executor_name,
+                start_position,
+                start_direction,
+                list(command_strings),
+                sent_recorders,
+            )
+
+        worker.pending += 1
+        started = time.perf_counter()
+        try:
+            try:
+                results, filled, elapsed = await submit(snapshot)
+            except MissingObstaclesError:
+                worker.version = version
+                self.snapshots_sent += 1
+                results, filled, elapsed = await submit(
+                    self._snapshot_for(version, obstacles)
+                )
+        except BrokenProcessPool:
+            logger.error("Command execution worker died, replacing it")
+            worker.pool = _new_pool()
+            worker.version = None
+            raise
+        except BaseException:
+            # A failed or cancelled task may not have stored the snapshot
+            worker.version = None
+            raise
+        finally:
+            worker.pending -= 1
+        self.offloaded += 1
+
+        metrics.offload_queue_duration.observe(
+            time.perf_counter() - started - sum(elapsed)
+        )
+        for original, recorder in zip(sent_recorders, filled, strict=True):
+            if original is not None and recorder is not None:
+                original.replace_with(recorder)
+        return results, elapsed
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.pool.shutdown(cancel_futures=True)
+        self._workers = []
+        self._snapshot = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "min_length": self.min_length,
+            "offloaded": self.offloaded,
+            "snapshots_sent": self.snapshots_sent,
+            "pending": sum(worker.pending for worker in self._workers),
+        }
+
+
+execution_offloader = ExecutionOffloader(
+    workers=settings.EXECUTION_OFFLOAD_WORKERS,
+    min_length=settings.EXECUTION_OFFLOAD_MIN_LENGTH,
+)
+
+
+def get_execution_offloader() -> ExecutionOffloader | None:
+    """The execution offloader, or None when every command runs inline"""
+    return execution_offloader if settings.EXECUTION_OFFLOAD_WORKERS > 0 else None
@@ -0,0 +1,334 @@
+import gc
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Set as AbstractSet
+from dataclasses import dataclass
+from itertools import pairwise
+from typing import Any
+
+from src.models.robot import CLOCKWISE, Direction, Position, Robot
+from src.services import metrics
+from src.services.obstacle_index import ObstacleIndex
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Search states are (x, y, axis): axis 0 while the robot faces along y and
+# 1 while it faces along x. F and B move both ways along the facing axis and
+# L and R both switch axis, so the heading within an axis never changes the
+# cost of a path and only matters when the commands are written out.
+State = tuple[int, int, int]
+
+# Expansions between two checks of the time budget
+_DEADLINE_CHECK_INTERVAL = 1024
+
+
+class NoPathError(LookupError):
+    """Raised when no command string can bring the robot to the target"""
+
+
+class PlanningBudgetError(RuntimeError):
+    """Raised when the search gave up before finding a path"""
+
+
+def _robot_moves() -> tuple[tuple[tuple[str, int, int, int], ...], ...]:
+    """
+    What each command does in each heading, as (command, dx, dy, heading),
+    taken from Robot once so the planner moves exactly like the executors
+    """
+    moves = []
+    for direction in CLOCKWISE:
+        heading_moves = []
+        for command in "FBLR":
+            robot = Robot((0, 0), direction)
+            robot.process_command(command)
+            heading_moves.append((
+                command,
+                robot.position.x,
+                robot.position.y,
+                CLOCKWISE.index(robot.direction),
+            ))
+        moves.append(tuple(heading_moves))
+    return tuple(moves)
+
+
+# Indexed by heading, a position in CLOCKWISE
+_MOVES = _robot_moves()
+
+# Cells one move away along each axis, from the F and B moves of a heading
+# on that axis
+_AXIS_STEPS = tuple(
+    tuple((dx, dy) for _, dx, dy, _ in _MOVES[heading] if dx or dy)
+    for heading in (0, 1)
+)
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Command string from a start pose to a target cell"""
+
+    commands: str
+    direction: Direction  # Heading of the robot at the target
+    expanded: int  # States taken off the open set while searching
+    optimal: bool  # False when found by the weighted fallback search
+
+    @property
+    def rotations(self) -> int:
+        return self.commands.count("L") + self.commands.count("R")
+
+
+def _search(
+    obstacles: AbstractSet[Position],
+    initial: State,
+    goal: Position,
+    weight: float,
+    max_expansions: int,
+    deadline: float | None,
+) -> tuple[State, dict[State, State], int]:
+    """
+    A* from initial to any state on goal with f = g + weight * h, returning
+    the goal state, the parent of every reached state and the number of
+    expansions. h is the Manhattan distance plus one rotation when the goal
+    is off the axis the robot faces; it never overshoots, so weight 1 finds
+    a shortest path and a larger weight one at most weight times as long.
+    """
+    gx, gy = goal
+    x, y, axis = initial
+    dx, dy = gx - x, gy - y
+    h = abs(dx) + abs(dy) + (1 if (dy if axis else dx) else 0)
+    best: dict[State, int] = {initial: 0}
+    came_from: dict[State, State] = {}
+    # Ties on f go to the state closer to the goal, which keeps the search
+    # on a straight line across open ground
+    frontier: list[tuple[float, int, int, State]] = [(weight * h, h, 0, initial)]
+    push, pop = heapq.heappush, heapq.heappop
+    expanded = 0
+
+    while frontier:
+        _, _, g, state = pop(frontier)
+        if g > best[state]:
+            continue  # Superseded by a cheaper path to the same state
+        x, y, axis = state
+        if x == gx and y == gy:
+            return state, came_from, expanded
+
+        expanded += 1
+        if expanded > max_expansions:
+            raise PlanningBudgetError(f"No path within {max_expansions} states")
+        if (
+            deadline is not None
+            and expanded % _DEADLINE_CHECK_INTERVAL == 0
+            and time.perf_counter() > deadline
+        ):
+            raise PlanningBudgetError("No path within the time budget")
+
+        g += 1
+        (ax, ay), (bx, by) = _AXIS_STEPS[axis]
+        for neighbour in (
+            (x + ax, y + ay, axis),
+            (x + bx, y + by, axis),
+            (x, y, 1 - axis),
+        ):
+            nx, ny, naxis = neighbour
+            if naxis == axis and (nx, ny) in obstacles:
+                continue
+            if g < best.get(neighbour, g + 1):
+                best[neighbour] = g
+                came_from[neighbour] = state
+                dx, dy = gx - nx, gy - ny
+                h = abs(dx) + abs(dy) + (1 if (dy if naxis else dx) else 0)
+                push(frontier, (g + weight * h, h, g, neighbour))
+
+    raise NoPathError(f"Target {tuple(goal)} cannot be reached")
+
+
+def _write_commands(
+    state: State, came_from: dict[State, State], heading: int
+) -> tuple[str, int]:
+    """Commands along the path to state, and the final heading"""
+    path = [state]
+    while state in came_from:
+        state = came_from[state]
+        path.append(state)
+    path.reverse()
+
+    commands = []
+    for (x, y, _), following in pairwise(path):
+        # The first command that makes the step: F or B for a move, L for a
+        # change of axis
+        command, _, _, heading = next(
+            move
+            for move in _MOVES[heading]
+            if (x + move[1], y + move[2], move[3] % 2) == following
+        )
+        commands.append(command)
+    return "".join(commands), heading
+
+
+def plan_path(
+    obstacles: AbstractSet[Position],
+    start: tuple[int, int],
+    direction: Direction,
+    target: tuple[int, int],
+    max_expansions: int = 200_000,
+    max_seconds: float | None = None,
+    fallback_weight: float = 1.0,
+) -> Plan:
+    """
+    Shortest command string, counting every F, B, L and R as one, that takes
+    the robot from start to target without entering an obstacle.
+
+    Each search gives up after max_expansions states or max_seconds. When
+    the exact search does, a fallback_weight above 1 searches again with the
+    heuristic weighted by it, which settles for a path at most that factor
+    longer in far fewer states. Raises NoPathError when the target is an
+    obstacle or enclosed with the start, and PlanningBudgetError when no
+    search found a path within its budget.
+    """
+    if isinstance(obstacles, ObstacleIndex):
+        obstacles = obstacles.cells
+    goal = Position(*target)
+    if goal in obstacles:
+        raise NoPathError(f"Target {tuple(goal)} is an obstacle")
+
+    heading = CLOCKWISE.index(direction)
+    initial: State = (start[0], start[1], heading % 2)
+
+    def search(weight: float) -> tuple[State, dict[State, State], int]:
+        deadline = (
+            time.perf_counter() + max_seconds if max_seconds is not None else None
+        )
+        return _search(obstacles, initial, goal, weight, max_expansions, deadline)
+
+    # A search allocates a tuple per state, which would trigger collections
+    # that scan every live object mid-search; none of them form cycles
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        optimal = True
+        try:
+            state, came_from, expanded = search(1.0)
+        except PlanningBudgetError:
+            if fallback_weight <= 1:
+                raise
+            state, came_from, expanded = search(fallback_weight)
+            optimal = False
+        commands, heading = _write_commands(state, came_from, heading)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return Plan(commands, CLOCKWISE[heading], expanded, optimal)
+
+
+def record_plan(started: float, outcome: str) -> None:
+    metrics.plan_duration.observe(time.perf_counter() - started, (outcome,))
+
+
+class PathPlanner:
+    """
+    plan_path with a bounded LRU of plans for the current obstacle version.
+    A new version drops every cached plan. Unreachable targets are cached
+    like plans; searches that ran out of budget are not.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        max_expansions: int = 200_000,
+        max_seconds: float | None = None,
+        fallback_weight: float = 1.0,
+    ) -> None:
+        self.max_size = max_size
+        self.max_expansions = max_expansions
+        self.max_seconds = max_seconds
+        self.fallback_weight = fallback_weight
+        self.hits = 0
+        self.misses = 0
+        self.budget_exceeded = 0
+        self._version: int | None = None
+        self._plans: OrderedDict[
+            tuple[tuple[int, int], Direction, tuple[int, int]], Plan | None
+        ] = OrderedDict()
+
+    def plan(
+        self,
+        obstacles: AbstractSet[Position],
+        version: int,
+        start: tuple[int, int],
+        direction: Direction,
+        target: tuple[int, int],
+    ) -> tuple[Plan, bool]:
+        """
+        The plan from start to target on obstacles at version, and whether
+        it came from the cache. Raises like plan_path.
+        """
+        if version != self._version:
+            self._plans.clear()
+            self._version = version
+
+        key = ((start[0], start[1]), direction, (target[0], target[1]))
+        if key in self._plans:
+            self.hits += 1
+            self._plans.move_to_end(key)
+            plan = self._plans[key]
+            if plan is None:
+                raise NoPathError(f"Target {target} cannot be reached")
+            return plan, True
+
+        self.misses += 1
+        started = time.perf_counter()
+        try:
+            plan = plan_path(
+                obstacles,
+                start,
+                direction,
+                target,
+                self.max_expansions,
+                self.max_seconds,
+                self.fallback_weight,
+            )
+        except NoPathError:
+            self._store(key, None)
+            record_plan(started, "unreachable")
+            raise
+        except PlanningBudgetError:
+            self.budget_exceeded += 1
+            record_plan(started, "budget_exceeded")
+            logger.info(f"Planning budget exceeded from {start} to {target}")
+            raise
+        self._store(key, plan)
+        record_plan(started, "optimal" if plan.optimal else "fallback")
+        return plan, False
+
+    def _store(
+        self,
+        key: tuple[tuple[int, int], Direction, tuple[int, int]],
+        plan: Plan | None,
+    ) -> None:
+        self._plans[key] = plan
+        if len(self._plans) > self.max_size:
+            self._plans.popitem(last=False)
+
+    def clear(self) -> None:
+        self._plans.clear()
+        self._version = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "budget_exceeded": self.budget_exceeded,
+            "version": self._version,
+            "size": len(self._plans),
+        }
+
+
+path_planner = PathPlanner(
+    max_size=settings.PLANNER_CACHE_SIZE,
+    max_expansions=settings.PLANNER_MAX_EXPANSIONS,
+    max_seconds=settings.PLANNER_MAX_SECONDS,
+    fallback_weight=settings.PLANNER_FALLBACK_WEIGHT,
+)
@@ -0,0 +1,137 @@
+import logging
+import time
+from typing import Any, ClassVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from src.services.metrics import pool_checkout_duration, pool_checkout_timeouts
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """
+    Checkout counters of one engine's pool. Kept outside the pool because
+    the engine replaces its pool on dispose. The window counters are read
+    and reset by the adaptive concurrency limiter.
+    """
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._window_count = 0
+        self._window_total = 0.0
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self._window_count += 1
+        self._window_total += wait
+
+    def take_window(self) -> tuple[int, float]:
+        """Checkouts and their average wait since the previous call"""
+        count, total = self._window_count, self._window_total
+        self._window_count = 0
+        self._window_total = 0.0
+        return count, total / count if count else 0.0
+
+    def reset(self) -> None:
+        self.__init__()  # type: ignore[misc]
+
+    def to_dict(self) -> dict[str, Any]:
+        attempts = self.checkouts + self.timeouts
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_seconds": self.wait_total / attempts if attempts else 0.0,
+            "wait_max_seconds": self.wait_max,
+        }
+
+
+# One per engine, keyed by TimedQueuePool.engine_name
+POOL_STATS = {"primary": PoolStats(), "replica": PoolStats()}
+pool_stats = POOL_STATS["primary"]
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default async queue pool, timing every checkout. Pool events only
+    fire once a connection has been handed out, so the wait for a free
+    connection is measured around connect() instead.
+    """
+
+    # Class attribute rather than a constructor argument, because the engine
+    # rebuilds its pool from the class on dispose
+    engine_name: ClassVar[str] = "primary"
+
+    def connect(self) -> Any:
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            timed_out = True
+            pool_checkout_timeouts.inc(labels=(self.engine_name,))
+            raise
+        finally:
+            wait = time.perf_counter() - started
+            pool_checkout_duration.observe(wait, (self.engine_name,))
+            POOL_STATS[self.engine_name].record(wait, timed_out)
+
+
+class ReplicaTimedQueuePool(TimedQueuePool):
+    engine_name = "replica"
+
+
+def install_idle_pre_ping(engine: AsyncEngine, idle_seconds: float) -> None:
+    """
+    Ping a connection on checkout only if it sat in the pool for longer
+    than idle_seconds. Connections in steady use skip the extra round trip
+    that pool_pre_ping adds to every checkout; a failed ping makes the pool
+    discard the connection and check out another.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "checkin")
+    def _remember_checkin(dbapi_connection: Any, record: Any) -> None:
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _ping_if_idle(dbapi_connection: Any, record: Any, proxy: Any) -> None:
+        checked_in_at = record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            logger.warning(f"Discarding idle connection that failed a ping: {e}")
+            raise DisconnectionError() from e
+
+
+def pool_status(pool: Pool) -> dict[str, Any]:
+    """Current occupancy of a pool together with the checkout counters"""
+    status: dict[str, Any] = {"pool_class": type(pool).__name__}
+    stats = POOL_STATS[pool.engine_name] if isinstance(pool, TimedQueuePool) else None
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if stats is not None:
+        status.update(stats.to_dict())
+    return status
@@ -0,0 +1,290 @@
+import io
+import logging
+import marshal
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from src.settings import settings
+
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+PROFILE_KINDS = ("cpu", "memory")
+
+
+def parse_profile_kinds(value: str | None) -> tuple[str, ...]:
+    """
+    Profile kinds requested by an X-Profile header value such as "cpu",
+    "memory", "cpu,memory" or "all". Unknown values request nothing.
+    """
+    if not value:
+        return ()
+    requested = {part.strip().lower() for part in value.split(",")}
+    if "all" in requested:
+        return PROFILE_KINDS
+    if not requested <= set(PROFILE_KINDS):
+        return ()
+    return tuple(kind for kind in PROFILE_KINDS if kind in requested)
+
+
+@dataclass
+class RequestProfile:
+    """The profiles collected while one request was handled"""
+
+    id: str
+    method: str
+    path: str
+    kinds: tuple[str, ...]
+    sampled: bool
+    created_at: datetime
+    duration: float
+    cpu_stats: bytes | None = None  # marshalled pstats data, for pstats/snakeviz
+    cpu_report: str | None = None
+    memory_report: str | None = None
+    peak_memory: int | None = None
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "kinds": list(self.kinds),
+            "sampled": self.sampled,
+            "created_at": self.created_at,
+            "duration": self.duration,
+            "peak_memory": self.peak_memory,
+        }
+
+
+class _Capture:
+    """Profilers running for one request"""
+
+    def __init__(self, kinds: tuple[str, ...], frames: int) -> None:
+        # The profilers are imported on first use, as most processes never
+        # profile a request
+        import cProfile
+        import tracemalloc
+
+        self.id = uuid.uuid4().hex
+        self.kinds = kinds
+        self.started = time.perf_counter()
+        self.profile: cProfile.Profile | None = None
+        if "memory" in kinds:
+            tracemalloc.start(frames)
+        if "cpu" in kinds:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except (RuntimeError, ValueError):
+                # Another profiler or debugger owns the profile hook
+                if "memory" in kinds:
+                    tracemalloc.stop()
+                raise
+
+    def stop(self) -> tuple[float, "cProfile.Profile | None", Any, int | None]:
+        import tracemalloc
+
+        if self.profile is not None:
+            self.profile.disable()
+        duration = time.perf_counter() - self.started
+        snapshot = peak = None
+        if "memory" in self.kinds:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return duration, self.profile, snapshot, peak
+
+
+class RequestProfiler:
+    """
+    Runs requests under cProfile and tracemalloc on demand.
+
+    A request is profiled when it asks for it (see parse_profile_kinds) or,
+    with a sample rate above zero, at random; sampled requests get a CPU
+    profile only, which is folded into a running aggregate so hot spots
+    build up over time. Both profilers are process-wide, so one request is
+    profiled at a time and others arriving meanwhile run unprofiled. The
+    CPU profile covers everything the event loop runs while the request is
+    in flight, including other requests.
+
+    The last max_profiles requested profiles are kept in memory and, with a
+    directory, written there as <id>.prof and <id>.memory.txt; older ones
+    are deleted.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        sample_rate: float = 0.0,
+        max_profiles: int = 20,
+        directory: str | None = None,
+        report_lines: int = 40,
+        tracemalloc_frames: int = 10,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        self.directory = Path(directory) if directory else None
+        self.report_lines = report_lines
+        self.tracemalloc_frames = tracemalloc_frames
+        self.skipped = 0
+        self.sampled = 0
+        self._active = False
+        self._profiles: OrderedDict[str, RequestProfile] = OrderedDict()
+        self._aggregate: pstats.Stats | None = None
+
+    def choose(
+        self, requested: tuple[str, ...], sampleable: bool = True
+    ) -> tuple[tuple[str, ...], bool]:
+        """Kinds to profile a request with, and whether it was sampled"""
+        if not self.enabled:
+            return (), False
+        if requested:
+            return requested, False
+        if sampleable and self.sample_rate > 0 and random.random() < self.sample_rate:
+            return ("cpu",), True
+        return (), False
+
+    def start(self, kinds: tuple[str, ...]) -> _Capture | None:
+        """Start profiling, or return None if another request is being profiled"""
+        import tracemalloc
+
+        if self._active or ("memory" in kinds and tracemalloc.is_tracing()):
+            self.skipped += 1
+            return None
+        try:
+            capture = _Capture(kinds, self.tracemalloc_frames)
+        except (RuntimeError, ValueError) as e:
+            logger.warning(f"Could not start profiling: {e}")
+            self.skipped += 1
+            return None
+        self._active = True
+        return capture
+
+    def finish(
+        self, capture: _Capture, method: str, path: str, sampled: bool
+    ) -> RequestProfile:
+        try:
+            duration, profile, snapshot, peak = capture.stop()
+        finally:
+            self._active = False
+
+        result = RequestProfile(
+            id=capture.id,
+            method=method,
+            path=path,
+            kinds=capture.kinds,
+            sampled=sampled,
+            created_at=datetime.now(UTC),
+            duration=duration,
+            peak_memory=peak,
+        )
+        if profile is not None:
+            import pstats
+
+            stats = pstats.Stats(profile)
+            if sampled:
+                # Only the aggregate is kept, so no per-request report is built
+                self.sampled += 1
+                if self._aggregate is None:
+                    self._aggregate = stats
+                else:
+                    self._aggregate.add(stats)
+            else:
+                result.cpu_report = self._report(stats)
+                result.cpu_stats = marshal.dumps(stats.stats)
+        if snapshot is not None:
+            result.memory_report = "\n".join(
+                str(stat) for stat in snapshot.statistics("lineno")[: self.report_lines]
+            )
+
+        if not sampled:
+            self._keep(result)
+        return result
+
+    def _report(self, stats: "pstats.Stats", *restrictions: str | int) -> str:
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats("cumulative").print_stats(*restrictions, self.report_lines)
+        return stream.getvalue()
+
+    def _keep(self, profile: RequestProfile) -> None:
+        self._profiles[profile.id] = profile
+        if self.directory is not None:
+            self._write(profile)
+        while len(self._profiles) > self.max_profiles:
+            _, oldest = self._profiles.popitem(last=False)
+            if self.directory is not None:
+                for path in self._paths(oldest):
+                    path.unlink(missing_ok=True)
+
+    def _paths(self, profile: RequestProfile) -> list[Path]:
+        assert self.directory is not None
+        return [
+            self.directory / f"{profile.id}.prof",
+            self.directory / f"{profile.id}.memory.txt",
+        ]
+
+    def _write(self, profile: RequestProfile) -> None:
+        cpu_path, memory_path = self._paths(profile)
+        try:
+            cpu_path.parent.mkdir(parents=True, exist_ok=True)
+            if profile.cpu_stats is not None:
+                cpu_path.write_bytes(profile.cpu_stats)
+            if profile.memory_report is not None:
+                memory_path.write_text(profile.memory_report)
+        except OSError as e:
+            logger.error(f"Could not write profile {profile.id}: {e}")
+
+    def get(self, profile_id: str) -> RequestProfile | None:
+        return self._profiles.get(profile_id)
+
+    def profiles(self) -> list[RequestProfile]:
+        return list(reversed(self._profiles.values()))
+
+    def aggregate_report(self, pattern: str | None = None) -> str | None:
+        """
+        Cumulative report of every sampled request, restricted to functions
+        whose file or name matches pattern (a regular expression) if given
+        """
+        if self._aggregate is None:
+            return None
+        return self._report(self._aggregate, *([pattern] if pattern else []))
+
+    def clear(self) -> None:
+        for profile in list(self._profiles.values()):
+            if self.directory is not None:
+                for path in self._paths(profile):
+                    path.unlink(missing_ok=True)
+        self._profiles.clear()
+        self._aggregate = None
+        self.sampled = 0
+        self.skipped = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "profiles": len(self._profiles),
+            "max_profiles": self.max_profiles,
+            "sampled": self.sampled,
+            "skipped": self.skipped,
+        }
+
+
+profiler = RequestProfiler(
+    enabled=settings.PROFILING_ENABLED,
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    max_profiles=settings.PROFILING_MAX_PROFILES,
+    directory=settings.PROFILING_DIR,
+)
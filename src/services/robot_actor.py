@@ -0,0 +1,330 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+
+from src.models.database import CommandHistory, RobotState
+from src.models.robot import Direction, Position
+from src.services import metrics
+from src.services.command_history import history_values, new_recorder
+from src.services.command_processor import CommandProcessor
+from src.services.database import AsyncSessionLocal
+from src.services.history_writer import HistoryWriter, get_history_writer
+from src.services.obstacle_cache import ObstacleCache, obstacle_cache
+from src.services.offload import get_execution_offloader
+from src.services.robot_state import (
+    RobotNotFoundError,
+    RobotStateConflictError,
+    get_robot_state,
+    robot_from_state,
+)
+from src.services.state_cache import get_state_cache, invalidate_cached_state
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingCommand:
+    """Command strings of one request, applied together in order"""
+
+    commands: list[str]
+    future: asyncio.Future[list[dict[str, Any]]]
+
+
+@dataclass
+class ActorState:
+    """In-memory copy of a robot's state row, owned by its actor"""
+
+    row_id: int | None
+    version: int
+    position: Position
+    direction: Direction
+
+
+class RobotActor:
+    """
+    Single writer for one robot.
+
+    Command strings are queued and applied in arrival order by one worker
+    task. Everything queued while a write is in flight is applied as one
+    batch and persisted in one commit. Requests that are not queued here,
+    such as streams, uploads and requests with an Idempotency-Key (whose key
+    must be committed together with the move), still write through the
+    version check, which makes the actor reload and retry. The robot state is kept in memory
+    between batches; the row version guards against other processes, and on
+    a conflict the state is reloaded and the batch is executed again.
+    """
+
+    def __init__(
+        self,
+        robot_id: str,
+        session_factory: async_sessionmaker[AsyncSession],
+        obstacle_cache: ObstacleCache | None = None,
+        max_batch_size: int = 64,
+        idle_timeout: float = 60.0,
+        max_retries: int = 3,
+        on_exit: Callable[["RobotActor"], None] | None = None,
+        history_writer: HistoryWriter | None = None,
+    ) -> None:
+        self.robot_id = robot_id
+        self.session_factory = session_factory
+        self.obstacle_cache = obstacle_cache
+        self.history_writer = history_writer
+        self.max_batch_size = max_batch_size
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.on_exit = on_exit
+        self.closed = False
+        self.batches = 0
+        self.commands = 0
+        self.conflicts = 0
+        self.queue: asyncio.Queue[PendingCommand] = asyncio.Queue()
+        self._state: ActorState | None = None
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, command: str) -> dict[str, Any]:
+        """Queue a command string and wait for its result"""
+        (result,) = await self.submit_many([command])
+        return result
+
+    async def submit_many(self, commands: list[str]) -> list[dict[str, Any]]:
+        """
+        Queue command strings that run back to back, with nothing queued by
+        other requests in between, and wait for their results
+        """
+        if self.closed:
+            raise RuntimeError(f"Actor for robot {self.robot_id} is closed")
+        future: asyncio.Future[list[dict[str, Any]]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.queue.put_nowait(PendingCommand(commands, future))
+        return await future
+
+    async def stop(self) -> None:
+        """Finish the queued commands, then stop the worker"""
+        self.closed = True
+        await self.queue.join()
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+            except TimeoutError:
+                if self.queue.empty():
+                    self.closed = True
+                    if self.on_exit is not None:
+                        self.on_exit(self)
+                    return
+                continue
+
+            batch = [first]
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                results = await self._apply(batch)
+            except Exception as e:
+                logger.error(f"Error applying commands to robot {self.robot_id}: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+            else:
+                start = 0
+                for pending in batch:
+                    end = start + len(pending.commands)
+                    if not pending.future.done():
+                        pending.future.set_result(results[start:end])
+                    start = end
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _apply(self, batch: list[PendingCommand]) -> list[dict[str, Any]]:
+        commands = [command for pending in batch for command in pending.commands]
+        for _ in range(self.max_retries + 1):
+            async with self.session_factory() as session:
+                try:
+                    if self._state is None:
+                        self._state = await self._load(session)
+
+                    processor = CommandProcessor(
+                        session,
+                        obstacle_cache=self.obstacle_cache,
+                        offloader=get_execution_offloader(),
+                    )
+                    recorders = [new_recorder() for _ in commands]
+                    results = await processor.process_command_batch(
+                        commands,
+                        self._state.position,
+                        self._state.direction,
+                        recorders,
+                    )
+                    rows = [
+                        history_values(self.robot_id, command, result, recorder)
+                        for command, result, recorder in zip(
+                            commands, results, recorders, strict=True
+                        )
+                    ]
+                    state = await self._persist(session, self._state, rows, results)
+                    started = time.perf_counter()
+                    await session.commit()
+                    metrics.commit_duration.observe(time.perf_counter() - started)
+                except (RobotStateConflictError, IntegrityError, StaleDataError):
+                    await session.rollback()
+                    self.conflicts += 1
+                    self._state = None
+                    invalidate_cached_state(self.robot_id)
+                    continue
+
+            self._state = state
+            cache = get_state_cache()
+            if cache is not None:
+                cache.put(self.robot_id, state.position, state.direction, state.version)
+            self.batches += 1
+            self.commands += len(commands)
+            if self.history_writer is not None:
+                await self.history_writer.enqueue(rows)
+            return results
+
+        raise RobotStateConflictError(
+            f"Robot {self.robot_id} state kept changing during the update"
+        )
+
+    async def _load(self, session: AsyncSession) -> ActorState:
+        robot_state = await get_robot_state(session, self.robot_id)
+        if robot_state is None and self.robot_id != settings.DEFAULT_ROBOT_ID:
+            raise RobotNotFoundError(self.robot_id)
+
+        robot = robot_from_state(robot_state)
+        return ActorState(
+            row_id=robot_state.id if robot_state else None,
+            version=robot_state.version if robot_state else 0,
+            position=robot.position,
+            direction=robot.direction,
+        )
+
+    async def _persist(
+        self,
+        session: AsyncSession,
+        current: ActorState,
+        rows: list[dict[str, Any]],
+        results: list[dict[str, Any]],
+    ) -> ActorState:
+        """Write the final state, checking the version, and the history rows"""
+        if self.history_writer is None:
+            await session.execute(insert(CommandHistory), rows)
+
+        final = results[-1]
+        position = Position(final["position"]["x"], final["position"]["y"])
+        version = current.version + 1
+        values = {
+            "position_x": position.x,
+            "position_y": position.y,
+            "direction": final["direction"],
+            "version": version,
+            "updated_at": datetime.utcnow(),
+        }
+
+        if current.row_id is None:
+            result = await session.execute(
+                insert(RobotState)
+                .values(robot_id=self.robot_id, **values)
+                .returning(RobotState.id)
+            )
+            row_id = result.scalar_one()
+        else:
+            row_id = current.row_id
+            result = await session.execute(
+                update(RobotState)
+                .where(
+                    RobotState.id == row_id,
+                    RobotState.version == current.version,
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise RobotStateConflictError(self.robot_id)
+
+        return ActorState(row_id, version, position, Direction[final["direction"]])
+
+
+class RobotActorRegistry:
+    """Creates one RobotActor per robot on demand and drops idle ones"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+        obstacle_cache: ObstacleCache | None = None,
+        history_writer: HistoryWriter | None = None,
+    ) -> None:
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.obstacle_cache = obstacle_cache
+        self.history_writer = history_writer
+        self._actors: dict[str, RobotActor] = {}
+
+    def get(self, robot_id: str) -> RobotActor:
+        actor = self._actors.get(robot_id)
+        if actor is None or actor.closed:
+            actor = RobotActor(
+                robot_id,
+                self.session_factory,
+                obstacle_cache=self.obstacle_cache,
+                max_batch_size=settings.COMMAND_ACTOR_MAX_BATCH,
+                idle_timeout=settings.COMMAND_ACTOR_IDLE_TIMEOUT,
+                max_retries=settings.COMMAND_ACTOR_MAX_RETRIES,
+                on_exit=self._remove,
+                history_writer=self.history_writer,
+            )
+            self._actors[robot_id] = actor
+        return actor
+
+    async def submit(self, robot_id: str, command: str) -> dict[str, Any]:
+        """Execute a command string through the robot's actor"""
+        return await self.get(robot_id).submit(command)
+
+    async def submit_many(
+        self, robot_id: str, commands: list[str]
+    ) -> list[dict[str, Any]]:
+        """Execute command strings back to back through the robot's actor"""
+        return await self.get(robot_id).submit_many(commands)
+
+    def _remove(self, actor: RobotActor) -> None:
+        if self._actors.get(actor.robot_id) is actor:
+            del self._actors[actor.robot_id]
+
+    async def shutdown(self) -> None:
+        """Drain and stop every actor"""
+        actors = list(self._actors.values())
+        self._actors.clear()
+        await asyncio.gather(*(actor.stop() for actor in actors))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "actors": len(self._actors),
+            "queued": sum(actor.queue.qsize() for actor in self._actors.values()),
+        }
+
+
+command_actors = RobotActorRegistry(
+    obstacle_cache=obstacle_cache if settings.OBSTACLE_CACHE_ENABLED else None,
+    history_writer=get_history_writer(),
+)
+
+
+def get_command_actors() -> RobotActorRegistry:
+    return command_actors
@@ -1,20 +1,36 @@
-from typing import Any
+import re
+from collections.abc import Iterator
+from collections.abc import Set as AbstractSet
+from typing import Any, ClassVar, NamedTuple
 
-from src.models.robot import Position, Robot
+from src.models.robot import CLOCKWISE, DIRECTION_VECTORS, Direction, Position, Robot
+from src.services.command_program import program_cache
+from src.services.obstacle_index import ObstacleIndex
+from src.services.trajectory import TrajectoryRecorder
+
+# Runs of identical valid commands; anything else is ignored like in Robot
+_COMMAND_RUNS = re.compile(r"F+|B+|L+|R+")
 
 
 class RobotCommandExecutor:
+    name: ClassVar[str] = "stepwise"
+
     @staticmethod
     def execute_commands(
-        robot: Robot, commands: str, obstacles: set[Position] | None = None
+        robot: Robot,
+        commands: str,
+        obstacles: AbstractSet[Position] | None = None,
+        recorder: TrajectoryRecorder | None = None,
     ) -> dict[str, Any]:
         """
         Execute a string of commands on a robot.
         Returns a status dictionary with final position, direction,
-        and obstacle information.
+        and obstacle information. A recorder, if given, receives every move.
         """
         if obstacles is None:
             obstacles = set()
+        if recorder is not None:
+            recorder.begin(robot.position)
 
         for command in commands:
             prev_position = robot.position
@@ -29,9 +45,199 @@ class RobotCommandExecutor:
                     "direction": robot.direction.value,
                     "obstacle_detected": True,
                 }
+            if moved and recorder is not None:
+                recorder.travel(prev_position, robot.position)
 
         return {
             "position": {"x": robot.position.x, "y": robot.position.y},
             "direction": robot.direction.value,
             "obstacle_detected": robot.obstacle_detected,
         }
+
+
+class TrajectoryPoint(NamedTuple):
+    """Robot state after applying one command, or one run of commands"""
+
+    offset: int  # Position of the last applied command in the command string
+    command: str
+    length: int  # Number of commands applied
+    position: Position
+    direction: Direction
+
+
+def status_of(robot: Robot) -> dict[str, Any]:
+    """Status dictionary for the robot as returned by the executors"""
+    return {
+        "position": {"x": robot.position.x, "y": robot.position.y},
+        "direction": robot.direction.value,
+        "obstacle_detected": robot.obstacle_detected,
+    }
+
+
+def iter_steps(
+    robot: Robot, commands: str, obstacles: AbstractSet[Position] | None = None
+) -> Iterator[TrajectoryPoint]:
+    """
+    Lazily execute commands one at a time, yielding the robot state after
+    every valid command. Stops before the first move into an obstacle and
+    leaves the robot as RobotCommandExecutor would.
+    """
+    if obstacles is None:
+        obstacles = set()
+
+    for index, command in enumerate(commands):
+        prev_position = robot.position
+
+        moved = robot.process_command(command)
+
+        if moved and robot.position in obstacles:
+            robot.position = prev_position
+            robot.obstacle_detected = True
+            return
+        if moved or command in "LR":
+            yield TrajectoryPoint(index, command, 1, robot.position, robot.direction)
+
+
+def iter_segments(
+    robot: Robot, commands: str, obstacles: AbstractSet[Position] | None = None
+) -> Iterator[TrajectoryPoint]:
+    """
+    Lazily execute commands one run of identical commands at a time, yielding
+    the robot state after every run. A run cut short by an obstacle yields
+    the cell before the obstacle, if the robot moved at all, and then stops.
+    """
+    if isinstance(obstacles, ObstacleIndex):
+        index = obstacles
+    else:
+        index = ObstacleIndex(obstacles or ())
+    x, y = robot.position
+    heading = CLOCKWISE.index(robot.direction)
+
+    for run in _COMMAND_RUNS.finditer(commands):
+        command = run.group()[0]
+        count = run.end() - run.start()
+
+        if command in "LR":
+            heading = (heading + (count if command == "R" else -count)) % 4
+            robot.direction = CLOCKWISE[heading]
+            yield TrajectoryPoint(
+                run.end() - 1, command, count, robot.position, robot.direction
+            )
+            continue
+
+        travel = CLOCKWISE[heading if command == "F" else (heading + 2) % 4]
+        dx, dy = DIRECTION_VECTORS[travel]
+        blocker = index.first_obstacle((x, y), travel, count)
+
+        if blocker is not None:
+            moved = abs(blocker.x - x) + abs(blocker.y - y) - 1
+            robot.position = Position(blocker.x - dx, blocker.y - dy)
+            robot.obstacle_detected = True
+            if moved:
+                yield TrajectoryPoint(
+                    run.start() + moved - 1,
+                    command,
+                    moved,
+                    robot.position,
+                    robot.direction,
+                )
+            return
+
+        x += dx * count
+        y += dy * count
+        robot.position = Position(x, y)
+        yield TrajectoryPoint(
+            run.end() - 1, command, count, robot.position, robot.direction
+        )
+
+
+class SegmentCommandExecutor(RobotCommandExecutor):
+    """
+    Executes commands as straight-line segments instead of cell by cell.
+
+    Runs of identical moves are collapsed into one segment and the first
+    obstacle along that row or column is found with an ObstacleIndex, so the
+    cost depends on the number of runs rather than on the number of moves.
+    """
+
+    name: ClassVar[str] = "segment"
+
+    @staticmethod
+    def execute_commands(
+        robot: Robot,
+        commands: str,
+        obstacles: AbstractSet[Position] | None = None,
+        recorder: TrajectoryRecorder | None = None,
+    ) -> dict[str, Any]:
+        """
+        Execute a string of commands on a robot.
+        Returns the same status dictionary as RobotCommandExecutor.
+        """
+        if recorder is None:
+            for _ in iter_segments(robot, commands, obstacles):
+                pass
+            return status_of(robot)
+
+        recorder.begin(robot.position)
+        previous = robot.position
+        for point in iter_segments(robot, commands, obstacles):
+            recorder.travel(previous, point.position)
+            previous = point.position
+        return status_of(robot)
+
+
+class CompiledCommandExecutor(SegmentCommandExecutor):
+    """
+    Executes commands through compiled programs.
+
+    Each command string is compiled once into its net rotation, net offset
+    and segments, and kept in the program cache. A cached program whose
+    bounding box holds no obstacle is applied in constant time; otherwise
+    only its segments are checked, never its individual commands.
+    """
+
+    name: ClassVar[str] = "compiled"
+
+    @staticmethod
+    def execute_commands(
+        robot: Robot,
+        commands: str,
+        obstacles: AbstractSet[Position] | None = None,
+        recorder: TrajectoryRecorder | None = None,
+    ) -> dict[str, Any]:
+        """
+        Execute a string of commands on a robot.
+        Returns the same status dictionary as RobotCommandExecutor. Recording
+        needs the path, so with a recorder the segments are walked instead.
+        """
+        if recorder is not None:
+            return SegmentCommandExecutor.execute_commands(
+                robot, commands, obstacles, recorder
+            )
+
+        program = program_cache.get(commands)
+        position, direction, blocked = program.run(
+            robot.position, robot.direction, obstacles
+        )
+        robot.position = position
+        robot.direction = direction
+        robot.obstacle_detected = robot.obstacle_detected or blocked
+        return status_of(robot)
+
+
+COMMAND_EXECUTORS: dict[str, type[RobotCommandExecutor]] = {
+    "stepwise": RobotCommandExecutor,
+    "segment": SegmentCommandExecutor,
+    "compiled": CompiledCommandExecutor,
+}
+
+
+def get_command_executor(name: str) -> RobotCommandExecutor:
+    """Return an executor instance for one of the COMMAND_EXECUTORS names"""
+    try:
+        return COMMAND_EXECUTORS[name]()
+    except KeyError as e:
+        raise ValueError(
+            f"Unknown command executor: {name}. "
+            + f"Must be one of {sorted(COMMAND_EXECUTORS)}"
+        ) from e
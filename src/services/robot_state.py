@@ -0,0 +1,103 @@
+import logging
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models.database import RobotState
+from src.models.robot import Direction, Robot
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Robot ids are used in URLs, so keep them to a safe character set
+ROBOT_ID_PATTERN = r"^[A-Za-z0-9_.-]{1,64}$"
+
+
+class RobotNotFoundError(LookupError):
+    """Raised when a robot other than the default robot has no stored state"""
+
+
+class RobotStateConflictError(RuntimeError):
+    """Raised when the robot state row was changed by another writer"""
+
+
+async def get_robot_state(db: AsyncSession, robot_id: str) -> RobotState | None:
+    """Get the stored state of a robot by its id"""
+    result = await db.execute(select(RobotState).where(RobotState.robot_id == robot_id))
+    return result.scalars().first()  # Properly typed as Optional[RobotState]
+
+
+def robot_from_state(robot_state: RobotState | None) -> Robot:
+    """Build a robot at the stored state, or at the start position if none"""
+    if not robot_state:
+        start_position = settings.start_position
+        start_direction = Direction[settings.start_direction]
+        return Robot(position=start_position, direction=start_direction)
+    return Robot(
+        position=(robot_state.position_x, robot_state.position_y),
+        direction=Direction[robot_state.direction],
+    )
+
+
+def update_robot_state(
+    db: AsyncSession,
+    robot_id: str,
+    robot_state: RobotState | None,
+    result: dict[str, Any],
+) -> RobotState:
+    """Apply a command result to the stored robot state, creating it if needed"""
+    x_position = result["position"]["x"]
+    y_position = result["position"]["y"]
+    direction = result["direction"]
+
+    if not robot_state:
+        robot_state = RobotState(
+            robot_id=robot_id,
+            position_x=x_position,
+            position_y=y_position,
+            direction=direction,
+        )
+        db.add(robot_state)
+    else:
+        robot_state.position_x = x_position
+        robot_state.position_y = y_position
+        robot_state.direction = direction
+    return robot_state
+
+
+def robot_status(
+    robot_state: RobotState | None, robot_id: str | None = None
+) -> dict[str, Any]:
+    """Status dictionary for a stored robot, or the start state if none"""
+    robot = robot_from_state(robot_state)
+    status: dict[str, Any] = {
+        "position": {"x": robot.position.x, "y": robot.position.y},
+        "direction": robot.direction.value,
+    }
+    if robot_id is not None:
+        status["robot_id"] = robot_id
+    return status
+
+
+async def provision_robots(db: AsyncSession, robots: list[dict[str, Any]]) -> int:
+    """
+    Insert new robots with one executemany. Each item needs robot_id and may
+    set position_x, position_y and direction; missing values default to the
+    configured start state. The caller is responsible for committing.
+    """
+    start_x, start_y = settings.start_position
+    rows = [
+        {
+            "robot_id": robot["robot_id"],
+            "position_x": robot.get("position_x", start_x),
+            "position_y": robot.get("position_y", start_y),
+            "direction": robot.get("direction", settings.start_direction),
+        }
+        for robot in robots
+    ]
+    await db.execute(insert(RobotState), rows)
+    logger.info(f"Provisioned {len(rows)} robots")
+    return len(rows)
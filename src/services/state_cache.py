@@ -0,0 +1,131 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.robot import Direction, Position
+from src.services.robot_state import (
+    RobotNotFoundError,
+    get_robot_state,
+    robot_from_state,
+)
+from src.settings import settings
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedRobotState:
+    position: Position
+    direction: Direction
+    # Row version the entry was built from; 0 when the robot has no row yet
+    version: int
+    # When the state was committed, or loaded for entries read from the DB
+    updated_at: datetime
+    cached_at: float
+
+
+class RobotStateCache:
+    """
+    In-process copy of robot state, keyed by robot id.
+
+    The commands path puts the new state right after every successful
+    commit, and provisioning and failed writes drop the robot's entry, so
+    within one process the cache is as current as the database.
+    An entry is only replaced by one with the same or a newer row version,
+    which keeps a slow request from overwriting a newer state. Misses, and
+    entries older than max_age when it is above zero, are reloaded from the
+    database; the max age bounds staleness when other processes also write.
+    """
+
+    def __init__(self, max_age: float = 0.0) -> None:
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, CachedRobotState] = {}
+
+    def put(
+        self,
+        robot_id: str,
+        position: Position,
+        direction: Direction,
+        version: int,
+        updated_at: datetime | None = None,
+    ) -> None:
+        current = self._entries.get(robot_id)
+        if current is not None and current.version > version:
+            return
+        self._entries[robot_id] = CachedRobotState(
+            position,
+            direction,
+            version,
+            updated_at or datetime.utcnow(),
+            time.monotonic(),
+        )
+
+    def peek(self, robot_id: str) -> CachedRobotState | None:
+        """The cached entry if it is present and not expired"""
+        entry = self._entries.get(robot_id)
+        if entry is None:
+            return None
+        if self.max_age > 0 and time.monotonic() - entry.cached_at > self.max_age:
+            return None
+        return entry
+
+    async def get(
+        self, db: AsyncSession, robot_id: str
+    ) -> tuple[CachedRobotState, bool]:
+        """
+        The robot's state from memory, loading it from the database on a
+        miss, and whether it was a hit. Raises RobotNotFoundError for a
+        missing robot other than the default robot, which starts at the
+        configured start state.
+        """
+        entry = self.peek(robot_id)
+        if entry is not None:
+            self.hits += 1
+            return entry, True
+
+        self.misses += 1
+        robot_state = await get_robot_state(db, robot_id)
+        if robot_state is None and robot_id != settings.DEFAULT_ROBOT_ID:
+            raise RobotNotFoundError(robot_id)
+
+        robot = robot_from_state(robot_state)
+        self.put(
+            robot_id,
+            robot.position,
+            robot.direction,
+            robot_state.version if robot_state else 0,
+            robot_state.updated_at if robot_state else None,
+        )
+        return self._entries[robot_id], False
+
+    def invalidate(self, robot_id: str | None = None) -> None:
+        if robot_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(robot_id, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+state_cache = RobotStateCache(max_age=settings.STATUS_CACHE_MAX_AGE)
+
+
+def get_state_cache() -> RobotStateCache | None:
+    """The robot state cache, or None when /status reads the database"""
+    return state_cache if settings.STATUS_CACHE_ENABLED else None
+
+
+def invalidate_cached_state(*robot_ids: str) -> None:
+    """Drop the cached state of robots whose row changed without a put"""
+    cache = get_state_cache()
+    if cache is not None:
+        for robot_id in robot_ids:
+            cache.invalidate(robot_id)
@@ -0,0 +1,164 @@
+import zlib
+from collections.abc import Iterator
+from typing import NamedTuple
+
+from src.models.robot import CLOCKWISE, DIRECTION_VECTORS, Direction, Position
+
+# First byte of every encoded trajectory, bumped if the layout changes
+TRAJECTORY_FORMAT = 1
+
+# Decompressed bytes produced per step while decoding
+_DECODE_CHUNK = 64 * 1024
+
+_HEADINGS = {DIRECTION_VECTORS[direction]: i for i, direction in enumerate(CLOCKWISE)}
+
+
+class InvalidTrajectoryError(ValueError):
+    """Raised when an encoded trajectory cannot be decoded"""
+
+
+class TrajectoryRun(NamedTuple):
+    """length cells travelled in direction, ending at position"""
+
+    direction: Direction
+    length: int
+    position: Position
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class TrajectoryRecorder:
+    """
+    Records the cells a robot moves through as delta-encoded runs.
+
+    Every move is one cell in one of four directions, so consecutive moves
+    in the same direction are kept as one run and each run is written as a
+    single varint holding its length and direction. The encoded form is
+    zlib-compressed; a straight or repetitive path of a million steps takes
+    a few bytes to a few kilobytes.
+    """
+
+    def __init__(self) -> None:
+        self.start: Position | None = None
+        self.steps = 0
+        self._runs = bytearray()
+        self._heading = -1
+        self._length = 0
+
+    def begin(self, position: tuple[int, int]) -> None:
+        """Set the start cell. Only the first call has an effect."""
+        if self.start is None:
+            self.start = Position(*position)
+
+    def travel(self, previous: tuple[int, int], current: tuple[int, int]) -> None:
+        """Record a straight move along a row or column between two cells"""
+        dx, dy = current[0] - previous[0], current[1] - previous[1]
+        length = abs(dx) + abs(dy)
+        if not length:
+            return
+        heading = _HEADINGS[(dx // length, dy // length)]
+        if heading != self._heading:
+            self._flush_run()
+            self._heading = heading
+        self._length += length
+        self.steps += length
+
+    def replace_with(self, other: "TrajectoryRecorder") -> None:
+        """Take over what other recorded, such as a copy filled in a worker"""
+        self.start = other.start
+        self.steps = other.steps
+        self._runs = other._runs
+        self._heading = other._heading
+        self._length = other._length
+
+    def _flush_run(self) -> None:
+        if self._length:
+            _write_varint(self._runs, self._length << 2 | self._heading)
+        self._length = 0
+
+    def encode(self) -> bytes:
+        """The recorded path in its compact binary form"""
+        self._flush_run()
+        self._heading = -1
+        start = self.start or Position(0, 0)
+        header = bytearray([TRAJECTORY_FORMAT])
+        _write_varint(header, _zigzag(start.x))
+        _write_varint(header, _zigzag(start.y))
+        return zlib.compress(bytes(header) + bytes(self._runs))
+
+
+def _iter_varints(blob: bytes) -> Iterator[int]:
+    """Varints from a compressed blob, decompressing one chunk at a time"""
+    decompressor = zlib.decompressobj()
+    pending = blob
+    value = shift = 0
+    try:
+        while pending or not decompressor.eof:
+            chunk = decompressor.decompress(pending, _DECODE_CHUNK)
+            pending = decompressor.unconsumed_tail
+            if not chunk and not pending:
+                break
+            for byte in chunk:
+                value |= (byte & 0x7F) << shift
+                if byte & 0x80:
+                    shift += 7
+                    continue
+                yield value
+                value = shift = 0
+    except zlib.error as e:
+        raise InvalidTrajectoryError(str(e)) from e
+    if shift:
+        raise InvalidTrajectoryError("Truncated trajectory")
+
+
+def iter_trajectory(blob: bytes) -> tuple[Position, Iterator[TrajectoryRun]]:
+    """
+    The start cell of an encoded trajectory and a lazy iterator over its
+    runs. Only the part of the blob needed for the runs consumed so far is
+    decompressed.
+    """
+    varints = _iter_varints(blob)
+    try:
+        if next(varints) != TRAJECTORY_FORMAT:
+            raise InvalidTrajectoryError("Unknown trajectory format")
+        start = Position(_unzigzag(next(varints)), _unzigzag(next(varints)))
+    except StopIteration as e:
+        raise InvalidTrajectoryError("Truncated trajectory") from e
+
+    def runs() -> Iterator[TrajectoryRun]:
+        x, y = start
+        for value in varints:
+            direction = CLOCKWISE[value & 3]
+            length = value >> 2
+            dx, dy = DIRECTION_VECTORS[direction]
+            x += dx * length
+            y += dy * length
+            yield TrajectoryRun(direction, length, Position(x, y))
+
+    return start, runs()
+
+
+def iter_trajectory_cells(blob: bytes) -> Iterator[Position]:
+    """Every cell of an encoded trajectory, start cell first"""
+    start, runs = iter_trajectory(blob)
+    yield start
+    x, y = start
+    for run in runs:
+        dx, dy = DIRECTION_VECTORS[run.direction]
+        for _ in range(run.length):
+            x += dx
+            y += dy
+            yield Position(x, y)
@@ -0,0 +1,30 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client):
+    await client.get("/api/v1/status")
+    await client.post("/api/v1/commands", json={"command": "FF"})
+    await client.get("/api/v1/robots/ghost/status")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    lines = response.text.splitlines()
+    for series in (
+        'http_request_duration_seconds_count{method="GET",'
+        + 'route="/api/v1/status",status="200"} 1',
+        'http_request_duration_seconds_count{method="POST",'
+        + 'route="/api/v1/commands",status="200"} 1',
+        # Labelled by route template, not by robot id
+        'http_request_duration_seconds_count{method="GET",'
+        + 'route="/api/v1/robots/{robot_id}/status",status="404"} 1',
+        'robot_command_execution_seconds_count{executor="stepwise",path="inline"} 1',
+        "robot_commit_seconds_count 1",
+        'robot_command_length_bucket{le="10"} 1',
+        # The first lookup of the obstacle cache builds it
+        'robot_obstacle_cache_lookups_total{result="miss"} 1',
+        "robot_obstacle_cache_rebuilds_total 1",
+    ):
+        assert series in lines
@@ -0,0 +1,113 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.api.replica import LAST_WRITE_COOKIE, wrote_recently
+from src.main import app
+from src.models.database import Base
+from src.services import database, metrics
+from src.settings import settings
+
+
+@pytest.fixture
+async def primary_and_replica(tmp_path, monkeypatch):
+    """Two SQLite files standing in for a primary and a replica that lags"""
+    engines = [
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}")
+        for name in ("primary.db", "replica.db")
+    ]
+    for engine in engines:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    primary, replica = (
+        async_sessionmaker(engine, expire_on_commit=False) for engine in engines
+    )
+    monkeypatch.setattr(database, "AsyncSessionLocal", primary)
+    monkeypatch.setattr(database, "ReadSessionLocal", replica)
+    monkeypatch.setattr(settings, "STATUS_CACHE_ENABLED", False)
+    yield primary, replica
+    for engine in engines:
+        await engine.dispose()
+
+
+def make_client():
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica(primary_and_replica):
+    async with make_client() as writer, make_client() as reader:
+        response = await writer.post(
+            "/api/v1/robots", json={"robots": [{"robot_id": "rover-1"}]}
+        )
+        assert response.status_code == 201
+        assert LAST_WRITE_COOKIE in response.cookies
+
+        # The replica has not caught up, so a client that did not write
+        # cannot see the robot yet
+        response = await reader.get("/api/v1/robots/rover-1/status")
+        assert response.status_code == 404
+        response = await reader.get("/api/v1/robots/rover-1/history")
+        assert response.status_code == 404
+
+        # The writer reads its own write from the primary
+        response = await writer.get("/api/v1/robots/rover-1/status")
+        assert response.status_code == 200
+        response = await writer.get("/api/v1/robots/rover-1/history")
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_window_expires(primary_and_replica, monkeypatch):
+    async with make_client() as writer:
+        await writer.post("/api/v1/obstacles", json={"x": 2, "y": 2})
+        assert len((await writer.get("/api/v1/obstacles")).json()) == 1
+
+        monkeypatch.setattr(settings, "READ_YOUR_WRITES_WINDOW", 0.0)
+        assert (await writer.get("/api/v1/obstacles")).json() == []
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_set_no_cookie(primary_and_replica):
+    async with make_client() as writer:
+        response = await writer.post(
+            "/api/v1/robots/ghost/commands", json={"command": "F"}
+        )
+        assert response.status_code == 404
+        assert LAST_WRITE_COOKIE not in response.cookies
+
+
+@pytest.mark.asyncio
+async def test_simulation_is_not_a_write(primary_and_replica):
+    async with make_client() as client:
+        response = await client.post("/api/v1/commands/simulate", json={"command": "F"})
+        assert response.status_code == 200
+        assert LAST_WRITE_COOKIE not in response.cookies
+
+
+@pytest.mark.asyncio
+async def test_simulate_and_plan_read_obstacles_from_primary(primary_and_replica):
+    async with make_client() as writer, make_client() as reader:
+        await writer.post("/api/v1/obstacles", json={"x": 0, "y": 2})
+        start = {"position": {"x": 0, "y": 0}, "direction": "NORTH"}
+
+        # Neither client flips the shared obstacle cache back to the
+        # replica's older obstacle version
+        for client in (writer, reader, writer, reader):
+            response = await client.post(
+                "/api/v1/commands/simulate", json={**start, "command": "FFF"}
+            )
+            assert response.json()["obstacle_detected"] is True
+            response = await client.post(
+                "/api/v1/commands/plan", json={**start, "target": {"x": 0, "y": 3}}
+            )
+            # The plan goes around the obstacle
+            assert response.json()["command"] != "FFF"
+        assert metrics.obstacle_cache_rebuilds.value() == 1
+
+
+def test_wrote_recently():
+    assert wrote_recently("100.0", now=100.5)
+    assert not wrote_recently(None, now=100.5)
+    assert not wrote_recently("garbage", now=100.5)
+    assert not wrote_recently("100.0", now=100.0 + settings.READ_YOUR_WRITES_WINDOW)
@@ -0,0 +1,155 @@
+import marshal
+
+import pytest
+
+from src.api.profiling import SAMPLED_PATH
+from src.main import app
+from src.services import database
+from src.services.concurrency import AdaptiveConcurrencyLimiter
+from src.services.profiling import profiler
+from src.settings import settings
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "enabled", True)
+    monkeypatch.setattr(profiler, "sample_rate", 0.0)
+    yield profiler
+    profiler.clear()
+
+
+@pytest.mark.asyncio
+async def test_admin_routes_need_a_token(client, monkeypatch):
+    response = await client.get("/api/v1/admin/profiles")
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    response = await client.get(
+        "/api/v1/admin/profiles", headers={"X-Admin-Token": "wrong"}
+    )
+    assert response.status_code == 401
+    response = await client.get("/api/v1/admin/profiles", headers=ADMIN)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_profile_requested_by_header(client, profiling):
+    response = await client.post(
+        "/api/v1/commands",
+        json={"command": "FFRFF"},
+        headers={**ADMIN, "X-Profile": "all"},
+    )
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profiles = (await client.get("/api/v1/admin/profiles", headers=ADMIN)).json()
+    assert [(p["id"], p["kinds"]) for p in profiles] == [
+        (profile_id, ["cpu", "memory"])
+    ]
+
+    report = await client.get(f"/api/v1/admin/profiles/{profile_id}", headers=ADMIN)
+    assert "POST /api/v1/commands" in report.text
+    assert "Ordered by: cumulative time" in report.text
+    assert "Peak traced memory" in report.text
+
+    raw = await client.get(
+        f"/api/v1/admin/profiles/{profile_id}",
+        params={"format": "pstats"},
+        headers=ADMIN,
+    )
+    assert any(name == "execute_commands" for _, _, name in marshal.loads(raw.content))
+
+    response = await client.get("/api/v1/admin/profiles/missing", headers=ADMIN)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_profile_header_needs_admin_token(client, profiling):
+    response = await client.post(
+        "/api/v1/commands", json={"command": "F"}, headers={"X-Profile": "cpu"}
+    )
+    assert "X-Profile-Id" not in response.headers
+    assert profiling.profiles() == []
+
+
+@pytest.mark.asyncio
+async def test_sampling_commands_requests(client, profiling):
+    response = await client.put(
+        "/api/v1/admin/profiling", json={"sample_rate": 1.0}, headers=ADMIN
+    )
+    assert response.json()["sample_rate"] == 1.0
+
+    for _ in range(3):
+        response = await client.post("/api/v1/commands", json={"command": "FRF"})
+        assert "X-Profile-Id" not in response.headers
+    await client.get("/api/v1/status")
+    await client.post("/api/v1/commands/simulate", json={"command": "FRF"})
+    await client.post("/api/v1/commands/plan", json={"target": {"x": 1, "y": 1}})
+
+    state = (await client.get("/api/v1/admin/profiling", headers=ADMIN)).json()
+    assert state["sampled"] == 3
+    assert state["profiles"] == 0
+
+    report = await client.get(
+        "/api/v1/admin/profiles/aggregate",
+        params={"pattern": "sqlalchemy"},
+        headers=ADMIN,
+    )
+    assert report.status_code == 200
+    assert "sqlalchemy" in report.text
+
+
+@pytest.mark.parametrize(
+    ("path", "sampleable"),
+    [
+        ("/api/v1/commands", True),
+        ("/api/v1/robots/rover-1/commands", True),
+        ("/api/v1/commands/stream", False),
+        ("/api/v1/robots/rover-1/commands/upload", False),
+        ("/api/v1/history/1/command", False),
+        ("/commands", False),
+    ],
+)
+def test_sampled_path_matches_whole_routes(path, sampleable):
+    assert (SAMPLED_PATH.fullmatch(path) is not None) is sampleable
+
+
+@pytest.mark.asyncio
+async def test_pool_status(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    response = await client.get("/api/v1/admin/pool", headers=ADMIN)
+    assert response.status_code == 200
+    body = response.json()
+    primary = body["pools"]["primary"]
+    assert primary["pool_class"] == "TimedQueuePool"
+    assert primary["size"] == settings.DB_POOL_SIZE
+    assert primary["max_overflow"] == settings.DB_MAX_OVERFLOW
+    assert {"checked_out", "overflow", "timeouts", "wait_max_seconds"} <= set(primary)
+    assert body["pools"]["replica"] is None
+    assert body["pre_ping"] == settings.DB_POOL_PRE_PING
+    assert body["concurrency"] is None
+
+    limiter = AdaptiveConcurrencyLimiter(
+        min_limit=1, max_limit=1, target_wait=0.005, queue_timeout=0.01
+    )
+    monkeypatch.setattr(database, "concurrency_limiter", limiter)
+    body = (await client.get("/api/v1/admin/pool", headers=ADMIN)).json()
+    assert body["concurrency"]["limit"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_returns_503(client, monkeypatch):
+    limiter = AdaptiveConcurrencyLimiter(
+        min_limit=1, max_limit=1, target_wait=0.005, queue_timeout=0.01
+    )
+    monkeypatch.setattr(database, "concurrency_limiter", limiter)
+    app.dependency_overrides.pop(database.get_read_db)
+    await limiter.acquire()
+
+    response = await client.get("/api/v1/status")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert limiter.rejected == 1
@@ -1,7 +1,12 @@
+import hashlib
+import json
+
 import pytest
 from sqlalchemy import select
 
 from src.models.database import CommandHistory
+from src.services.idempotency import idempotency_store
+from src.settings import settings
 from tests.factories import ObstacleFactory
 
 
@@ -87,3 +92,363 @@ async def test_command_history_is_recorded(client, async_db_session):
     assert command_entry.position_x == 0
     assert command_entry.position_y == 2
     assert command_entry.direction == "EAST"
+
+
+@pytest.mark.asyncio
+async def test_execute_command_batch_matches_sequential_requests(
+    client, async_db_session
+):
+    async_db_session.add(ObstacleFactory(position_x=3, position_y=2))
+    await async_db_session.commit()
+    commands = ["FF", "RF", "F", "LLF", "X", "RRFF"]
+
+    response = await client.post("/api/v1/commands/batch", json={"commands": commands})
+    assert response.status_code == 200
+    batch_results = response.json()["results"]
+    batch_status = (await client.get("/api/v1/status")).json()
+
+    sequential_results = [
+        {
+            "position": {"x": 0, "y": 2},
+            "direction": "NORTH",
+            "obstacle_detected": False,
+        },
+        {"position": {"x": 1, "y": 2}, "direction": "EAST", "obstacle_detected": False},
+        {"position": {"x": 2, "y": 2}, "direction": "EAST", "obstacle_detected": False},
+        {"position": {"x": 1, "y": 2}, "direction": "WEST", "obstacle_detected": False},
+        {"position": {"x": 1, "y": 2}, "direction": "WEST", "obstacle_detected": False},
+        {"position": {"x": 2, "y": 2}, "direction": "EAST", "obstacle_detected": True},
+    ]
+    assert batch_results == sequential_results
+    assert batch_status == {"position": {"x": 2, "y": 2}, "direction": "EAST"}
+
+    result = await async_db_session.execute(
+        select(CommandHistory).order_by(CommandHistory.id)
+    )
+    history = result.scalars().all()
+    assert [entry.command for entry in history] == commands
+    assert history[-1].obstacle_detected is True
+
+
+@pytest.mark.asyncio
+async def test_execute_command_batch_validation(client):
+    response = await client.post("/api/v1/commands/batch", json={"commands": []})
+    assert response.status_code == 422
+
+    response = await client.post(
+        "/api/v1/commands/batch", json={"commands": ["F", "F" * 1001]}
+    )
+    assert response.status_code == 400
+
+    response = await client.post(
+        "/api/v1/commands/batch", json={"commands": ["F"] * 101}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_stream_commands_per_step(client, async_db_session):
+    async_db_session.add(ObstacleFactory(position_x=2, position_y=1))
+    await async_db_session.commit()
+
+    response = await client.post("/api/v1/commands/stream", json={"command": "FRFFF"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["position"] for line in lines[:-1]] == [
+        {"x": 0, "y": 1},
+        {"x": 0, "y": 1},
+        {"x": 1, "y": 1},
+    ]
+    assert lines[-1] == {
+        "type": "summary",
+        "position": {"x": 1, "y": 1},
+        "direction": "EAST",
+        "obstacle_detected": True,
+    }
+
+    status = (await client.get("/api/v1/status")).json()
+    assert status == {"position": {"x": 1, "y": 1}, "direction": "EAST"}
+
+
+@pytest.mark.asyncio
+async def test_stream_commands_per_segment(client):
+    response = await client.post(
+        "/api/v1/commands/stream",
+        params={"granularity": "segment"},
+        json={"command": "FFFFRRBB"},
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["command"], line["length"]) for line in lines[:-1]] == [
+        ("F", 4),
+        ("R", 2),
+        ("B", 2),
+    ]
+    assert lines[-1]["position"] == {"x": 0, "y": 6}
+    assert lines[-1]["direction"] == "SOUTH"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", ["stepwise", "segment", "compiled"])
+async def test_upload_commands(client, async_db_session, monkeypatch, executor):
+    monkeypatch.setattr(settings, "COMMAND_EXECUTOR", executor)
+    body = ("F" * 500 + "R" + "F" * 500 + "R") * 2000
+
+    async def chunks():
+        for start in range(0, len(body), 65536):
+            yield body[start : start + 65536].encode()
+
+    response = await client.post("/api/v1/commands/upload", content=chunks())
+    assert response.status_code == 200
+    assert response.json() == {
+        "position": {"x": 0, "y": 0},
+        "direction": "NORTH",
+        "obstacle_detected": False,
+        "received": len(body),
+        "sha256": hashlib.sha256(body.encode()).hexdigest(),
+    }
+
+    history = (await client.get("/api/v1/history")).json()["items"][0]
+    assert history["command"] is None
+    assert history["command_sha256"] == hashlib.sha256(body.encode()).hexdigest()
+    response = await client.get(f"/api/v1/history/{history['id']}/command")
+    assert response.text == body
+
+
+@pytest.mark.asyncio
+async def test_upload_stops_reading_at_obstacle(client, async_db_session):
+    async_db_session.add(ObstacleFactory(position_x=0, position_y=150))
+    await async_db_session.commit()
+    sent = []
+
+    async def chunks():
+        for i in range(100):
+            sent.append(i)
+            yield b"F" * 100
+
+    response = await client.post("/api/v1/commands/upload", content=chunks())
+    assert response.json()["position"] == {"x": 0, "y": 149}
+    assert response.json()["obstacle_detected"] is True
+    assert response.json()["received"] == 200
+    assert len(sent) == 2
+
+    status = (await client.get("/api/v1/status")).json()
+    assert status["position"] == {"x": 0, "y": 149}
+
+
+@pytest.mark.asyncio
+async def test_upload_size_limit(client, monkeypatch):
+    monkeypatch.setattr(settings, "COMMAND_UPLOAD_MAX_BYTES", 10)
+    response = await client.post("/api/v1/commands/upload", content=b"F" * 11)
+    assert response.status_code == 413
+
+    response = await client.post("/api/v1/robots/ghost/commands/upload", content=b"F")
+    assert response.status_code == 404
+
+
+async def history_count(db):
+    result = await db.execute(select(CommandHistory))
+    return len(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_replays_without_executing(client, async_db_session):
+    headers = {"Idempotency-Key": "uplink-1"}
+    first = await client.post(
+        "/api/v1/commands", json={"command": "FF"}, headers=headers
+    )
+    assert first.status_code == 200
+    assert "Idempotency-Replayed" not in first.headers
+
+    retry = await client.post(
+        "/api/v1/commands", json={"command": "FF"}, headers=headers
+    )
+    assert retry.status_code == 200
+    assert retry.headers["Idempotency-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+    status = (await client.get("/api/v1/status")).json()
+    assert status["position"] == {"x": 0, "y": 2}
+    assert await history_count(async_db_session) == 1
+
+    # Without a key every request executes
+    await client.post("/api/v1/commands", json={"command": "FF"})
+    assert (await client.get("/api/v1/status")).json()["position"] == {"x": 0, "y": 4}
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_survives_memory_eviction(client, async_db_session):
+    headers = {"Idempotency-Key": "uplink-2"}
+    await client.post(
+        "/api/v1/commands/batch", json={"commands": ["F", "R"]}, headers=headers
+    )
+    idempotency_store.clear()
+
+    retry = await client.post(
+        "/api/v1/commands/batch", json={"commands": ["F", "R"]}, headers=headers
+    )
+    assert retry.headers["Idempotency-Replayed"] == "true"
+    assert len(retry.json()["results"]) == 2
+    assert await history_count(async_db_session) == 2
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_reused_for_another_request(client):
+    headers = {"Idempotency-Key": "uplink-3"}
+    await client.post("/api/v1/commands", json={"command": "F"}, headers=headers)
+
+    response = await client.post(
+        "/api/v1/commands", json={"command": "B"}, headers=headers
+    )
+    assert response.status_code == 422
+    response = await client.post(
+        "/api/v1/commands/batch", json={"commands": ["F"]}, headers=headers
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_failed_request_is_not_stored(client):
+    headers = {"Idempotency-Key": "uplink-4"}
+    response = await client.post(
+        "/api/v1/robots/ghost/commands", json={"command": "F"}, headers=headers
+    )
+    assert response.status_code == 404
+
+    await client.post("/api/v1/robots", json={"robots": [{"robot_id": "ghost"}]})
+    response = await client.post(
+        "/api/v1/robots/ghost/commands", json={"command": "F"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert "Idempotency-Replayed" not in response.headers
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status_cache", [True, False])
+async def test_simulate_commands_writes_nothing(
+    client, async_db_session, monkeypatch, status_cache
+):
+    monkeypatch.setattr(settings, "STATUS_CACHE_ENABLED", status_cache)
+    async_db_session.add(ObstacleFactory(position_x=1, position_y=3))
+    await async_db_session.commit()
+    await client.post("/api/v1/commands", json={"command": "FF"})
+
+    # Starts from the current state and stops at the obstacle like /commands
+    response = await client.post("/api/v1/commands/simulate", json={"command": "FRFF"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "position": {"x": 0, "y": 3},
+        "direction": "EAST",
+        "obstacle_detected": True,
+    }
+
+    assert await history_count(async_db_session) == 1
+    status = (await client.get("/api/v1/status")).json()
+    assert status["position"] == {"x": 0, "y": 2}
+
+
+@pytest.mark.asyncio
+async def test_simulate_commands_from_explicit_start(client):
+    response = await client.post(
+        "/api/v1/commands/simulate",
+        json={"command": "FF", "position": {"x": 5, "y": -1}, "direction": "EAST"},
+    )
+    assert response.json()["position"] == {"x": 7, "y": -1}
+
+    # A robot that does not exist only matters when its state is needed
+    response = await client.post(
+        "/api/v1/robots/ghost/commands/simulate",
+        json={"command": "F", "position": {"x": 0, "y": 0}, "direction": "SOUTH"},
+    )
+    assert response.json()["position"] == {"x": 0, "y": -1}
+    response = await client.post(
+        "/api/v1/robots/ghost/commands/simulate",
+        json={"command": "F", "direction": "SOUTH"},
+    )
+    assert response.status_code == 404
+
+    response = await client.post(
+        "/api/v1/commands/simulate", json={"command": "F" * 1001}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("position", [{"x": 3}, {"x": 3, "y": 0, "z": 1}])
+async def test_simulate_rejects_partial_positions(client, position):
+    response = await client.post(
+        "/api/v1/commands/simulate", json={"command": "F", "position": position}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_plan_commands_avoids_obstacles(client, async_db_session):
+    async_db_session.add(ObstacleFactory(position_x=0, position_y=2))
+    await async_db_session.commit()
+
+    response = await client.post(
+        "/api/v1/commands/plan", json={"target": {"x": 0, "y": 3}}
+    )
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["position"] == {"x": 0, "y": 3}
+    assert plan["optimal"] is True
+    assert plan["cached"] is False
+    # One cell aside, three up and one back, turning three times
+    assert len(plan["command"]) == 8
+    assert plan["rotations"] == 3
+
+    response = await client.post("/api/v1/commands", json={"command": plan["command"]})
+    assert response.json()["position"] == {"x": 0, "y": 3}
+    assert response.json()["obstacle_detected"] is False
+
+    # Planned from the robot's new state, and cached from then on
+    body = {"target": {"x": 0, "y": 0}}
+    response = await client.post("/api/v1/commands/plan", json=body)
+    assert response.json()["cached"] is False
+    response = await client.post("/api/v1/commands/plan", json=body)
+    assert response.json()["cached"] is True
+
+
+@pytest.mark.asyncio
+async def test_plan_commands_errors(client, async_db_session):
+    async_db_session.add(ObstacleFactory(position_x=2, position_y=2))
+    await async_db_session.commit()
+
+    response = await client.post(
+        "/api/v1/commands/plan", json={"target": {"x": 2, "y": 2}}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Target cannot be reached"
+
+    response = await client.post(
+        "/api/v1/robots/ghost/commands/plan", json={"target": {"x": 1, "y": 1}}
+    )
+    assert response.status_code == 404
+    response = await client.post(
+        "/api/v1/robots/ghost/commands/plan",
+        json={
+            "target": {"x": 1, "y": 1},
+            "position": {"x": 1, "y": 0},
+            "direction": "WEST",
+        },
+    )
+    assert response.status_code == 200
+    assert len(response.json()["command"]) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"target": {}},
+        {"target": {"y": 3}},
+        {"target": {"x": 1, "y": 3, "z": 0}},
+        {"target": {"x": 1, "y": 3}, "position": {"x": 1}},
+    ],
+)
+async def test_plan_rejects_partial_coordinates(client, body):
+    response = await client.post("/api/v1/commands/plan", json=body)
+    assert response.status_code == 422
@@ -0,0 +1,192 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, text
+
+from src.models.database import CommandHistory
+from src.settings import settings
+
+START = datetime(2025, 1, 1, 12, 0, 0)
+
+
+async def add_history(db, count, robot_id="default"):
+    # Pairs of rows share a timestamp so ties are broken by id
+    await db.execute(
+        insert(CommandHistory),
+        [
+            {
+                "robot_id": robot_id,
+                "command": f"C{i}",
+                "position_x": i,
+                "position_y": 0,
+                "direction": "NORTH",
+                "obstacle_detected": i % 3 == 0,
+                "executed_at": START + timedelta(minutes=i // 2),
+            }
+            for i in range(count)
+        ],
+    )
+    await db.commit()
+
+
+async def read_all(client, url, **params):
+    commands, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        page = (await client.get(url, params=query)).json()
+        commands.extend(item["command"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return commands
+
+
+@pytest.mark.asyncio
+async def test_history_pages_newest_first(client, async_db_session):
+    await add_history(async_db_session, 7)
+
+    page = (await client.get("/api/v1/history", params={"limit": 3})).json()
+    assert [item["command"] for item in page["items"]] == ["C6", "C5", "C4"]
+    assert page["items"][0] == {
+        "id": page["items"][0]["id"],
+        "command": "C6",
+        "command_sha256": None,
+        "position": {"x": 6, "y": 0},
+        "direction": "NORTH",
+        "obstacle_detected": True,
+        "executed_at": "2025-01-01T12:03:00",
+    }
+
+    commands = await read_all(client, "/api/v1/history", limit=3)
+    assert commands == [f"C{i}" for i in reversed(range(7))]
+    commands = await read_all(client, "/api/v1/history", limit=2, order="asc")
+    assert commands == [f"C{i}" for i in range(7)]
+
+
+@pytest.mark.asyncio
+async def test_history_filters(client, async_db_session):
+    await add_history(async_db_session, 10)
+
+    commands = await read_all(
+        client, "/api/v1/history", limit=2, obstacle_detected="true"
+    )
+    assert commands == ["C9", "C6", "C3", "C0"]
+
+    commands = await read_all(
+        client,
+        "/api/v1/history",
+        limit=2,
+        order="asc",
+        since="2025-01-01T12:01:00",
+        until="2025-01-01T12:03:00",
+    )
+    assert commands == ["C2", "C3", "C4", "C5"]
+
+    # Aware timestamps are compared in UTC
+    commands = await read_all(
+        client, "/api/v1/history", since="2025-01-01T14:04:00+02:00"
+    )
+    assert commands == ["C9", "C8"]
+
+
+@pytest.mark.asyncio
+async def test_history_is_scoped_to_robot(client, async_db_session):
+    await client.post("/api/v1/robots", json={"robots": [{"robot_id": "rover-1"}]})
+    await add_history(async_db_session, 2)
+    await add_history(async_db_session, 3, robot_id="rover-1")
+
+    assert await read_all(client, "/api/v1/history") == ["C1", "C0"]
+    assert await read_all(client, "/api/v1/robots/rover-1/history") == [
+        "C2",
+        "C1",
+        "C0",
+    ]
+    response = await client.get("/api/v1/robots/ghost/history")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_history_rejects_bad_cursor(client):
+    response = await client.get("/api/v1/history", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    response = await client.get("/api/v1/history", params={"limit": 0})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_history_page_query_uses_composite_index(async_db_session):
+    plan = await async_db_session.execute(
+        text(
+            "EXPLAIN QUERY PLAN SELECT * FROM command_history "
+            "WHERE robot_id = 'default' AND (executed_at, id) < ('2025-01-01', 5) "
+            "ORDER BY executed_at DESC, id DESC LIMIT 11"
+        )
+    )
+    details = " ".join(row[-1] for row in plan.all())
+    assert "ix_command_history_robot_executed" in details
+    assert "TEMP B-TREE" not in details
+
+
+@pytest.mark.asyncio
+async def test_trajectory_endpoint_streams_recorded_path(
+    client, async_db_session, monkeypatch
+):
+    monkeypatch.setattr(settings, "TRAJECTORY_RECORDING_ENABLED", True)
+    await client.post("/api/v1/commands", json={"command": "FFRFF"})
+    await client.post("/api/v1/commands/batch", json={"commands": ["B", "LL"]})
+
+    history = (await client.get("/api/v1/history", params={"order": "asc"})).json()
+    first_id = history["items"][0]["id"]
+
+    response = await client.get(f"/api/v1/history/{first_id}/trajectory")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"type": "start", "position": {"x": 0, "y": 0}}
+    assert [line["position"] for line in lines[1:]] == [
+        {"x": 0, "y": 1},
+        {"x": 0, "y": 2},
+        {"x": 1, "y": 2},
+        {"x": 2, "y": 2},
+    ]
+
+    response = await client.get(
+        f"/api/v1/history/{first_id}/trajectory", params={"granularity": "segment"}
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[1:] == [
+        {
+            "type": "segment",
+            "direction": "NORTH",
+            "length": 2,
+            "position": {"x": 0, "y": 2},
+        },
+        {
+            "type": "segment",
+            "direction": "EAST",
+            "length": 2,
+            "position": {"x": 2, "y": 2},
+        },
+    ]
+
+    # Batch items start where the previous one stopped; turns record no cells
+    second_id, third_id = (item["id"] for item in history["items"][1:])
+    response = await client.get(f"/api/v1/history/{second_id}/trajectory")
+    assert response.text.splitlines()[-1] == json.dumps({
+        "type": "point",
+        "position": {"x": 1, "y": 2},
+    })
+    response = await client.get(f"/api/v1/history/{third_id}/trajectory")
+    assert len(response.text.splitlines()) == 1
+
+
+@pytest.mark.asyncio
+async def test_trajectory_endpoint_without_recording(client):
+    await client.post("/api/v1/commands", json={"command": "F"})
+    history = (await client.get("/api/v1/history")).json()
+
+    response = await client.get(
+        f"/api/v1/history/{history['items'][0]['id']}/trajectory"
+    )
+    assert response.status_code == 404
+    response = await client.get("/api/v1/history/999/trajectory")
+    assert response.status_code == 404
@@ -0,0 +1,170 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+
+from src.models.database import Obstacle
+from src.services.obstacle_import import insert_skipping_existing, iter_lines
+
+
+@pytest.mark.asyncio
+async def test_create_and_get_obstacle(client):
+    response = await client.post("/api/v1/obstacles", json={"x": 1, "y": 4})
+    assert response.status_code == 201
+    created = response.json()
+    assert created["position"] == {"x": 1, "y": 4}
+
+    response = await client.get(f"/api/v1/obstacles/{created['id']}")
+    assert response.status_code == 200
+    assert response.json() == created
+
+
+@pytest.mark.asyncio
+async def test_create_duplicate_obstacle(client):
+    await client.post("/api/v1/obstacles", json={"x": 1, "y": 4})
+    response = await client.post("/api/v1/obstacles", json={"x": 1, "y": 4})
+    assert response.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_list_obstacles_pages_by_id(client):
+    for x in range(5):
+        await client.post("/api/v1/obstacles", json={"x": x, "y": 0})
+
+    first = (await client.get("/api/v1/obstacles", params={"limit": 3})).json()
+    assert [o["position"]["x"] for o in first] == [0, 1, 2]
+
+    second = (
+        await client.get(
+            "/api/v1/obstacles", params={"limit": 3, "after_id": first[-1]["id"]}
+        )
+    ).json()
+    assert [o["position"]["x"] for o in second] == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_delete_obstacle_unblocks_robot(client):
+    created = (await client.post("/api/v1/obstacles", json={"x": 0, "y": 1})).json()
+    response = await client.post("/api/v1/commands", json={"command": "F"})
+    assert response.json()["obstacle_detected"] is True
+
+    response = await client.delete(f"/api/v1/obstacles/{created['id']}")
+    assert response.status_code == 204
+    assert (await client.get(f"/api/v1/obstacles/{created['id']}")).status_code == 404
+
+    response = await client.post("/api/v1/commands", json={"command": "F"})
+    assert response.json()["position"] == {"x": 0, "y": 1}
+
+
+@pytest.mark.asyncio
+async def test_delete_missing_obstacle(client):
+    response = await client.delete("/api/v1/obstacles/999")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_import_csv_skips_header_and_duplicates(client, async_db_session):
+    await client.post("/api/v1/obstacles", json={"x": 0, "y": 0})
+    body = "x,y\n0,0\n1,4\n3, 5\n\n7,4\n1,4\n"
+
+    response = await client.post(
+        "/api/v1/obstacles/import",
+        content=body,
+        headers={"Content-Type": "text/csv"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["received"] == 5
+    assert data["inserted"] == 3
+    assert data["skipped"] == 2
+    assert data["rows_per_second"] > 0
+
+    count = await async_db_session.scalar(select(func.count(Obstacle.id)))
+    assert count == 4
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson_streamed_in_chunks(client, async_db_session):
+    rows = [{"x": i, "y": -i} for i in range(1, 12001)]
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+
+    async def chunks():
+        for start in range(0, len(body), 4096):
+            yield body[start : start + 4096]
+
+    response = await client.post(
+        "/api/v1/obstacles/import",
+        params={"format": "ndjson"},
+        content=chunks(),
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 12000
+
+    response = await client.post("/api/v1/commands", json={"command": "RF"})
+    assert response.json()["obstacle_detected"] is False
+    response = await client.post("/api/v1/commands", json={"command": "RF"})
+    assert response.json()["obstacle_detected"] is True
+
+
+@pytest.mark.asyncio
+async def test_import_invalid_row_rolls_back(client, async_db_session):
+    response = await client.post(
+        "/api/v1/obstacles/import",
+        params={"format": "csv"},
+        content="1,1\n2,2\nthree,3\n",
+    )
+    assert response.status_code == 400
+    assert "line 3" in response.json()["detail"]
+
+    count = await async_db_session.scalar(select(func.count(Obstacle.id)))
+    assert count == 0
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_rows_that_are_not_utf8(client, async_db_session):
+    response = await client.post(
+        "/api/v1/obstacles/import",
+        params={"format": "csv"},
+        content=b"1,2\n\xff\xfe,3\n",
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid row on line 2: not UTF-8"
+
+    count = await async_db_session.scalar(select(func.count(Obstacle.id)))
+    assert count == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("row", ['{"x": true, "y": 1}', "[1, false]"])
+async def test_import_rejects_boolean_coordinates(client, row):
+    response = await client.post(
+        "/api/v1/obstacles/import", params={"format": "ndjson"}, content=row
+    )
+    assert response.status_code == 400
+    assert "integers" in response.json()["detail"]
+
+
+def test_postgresql_import_skips_existing_positions():
+    statement = insert_skipping_existing("postgresql")
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT ON CONSTRAINT uq_obstacle_position DO NOTHING" in sql
+
+
+@pytest.mark.asyncio
+async def test_import_requires_known_format(client):
+    response = await client.post(
+        "/api/v1/obstacles/import",
+        content="1,1\n",
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 415
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_joins_chunk_boundaries():
+    async def chunks():
+        for chunk in (b"1,", b"2\n3", b",4\n", b"5,6"):
+            yield chunk
+
+    assert [line async for line in iter_lines(chunks())] == [b"1,2", b"3,4", b"5,6"]
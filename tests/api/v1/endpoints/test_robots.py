@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import select
+
+from src.models.database import CommandHistory
+
+
+async def provision(client, *robots):
+    response = await client.post("/api/v1/robots", json={"robots": list(robots)})
+    assert response.status_code == 201
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_provision_and_list_robots(client):
+    data = await provision(
+        client,
+        {"robot_id": "rover-1"},
+        {"robot_id": "rover-2", "position": {"x": 4, "y": 2}, "direction": "WEST"},
+    )
+    assert data == {"created": 2}
+
+    robots = (await client.get("/api/v1/robots")).json()
+    assert robots == [
+        {"position": {"x": 0, "y": 0}, "direction": "NORTH", "robot_id": "rover-1"},
+        {"position": {"x": 4, "y": 2}, "direction": "WEST", "robot_id": "rover-2"},
+    ]
+
+    page = (await client.get("/api/v1/robots", params={"after": "rover-1"})).json()
+    assert [robot["robot_id"] for robot in page] == ["rover-2"]
+
+
+@pytest.mark.asyncio
+async def test_provision_duplicate_robot(client):
+    await provision(client, {"robot_id": "rover-1"})
+    response = await client.post(
+        "/api/v1/robots",
+        json={"robots": [{"robot_id": "rover-2"}, {"robot_id": "rover-1"}]},
+    )
+    assert response.status_code == 409
+
+    robots = (await client.get("/api/v1/robots")).json()
+    assert [robot["robot_id"] for robot in robots] == ["rover-1"]
+
+
+@pytest.mark.asyncio
+async def test_provision_rejects_invalid_robot_id(client):
+    response = await client.post(
+        "/api/v1/robots", json={"robots": [{"robot_id": "not/valid"}]}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("position", [{"x": 3}, {"x": 3, "y": 1, "z": 2}])
+async def test_provision_rejects_partial_positions(client, position):
+    response = await client.post(
+        "/api/v1/robots",
+        json={"robots": [{"robot_id": "rover-1", "position": position}]},
+    )
+    assert response.status_code == 422
+    assert (await client.get("/api/v1/robots")).json() == []
+
+
+@pytest.mark.asyncio
+async def test_robots_move_independently(client, async_db_session):
+    await provision(
+        client,
+        {"robot_id": "rover-1"},
+        {"robot_id": "rover-2", "position": {"x": 4, "y": 2}, "direction": "WEST"},
+    )
+
+    response = await client.post(
+        "/api/v1/robots/rover-1/commands", json={"command": "FF"}
+    )
+    assert response.json()["position"] == {"x": 0, "y": 2}
+    response = await client.post(
+        "/api/v1/robots/rover-2/commands/batch", json={"commands": ["F", "RF"]}
+    )
+    assert response.json()["results"][-1]["position"] == {"x": 3, "y": 3}
+
+    status_1 = (await client.get("/api/v1/robots/rover-1/status")).json()
+    status_2 = (await client.get("/api/v1/robots/rover-2/status")).json()
+    default = (await client.get("/api/v1/status")).json()
+    assert status_1 == {
+        "position": {"x": 0, "y": 2},
+        "direction": "NORTH",
+        "robot_id": "rover-1",
+    }
+    assert status_2["position"] == {"x": 3, "y": 3}
+    assert default == {"position": {"x": 0, "y": 0}, "direction": "NORTH"}
+
+    result = await async_db_session.execute(
+        select(CommandHistory.robot_id, CommandHistory.command).order_by(
+            CommandHistory.id
+        )
+    )
+    assert result.all() == [("rover-1", "FF"), ("rover-2", "F"), ("rover-2", "RF")]
+
+
+@pytest.mark.asyncio
+async def test_unknown_robot_returns_404(client):
+    response = await client.get("/api/v1/robots/ghost/status")
+    assert response.status_code == 404
+
+    response = await client.post("/api/v1/robots/ghost/commands", json={"command": "F"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_default_robot_is_shared_with_legacy_routes(client):
+    await client.post("/api/v1/commands", json={"command": "RF"})
+
+    status = (await client.get("/api/v1/robots/default/status")).json()
+    assert status == {
+        "position": {"x": 1, "y": 0},
+        "direction": "EAST",
+        "robot_id": "default",
+    }
+
+
+@pytest.mark.asyncio
+async def test_provisioning_replaces_cached_state(client):
+    status = (await client.get("/api/v1/status")).json()
+    assert status == {"position": {"x": 0, "y": 0}, "direction": "NORTH"}
+
+    await provision(
+        client,
+        {"robot_id": "default", "position": {"x": 5, "y": 5}, "direction": "EAST"},
+    )
+    status = (await client.get("/api/v1/status")).json()
+    assert status == {"position": {"x": 5, "y": 5}, "direction": "EAST"}
+
+    response = await client.post("/api/v1/commands/simulate", json={"command": "F"})
+    assert response.json()["position"] == {"x": 6, "y": 5}
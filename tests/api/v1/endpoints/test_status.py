@@ -36,3 +36,15 @@ async def test_get_status_with_invalid_commands(client):
     data = response.json()
     assert data["position"] == {"x": 0, "y": 0}
     assert data["direction"] == "NORTH"
+
+
+@pytest.mark.asyncio
+async def test_status_served_from_state_cache(client):
+    response = await client.get("/api/v1/status")
+    assert response.headers["X-State-Source"] == "database"
+
+    await client.post("/api/v1/commands", json={"command": "RF"})
+    response = await client.get("/api/v1/status")
+    assert response.headers["X-State-Source"] == "cache"
+    assert "X-State-Updated-At" in response.headers
+    assert response.json() == {"position": {"x": 1, "y": 0}, "direction": "EAST"}
@@ -7,7 +7,12 @@ from sqlalchemy.pool import StaticPool
 
 from src.main import app
 from src.models.database import Base
-from src.services.database import get_db
+from src.services.database import get_db, get_read_db
+from src.services.idempotency import idempotency_store
+from src.services.metrics import registry
+from src.services.obstacle_cache import obstacle_cache
+from src.services.path_planner import path_planner
+from src.services.state_cache import state_cache
 
 
 @pytest.fixture(scope="session")
@@ -51,6 +56,16 @@ async def prepare_database():
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    obstacle_cache.invalidate()
+    state_cache.invalidate()
+    idempotency_store.clear()
+    path_planner.clear()
+    registry.reset()
+
+
+@pytest.fixture
+def async_session_factory():
+    return AsyncTestingSessionLocal
 
 
 @pytest.fixture
@@ -65,6 +80,7 @@ async def client(async_db_session):
         yield async_db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.models.robot import CLOCKWISE, Direction, Position, Robot
+from src.services.batch_simulator import (
+    encode_commands,
+    simulate_batch,
+    simulate_fleet,
+)
+from src.services.robot_service import RobotCommandExecutor
+
+
+def reference(commands, start, direction, obstacles):
+    robot = Robot(start, direction)
+    return RobotCommandExecutor.execute_commands(robot, commands, obstacles)
+
+
+def test_encode_commands_pads_and_ignores_unknown_characters():
+    codes = encode_commands(["FBLR", "xF", "é"])
+    assert codes.tolist() == [[1, 2, 3, 4], [0, 1, 0, 0], [0, 0, 0, 0]]
+
+
+def test_simulate_batch_examples():
+    obstacles = {Position(1, 4), Position(3, 5), Position(7, 4)}
+    result = simulate_batch(
+        ["FLFFFRFLB", "FFRFF", "", "RRRR", "FFFFF", "F?F"],
+        (4, 2),
+        Direction.WEST,
+        obstacles,
+    )
+    assert result.to_results() == [
+        reference(command, (4, 2), Direction.WEST, obstacles)
+        for command in ["FLFFFRFLB", "FFRFF", "", "RRRR", "FFFFF", "F?F"]
+    ]
+
+
+def test_blocked_first_move_keeps_start_and_heading():
+    result = simulate_batch(["RF", "LLB"], (0, 0), Direction.NORTH, {(1, 0), (0, 1)})
+    assert result.to_results() == [
+        {"position": {"x": 0, "y": 0}, "direction": "EAST", "obstacle_detected": True},
+        {"position": {"x": 0, "y": 0}, "direction": "SOUTH", "obstacle_detected": True},
+    ]
+
+
+@pytest.mark.parametrize("chunk_cells", [1, 64, 1 << 22])
+def test_simulate_fleet_matches_executor(chunk_cells):
+    rng = random.Random(chunk_cells)
+    obstacles = {Position(rng.randint(-8, 8), rng.randint(-8, 8)) for _ in range(40)}
+    commands = [
+        "".join(rng.choice("FFFBLRX") for _ in range(rng.randint(0, 60)))
+        for _ in range(300)
+    ]
+    starts = [
+        (Position(rng.randint(-5, 5), rng.randint(-5, 5)), rng.choice(CLOCKWISE))
+        for _ in commands
+    ]
+
+    result = simulate_fleet(commands, starts, obstacles, chunk_cells=chunk_cells)
+
+    assert result.to_results() == [
+        reference(command, position, direction, obstacles)
+        for command, (position, direction) in zip(commands, starts, strict=True)
+    ]
+
+
+def test_simulate_fleet_needs_one_start_per_string():
+    with pytest.raises(ValueError):
+        simulate_fleet(["F", "B"], [((0, 0), Direction.NORTH)])
@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from src.models.robot import Direction, Position, Robot
+from src.services.command_program import CompiledProgram, ProgramCache
+from src.services.obstacle_index import ObstacleIndex
+from src.services.robot_service import CompiledCommandExecutor, RobotCommandExecutor
+
+
+def stepwise(start, direction, commands, obstacles):
+    robot = Robot(start, direction)
+    RobotCommandExecutor.execute_commands(robot, commands, obstacles)
+    return robot.position, robot.direction, robot.obstacle_detected
+
+
+def test_compile_reduces_to_net_effect():
+    program = CompiledProgram.compile("FFRFFxLB")
+    assert program.rotation == 0
+    assert program.displacement == (2, 1)
+    assert [(s.start, s.facing, s.backward, s.length) for s in program.segments] == [
+        ((0, 0), 0, False, 2),
+        ((0, 2), 1, False, 2),
+        ((2, 2), 0, True, 1),
+    ]
+    assert program.bounds == (0, 1, 2, 2)
+
+    assert CompiledProgram.compile("LRxx").bounds is None
+
+
+@pytest.mark.parametrize("direction", list(Direction))
+def test_run_turns_local_frame_into_start_direction(direction):
+    program = CompiledProgram.compile("FFRFLLB")
+    for obstacles in (None, {Position(50, 50)}):
+        assert program.run((3, -1), direction, obstacles) == stepwise(
+            (3, -1), direction, "FFRFLLB", obstacles or set()
+        )
+
+
+def test_clear_box_skips_segment_checks(monkeypatch):
+    program = CompiledProgram.compile("FFFFRFFFF")
+
+    def fail(*args):
+        raise AssertionError("segments should not be checked")
+
+    monkeypatch.setattr(CompiledProgram, "_run_segments", fail)
+    # The obstacle is at the start cell and outside the cells entered
+    assert program.run((0, 0), Direction.NORTH, {Position(0, 0), Position(5, 0)}) == (
+        Position(4, 4),
+        Direction.EAST,
+        False,
+    )
+
+
+def test_compiled_matches_stepwise_random_differential():
+    rng = random.Random(2024)
+    for _ in range(500):
+        obstacles = ObstacleIndex(
+            (rng.randint(-10, 10), rng.randint(-10, 10))
+            for _ in range(rng.randint(0, 40))
+        )
+        commands = "".join(rng.choice("FFFFBBLRX") for _ in range(rng.randint(0, 120)))
+        start = (rng.randint(-10, 10), rng.randint(-10, 10))
+        direction = rng.choice(list(Direction))
+
+        robot = Robot(start, direction)
+        CompiledCommandExecutor.execute_commands(robot, commands, obstacles)
+        assert (robot.position, robot.direction, robot.obstacle_detected) == stepwise(
+            start, direction, commands, obstacles
+        ), (start, direction, commands, set(obstacles))
+
+
+def test_composed_program_equals_concatenated_string():
+    rng = random.Random(7)
+    for _ in range(300):
+        first = "".join(rng.choice("FFBLR") for _ in range(rng.randint(0, 30)))
+        second = "".join(rng.choice("FFBLR") for _ in range(rng.randint(0, 30)))
+        composed = CompiledProgram.compile(first).then(CompiledProgram.compile(second))
+        combined = CompiledProgram.compile(first + second)
+
+        assert composed.rotation == combined.rotation
+        assert composed.displacement == combined.displacement
+        assert composed.bounds == combined.bounds
+
+        obstacles = ObstacleIndex(
+            (rng.randint(-8, 8), rng.randint(-8, 8)) for _ in range(15)
+        )
+        direction = rng.choice(list(Direction))
+        assert composed.run((1, 2), direction, obstacles) == stepwise(
+            (1, 2), direction, first + second, obstacles
+        )
+
+
+def test_composing_a_loop_with_itself():
+    square = CompiledProgram.compile("FFRFFRFFRFFR")
+    assert (square.rotation, square.displacement) == (0, (0, 0))
+
+    twice = square.then(square)
+    assert twice == CompiledProgram.compile("FFRFFRFFRFFR" * 2).then(
+        CompiledProgram.compile("")
+    )
+    assert twice.segments[4].length == 2
+
+
+def test_program_cache_is_a_bounded_lru():
+    cache = ProgramCache(max_size=2)
+    loop = cache.get("FFRR")
+    assert cache.get("FFRR") is loop
+    cache.get("B")
+    cache.get("FFRR")
+    cache.get("L")  # Evicts "B", the least recently used
+
+    assert cache.stats() == {"hits": 2, "misses": 3, "size": 2}
+    assert cache.get("FFRR") is loop
+    cache.get("B")
+    assert cache.misses == 4
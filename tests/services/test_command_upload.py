@@ -0,0 +1,49 @@
+import hashlib
+
+import pytest
+
+from src.services.command_upload import (
+    CommandArchive,
+    CommandUploadError,
+    iter_archived_command,
+    iter_command_chunks,
+)
+
+
+async def collect(chunks, archive, max_bytes):
+    return [text async for text in iter_command_chunks(chunks, archive, max_bytes)]
+
+
+async def byte_chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_archive_round_trip():
+    archive = CommandArchive()
+    data = b"FFRFFLB" * 300_000
+    for start in range(0, len(data), 4096):
+        archive.update(data[start : start + 4096])
+
+    blob = archive.blob()
+    assert archive.size == len(data)
+    assert archive.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert len(blob) < len(data) // 100
+
+    parts = list(iter_archived_command(blob))
+    assert len(parts) > 1
+    assert b"".join(parts) == data
+
+    with pytest.raises(RuntimeError):
+        archive.update(b"F")
+
+
+@pytest.mark.asyncio
+async def test_command_chunks_are_archived_and_limited():
+    archive = CommandArchive()
+    texts = await collect(byte_chunks(b"FF", b"", b"R\xffF"), archive, 10)
+    assert texts == ["FF", "R\xffF"]
+    assert b"".join(iter_archived_command(archive.blob())) == b"FFR\xffF"
+
+    with pytest.raises(CommandUploadError):
+        await collect(byte_chunks(b"F" * 6, b"F" * 6), CommandArchive(), 10)
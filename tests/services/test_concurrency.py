@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from src.services.concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimitError
+from src.services.pool import PoolStats
+
+
+def limiter(stats, **kwargs):
+    options = {
+        "min_limit": 1,
+        "max_limit": 4,
+        "target_wait": 0.01,
+        "queue_timeout": 1.0,
+        "interval": 0.0,
+        "stats": stats,
+    }
+    return AdaptiveConcurrencyLimiter(**(options | kwargs))
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_in_order():
+    limit = limiter(PoolStats(), max_limit=1, interval=3600)
+    order = []
+
+    async def worker(name):
+        async with limit:
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await limit.acquire()
+    tasks = [asyncio.create_task(worker(name)) for name in "abc"]
+    await asyncio.sleep(0)
+    assert limit.stats()["waiting"] == 3
+
+    limit.release()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b", "c"]
+    assert limit.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_rejects():
+    limit = limiter(PoolStats(), max_limit=1, interval=3600, queue_timeout=0.01)
+    await limit.acquire()
+
+    with pytest.raises(ConcurrencyLimitError):
+        await limit.acquire()
+    assert limit.stats()["waiting"] == 0
+    assert limit.rejected == 1
+
+    limit.release()
+    assert limit.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_its_slot_back():
+    limit = limiter(PoolStats(), max_limit=1, interval=3600)
+    await limit.acquire()
+    waiter = asyncio.create_task(limit.acquire())
+    await asyncio.sleep(0)
+
+    # The slot is handed over, then the waiter is cancelled before it runs
+    limit.release()
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert limit.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_limit_shrinks_when_checkouts_wait():
+    stats = PoolStats()
+    limit = limiter(stats)
+
+    stats.record(0.05)
+    async with limit:
+        pass
+    assert limit.limit == 3
+    stats.record(0.05)
+    async with limit:
+        pass
+    stats.record(0.05)
+    async with limit:
+        pass
+    assert limit.limit == 1
+    assert limit.decreases == 3
+
+    # Never below the minimum
+    stats.record(0.05)
+    async with limit:
+        pass
+    assert limit.limit == 1
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_while_callers_queue_on_a_fast_pool():
+    stats = PoolStats()
+    limit = limiter(stats)
+    limit.limit = 1
+
+    await limit.acquire()
+    waiter = asyncio.create_task(limit.acquire())
+    await asyncio.sleep(0)
+    assert limit.stats()["waiting"] == 1
+
+    # The next adjustment sees the queue and a fast pool, and admits the waiter
+    stats.record(0.001)
+    late = asyncio.create_task(limit.acquire())
+    await waiter
+    assert limit.limit == 2
+    assert limit.increases == 1
+    assert limit.stats()["waiting"] == 1
+
+    limit.release()
+    await late
+    assert limit.in_use == 2
+
+
+def test_limits_are_validated():
+    with pytest.raises(ValueError):
+        limiter(PoolStats(), min_limit=5, max_limit=4)
@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from src.main import app
+from src.models.database import CommandHistory, RobotState
+from src.services import metrics
+from src.services.command_history import history_values
+from src.services.history_writer import HistoryWriter, get_history_writer
+from src.services.robot_actor import RobotActorRegistry
+
+
+def history_row(command, x=0, y=0):
+    return {
+        "robot_id": "default",
+        "command": command,
+        "position_x": x,
+        "position_y": y,
+        "direction": "NORTH",
+        "obstacle_detected": False,
+    }
+
+
+@pytest.fixture
+async def writer(async_session_factory):
+    history_writer = HistoryWriter(
+        async_session_factory, max_queue_size=4, batch_size=3, flush_interval=0.05
+    )
+    yield history_writer
+    await history_writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_in_batches(writer, async_db_session):
+    await writer.enqueue([history_row(str(i)) for i in range(7)])
+    await writer.flush()
+
+    history = await async_db_session.scalars(
+        select(CommandHistory.command).order_by(CommandHistory.id)
+    )
+    assert history.all() == [str(i) for i in range(7)]
+    stats = writer.stats()
+    assert stats["rows_written"] == 7
+    assert stats["flushes"] == 3
+    assert stats["queue_depth"] == 0
+    assert stats["max_flush_seconds"] >= stats["avg_flush_seconds"] > 0
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_partial_batch_after_interval(writer, async_db_session):
+    await writer.enqueue([history_row("F")])
+    await asyncio.sleep(0.2)
+
+    assert writer.stats()["flushes"] == 1
+    history = await async_db_session.scalars(select(CommandHistory.command))
+    assert history.all() == ["F"]
+
+
+@pytest.mark.asyncio
+async def test_rows_keep_their_execution_time(writer, async_db_session):
+    result = {
+        "position": {"x": 0, "y": 1},
+        "direction": "NORTH",
+        "obstacle_detected": False,
+    }
+    row = history_values("default", "F", result)
+    await asyncio.sleep(0.1)
+    queued_at = datetime.utcnow()
+    await writer.enqueue([row])
+    await writer.flush()
+
+    executed_at = await async_db_session.scalar(select(CommandHistory.executed_at))
+    assert executed_at == row["executed_at"] < queued_at
+
+
+@pytest.mark.asyncio
+async def test_enqueue_waits_when_queue_is_full(writer):
+    release = asyncio.Event()
+    original_write = writer._write
+
+    async def slow_write(batch):
+        await release.wait()
+        await original_write(batch)
+
+    writer._write = slow_write
+
+    # One batch of three is held by the writer, then four fill the queue
+    await writer.enqueue([history_row(str(i)) for i in range(7)])
+    assert writer.stats()["queue_depth"] == 4
+
+    blocked = asyncio.create_task(writer.enqueue([history_row("late")]))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+
+    release.set()
+    await asyncio.wait_for(blocked, 1)
+    await writer.flush()
+    assert writer.stats()["rows_written"] == 8
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_dropped_after_retries(writer, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+
+    class FailingSession:
+        async def __aenter__(self):
+            raise RuntimeError("database unavailable")
+
+        async def __aexit__(self, *args):
+            return False
+
+    writer.session_factory = FailingSession
+    await writer.enqueue([history_row("F"), history_row("B")])
+    await writer.flush()
+
+    stats = writer.stats()
+    assert stats["failed_flushes"] == writer.max_retries
+    assert stats["dropped_rows"] == 2
+    assert stats["rows_written"] == 0
+    assert metrics.history_dropped_rows.value() == 2
+
+
+_real_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay):
+    await _real_sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_commands_write_history_behind(client, writer, async_db_session):
+    app.dependency_overrides[get_history_writer] = lambda: writer
+    try:
+        response = await client.post("/api/v1/commands", json={"command": "FF"})
+        assert response.status_code == 200
+        # Test sessions share one connection, so keep the writer's flush from
+        # overlapping the next request's transaction
+        await writer.flush()
+        response = await client.post(
+            "/api/v1/commands/batch", json={"commands": ["R", "F"]}
+        )
+        assert response.status_code == 200
+    finally:
+        del app.dependency_overrides[get_history_writer]
+
+    # The robot state is committed before the response
+    robot_state = await async_db_session.scalar(select(RobotState))
+    assert (robot_state.position_x, robot_state.position_y) == (1, 2)
+
+    await writer.flush()
+    history = await async_db_session.scalars(
+        select(CommandHistory.command).order_by(CommandHistory.id)
+    )
+    assert history.all() == ["FF", "R", "F"]
+
+    lines = (await client.get("/metrics")).text.splitlines()
+    assert "robot_history_queue_depth 0" in lines
+    assert "robot_history_flush_seconds_count 2" in lines
+
+
+@pytest.mark.asyncio
+async def test_actor_writes_history_behind(
+    async_session_factory, writer, async_db_session
+):
+    actors = RobotActorRegistry(async_session_factory, history_writer=writer)
+    try:
+        await asyncio.gather(
+            actors.submit("default", "F"), actors.submit("default", "RF")
+        )
+    finally:
+        await actors.shutdown()
+
+    await writer.flush()
+    history = await async_db_session.scalars(
+        select(CommandHistory.command).order_by(CommandHistory.id)
+    )
+    assert history.all() == ["F", "RF"]
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from src.models.database import IdempotencyRecord
+from src.services.idempotency import (
+    IdempotencyKeyMismatchError,
+    IdempotencyStore,
+    IdempotentRequest,
+    request_fingerprint,
+)
+
+REQUEST = IdempotentRequest("key-1", request_fingerprint("commands", "default", "F"))
+
+
+def executor(store, db, body=None, delay=0.0):
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        result = body or {"position": {"x": 0, "y": 1}}
+        store.stage(db, REQUEST, result)
+        await db.commit()
+        return result
+
+    return execute, calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_execute_once(async_db_session):
+    store = IdempotencyStore()
+    execute, calls = executor(store, async_db_session, delay=0.01)
+
+    results = await asyncio.gather(
+        *(store.execute_once(async_db_session, REQUEST, execute) for _ in range(5))
+    )
+    assert len(calls) == 1
+    assert [replayed for _, replayed in results] == [False, True, True, True, True]
+    assert store.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_waiters_retry_after_a_failure(async_db_session):
+    store = IdempotencyStore()
+    attempts = []
+
+    async def fail_then_succeed():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("dropped")
+        return {"ok": True}
+
+    first, second = await asyncio.gather(
+        store.execute_once(async_db_session, REQUEST, fail_then_succeed),
+        store.execute_once(async_db_session, REQUEST, fail_then_succeed),
+        return_exceptions=True,
+    )
+    assert isinstance(first, RuntimeError)
+    assert second == ({"ok": True}, False)
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_is_bounded(async_db_session):
+    store = IdempotencyStore(max_entries=2)
+    for i in range(3):
+        request = IdempotentRequest(f"key-{i}", "fingerprint")
+
+        async def execute(request=request):
+            store.stage(async_db_session, request, {"i": request.key})
+            await async_db_session.commit()
+            return {"i": request.key}
+
+        await store.execute_once(async_db_session, request, execute)
+    assert store.stats()["size"] == 2
+
+    # The evicted key is answered from the database
+    async def never():
+        raise AssertionError("executed twice")
+
+    body, replayed = await store.execute_once(
+        async_db_session, IdempotentRequest("key-0", "fingerprint"), never
+    )
+    assert (body, replayed) == ({"i": "key-0"}, True)
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_execute_again(async_db_session):
+    store = IdempotencyStore(ttl=60)
+    execute, calls = executor(store, async_db_session)
+    await store.execute_once(async_db_session, REQUEST, execute)
+
+    store.clear()
+    await async_db_session.execute(
+        update(IdempotencyRecord).values(
+            expires_at=datetime.utcnow() - timedelta(seconds=1)
+        )
+    )
+    await async_db_session.commit()
+
+    _, replayed = await store.execute_once(async_db_session, REQUEST, execute)
+    assert not replayed
+    assert len(calls) == 2
+    rows = (await async_db_session.execute(select(IdempotencyRecord))).scalars()
+    assert len(rows.all()) == 1
+
+
+@pytest.mark.asyncio
+async def test_losing_a_race_replays_the_winner(async_db_session):
+    store = IdempotencyStore()
+    winner, _ = executor(store, async_db_session, body={"winner": True})
+    await winner()
+
+    # Another process committed first; this one fails on the unique key
+    loser, _ = executor(store, async_db_session, body={"winner": False})
+    body, replayed = await store.execute_once(async_db_session, REQUEST, loser)
+    assert (body, replayed) == ({"winner": True}, True)
+
+
+@pytest.mark.asyncio
+async def test_key_reuse_with_another_fingerprint(async_db_session):
+    store = IdempotencyStore()
+    execute, _ = executor(store, async_db_session)
+    await store.execute_once(async_db_session, REQUEST, execute)
+
+    other = IdempotentRequest(REQUEST.key, request_fingerprint("commands", "B"))
+    with pytest.raises(IdempotencyKeyMismatchError):
+        await store.execute_once(async_db_session, other, execute)
+    store.clear()
+    with pytest.raises(IdempotencyKeyMismatchError):
+        await store.execute_once(async_db_session, other, execute)
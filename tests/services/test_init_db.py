@@ -0,0 +1,140 @@
+import pytest
+from sqlalchemy import event, func, insert, inspect, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.models.database import (
+    SCHEMA_VERSION,
+    CommandHistory,
+    Obstacle,
+    RobotState,
+    SchemaVersion,
+)
+from src.services.init_db import (
+    SchemaVersionError,
+    create_schema,
+    get_schema_version,
+    init_db,
+    seed_obstacles,
+)
+from src.settings import settings
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'init.db'}")
+    yield engine
+    await engine.dispose()
+
+
+def record_statements(engine):
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_startup_creates_schema_once(engine):
+    assert await get_schema_version(engine) is None
+    await init_db(engine)
+    assert await get_schema_version(engine) == SCHEMA_VERSION
+
+    # Later startups run one query and leave the database alone
+    statements = record_statements(engine)
+    await init_db(engine)
+    assert len(statements) == 1
+    assert "schema_version" in statements[0]
+
+    # Startup no longer seeds obstacles
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(func.count(Obstacle.id)))).scalar() == 0
+
+
+# Tables as created before robot_id, version, the history indexes, trajectories
+# and uploads were added
+UNVERSIONED_TABLES = (
+    "CREATE TABLE robot_state (id INTEGER PRIMARY KEY, position_x INTEGER, "
+    + "position_y INTEGER, direction VARCHAR(10), created_at DATETIME, "
+    + "updated_at DATETIME)",
+    "CREATE TABLE command_history (id INTEGER PRIMARY KEY, command TEXT NOT NULL, "
+    + "position_x INTEGER, position_y INTEGER, direction VARCHAR(10), "
+    + "obstacle_detected BOOLEAN, executed_at DATETIME)",
+    "CREATE TABLE obstacles (id INTEGER PRIMARY KEY, position_x INTEGER NOT NULL, "
+    + "position_y INTEGER NOT NULL, created_at DATETIME, "
+    + "CONSTRAINT uq_obstacle_position UNIQUE (position_x, position_y))",
+    "INSERT INTO robot_state VALUES (1, 3, 4, 'EAST', '2024-01-01', '2024-01-01')",
+    "INSERT INTO command_history VALUES "
+    + "(1, 'FFR', 3, 4, 'EAST', 0, '2024-01-01 00:00:00')",
+)
+
+
+@pytest.mark.asyncio
+async def test_startup_refuses_unversioned_database_with_tables(engine):
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("CREATE TABLE obstacles (id INTEGER PRIMARY KEY, position_x INT)")
+        )
+    with pytest.raises(SchemaVersionError, match="no recorded schema version"):
+        await init_db(engine)
+    assert await get_schema_version(engine) is None
+
+
+@pytest.mark.asyncio
+async def test_create_upgrades_unversioned_tables(engine):
+    async with engine.begin() as conn:
+        for statement in UNVERSIONED_TABLES:
+            await conn.execute(text(statement))
+    with pytest.raises(SchemaVersionError, match="init_db create"):
+        await init_db(engine)
+
+    await create_schema(engine)
+    await init_db(engine)
+    assert await get_schema_version(engine) == SCHEMA_VERSION
+
+    async with engine.begin() as conn:
+        robot = (await conn.execute(select(RobotState))).one()
+        assert (robot.robot_id, robot.version, robot.position_x) == ("default", 1, 3)
+        history = (await conn.execute(select(CommandHistory))).one()
+        assert (history.robot_id, history.command) == ("default", "FFR")
+        # Uploads store no command text
+        await conn.execute(
+            insert(CommandHistory).values(command=None, command_sha256="0" * 64)
+        )
+        indexes = await conn.run_sync(
+            lambda sync_conn: {
+                index["name"]
+                for table in ("robot_state", "command_history")
+                for index in inspect(sync_conn).get_indexes(table)
+            }
+        )
+    assert {
+        "ix_robot_state_robot_id",
+        "ix_command_history_robot_executed",
+        "ix_command_history_robot_obstacle_executed",
+    } <= indexes
+
+
+@pytest.mark.asyncio
+async def test_startup_refuses_other_schema_versions(engine, monkeypatch):
+    monkeypatch.setattr(settings, "DB_CREATE_SCHEMA", False)
+    with pytest.raises(SchemaVersionError, match="not recorded"):
+        await init_db(engine)
+
+    monkeypatch.setattr(settings, "DB_CREATE_SCHEMA", True)
+    await init_db(engine)
+    async with engine.begin() as conn:
+        await conn.execute(insert(SchemaVersion).values(version=SCHEMA_VERSION + 1))
+    with pytest.raises(SchemaVersionError, match="expected"):
+        await init_db(engine)
+
+
+@pytest.mark.asyncio
+async def test_seed_obstacles_only_fills_an_empty_table(engine):
+    await init_db(engine)
+    assert await seed_obstacles(engine) == 3
+    assert await seed_obstacles(engine) == 0
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(func.count(Obstacle.id)))).scalar() == 3
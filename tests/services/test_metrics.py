@@ -0,0 +1,72 @@
+import pytest
+
+from src.models.robot import Direction
+from src.services import metrics
+from src.services.command_processor import CommandProcessor
+from src.services.metrics import MetricsRegistry
+from tests.factories import ObstacleFactory
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "request_seconds", "Request time", buckets=(0.1, 1), labelnames=("route",)
+    )
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, ("/a",))
+    histogram.observe(0.2, ('say "hi"',))
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == [
+        "# HELP request_seconds Request time",
+        "# TYPE request_seconds histogram",
+    ]
+    assert lines[2:7] == [
+        'request_seconds_bucket{route="/a",le="0.1"} 2',
+        'request_seconds_bucket{route="/a",le="1"} 3',
+        'request_seconds_bucket{route="/a",le="+Inf"} 4',
+        'request_seconds_sum{route="/a"} 3.65',
+        'request_seconds_count{route="/a"} 4',
+    ]
+    assert 'request_seconds_count{route="say \\"hi\\""} 1' in lines
+
+
+def test_counter_and_registry():
+    registry = MetricsRegistry()
+    counter = registry.counter("hits_total", "Hits")
+    counter.inc()
+    counter.inc(2)
+    assert registry.render().splitlines()[-1] == "hits_total 3"
+
+    registry.reset()
+    assert counter.value() == 0
+    with pytest.raises(ValueError):
+        registry.counter("hits_total", "Hits again")
+
+
+def test_gauge_keeps_the_last_value():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("queue_depth", "Queued rows")
+    gauge.set(5)
+    gauge.set(2)
+    assert registry.render().splitlines() == [
+        "# HELP queue_depth Queued rows",
+        "# TYPE queue_depth gauge",
+        "queue_depth 2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_processor_records_hot_path_metrics(async_db_session):
+    async_db_session.add(ObstacleFactory(position_x=0, position_y=2))
+    await async_db_session.commit()
+    processor = CommandProcessor(async_db_session)
+
+    await processor.process_commands("FF", (0, 0), Direction.NORTH)
+    await processor.process_command_batch(["RF", "LLLF"], (0, 0), Direction.NORTH)
+
+    assert metrics.obstacle_query_duration.count() == 2
+    assert metrics.obstacle_load_duration.count() == 2
+    assert metrics.execution_duration.count(("stepwise", "inline")) == 3
+    assert metrics.command_length.count() == 3
+    assert metrics.obstacle_hits.value() == 1
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import delete, insert
+
+from src.models.database import Obstacle
+from src.models.robot import Direction, Position
+from src.services.command_processor import CommandProcessor
+from src.services.obstacle_cache import (
+    ObstacleCache,
+    bump_obstacle_version,
+    get_obstacle_version,
+)
+from tests.factories import ObstacleFactory
+
+
+async def add_obstacle(session, x, y):
+    session.add(ObstacleFactory(position_x=x, position_y=y))
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_orm_changes_bump_obstacle_version(async_db_session):
+    assert await get_obstacle_version(async_db_session) == 0
+
+    await add_obstacle(async_db_session, 1, 4)
+    assert await get_obstacle_version(async_db_session) == 1
+
+    await add_obstacle(async_db_session, 3, 5)
+    assert await get_obstacle_version(async_db_session) == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_until_obstacles_change(async_db_session):
+    await add_obstacle(async_db_session, 0, 2)
+    cache = ObstacleCache()
+    processor = CommandProcessor(async_db_session, obstacle_cache=cache)
+
+    first = await processor.load_obstacles()
+    second = await processor.load_obstacles()
+    assert first is second
+    assert first == {Position(0, 2)}
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 1,
+        "rebuilds": 1,
+        "version": 1,
+        "size": 1,
+    }
+
+    await add_obstacle(async_db_session, 0, 1)
+    result = await processor.process_commands("FF", (0, 0), Direction.NORTH)
+    assert result["position"] == {"x": 0, "y": 0}
+    assert result["obstacle_detected"] is True
+    assert cache.rebuilds == 2
+    assert cache.version == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_writes_must_bump_version(async_db_session):
+    cache = ObstacleCache()
+    processor = CommandProcessor(async_db_session, obstacle_cache=cache)
+    assert await processor.load_obstacles() == set()
+
+    await async_db_session.execute(insert(Obstacle).values(position_x=5, position_y=5))
+    await bump_obstacle_version(async_db_session)
+    await async_db_session.commit()
+
+    assert await processor.load_obstacles() == {Position(5, 5)}
+    assert cache.rebuilds == 2
+
+
+@pytest.mark.asyncio
+async def test_bounded_staleness_skips_version_check(async_db_session):
+    cache = ObstacleCache(max_staleness=60)
+    processor = CommandProcessor(async_db_session, obstacle_cache=cache)
+    assert await processor.load_obstacles() == set()
+
+    # A change made elsewhere is not seen inside the staleness window
+    await async_db_session.execute(delete(Obstacle))
+    await async_db_session.execute(insert(Obstacle).values(position_x=1, position_y=1))
+    await bump_obstacle_version(async_db_session)
+    await async_db_session.commit()
+    assert await processor.load_obstacles() == set()
+    assert cache.hits == 1
+
+    cache.invalidate()
+    assert await processor.load_obstacles() == {Position(1, 1)}
+    assert cache.rebuilds == 2
+
+
+@pytest.mark.asyncio
+async def test_commands_endpoint_sees_new_obstacles(client, async_db_session):
+    response = await client.post("/api/v1/commands", json={"command": "F"})
+    assert response.json()["obstacle_detected"] is False
+
+    await add_obstacle(async_db_session, 0, 2)
+    response = await client.post("/api/v1/commands", json={"command": "F"})
+    data = response.json()
+    assert data["position"] == {"x": 0, "y": 1}
+    assert data["obstacle_detected"] is True
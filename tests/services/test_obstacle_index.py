@@ -0,0 +1,129 @@
+import random
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.models.robot import DIRECTION_VECTORS, Direction, Position
+from src.services.command_processor import CommandProcessor
+from src.services.obstacle_index import ObstacleIndex
+from src.services.robot_service import SegmentCommandExecutor
+from tests.factories import ObstacleFactory
+
+
+def brute_force_first_obstacle(obstacles, origin, direction, max_distance):
+    dx, dy = DIRECTION_VECTORS[direction]
+    for step in range(1, max_distance + 1):
+        position = Position(origin[0] + dx * step, origin[1] + dy * step)
+        if position in obstacles:
+            return position
+    return None
+
+
+def test_index_behaves_like_a_set():
+    index = ObstacleIndex([(1, 4), (3, 5), (7, 4), (1, 4)])
+    assert len(index) == 3
+    assert Position(1, 4) in index
+    assert (3, 5) in index
+    assert Position(0, 0) not in index
+    assert index == {(1, 4), (3, 5), (7, 4)}
+
+
+def test_from_obstacles():
+    obstacles = ObstacleFactory.create_batch_unique_positions(20)
+    index = ObstacleIndex.from_obstacles(obstacles)
+    assert index == {(o.position_x, o.position_y) for o in obstacles}
+
+
+@pytest.mark.parametrize(
+    "direction,expected",
+    [
+        (Direction.NORTH, Position(0, 3)),
+        (Direction.SOUTH, Position(0, -2)),
+        (Direction.EAST, Position(5, 0)),
+        (Direction.WEST, Position(-1, 0)),
+    ],
+)
+def test_first_obstacle_in_each_direction(direction, expected):
+    index = ObstacleIndex([(0, 3), (0, 7), (0, -2), (5, 0), (-1, 0), (-4, 0)])
+    assert index.first_obstacle((0, 0), direction) == expected
+
+
+def test_first_obstacle_respects_max_distance_and_origin():
+    index = ObstacleIndex([(0, 0), (0, 3)])
+    assert index.first_obstacle((0, 0), Direction.NORTH, 2) is None
+    assert index.first_obstacle((0, 0), Direction.NORTH, 3) == Position(0, 3)
+    assert index.first_obstacle((0, 0), Direction.SOUTH) is None
+    assert index.first_obstacle((1, 1), Direction.EAST) is None
+
+
+def test_incremental_insert_and_delete():
+    index = ObstacleIndex()
+    assert index.add(0, 5) is True
+    assert index.add(0, 5) is False
+    assert index.add(0, 2) is True
+    assert index.first_obstacle((0, 0), Direction.NORTH) == Position(0, 2)
+
+    assert index.discard(0, 2) is True
+    assert index.discard(0, 2) is False
+    assert index.first_obstacle((0, 0), Direction.NORTH) == Position(0, 5)
+
+    index.discard(0, 5)
+    assert len(index) == 0
+    assert index.first_obstacle((0, 0), Direction.NORTH) is None
+
+
+def test_random_ray_queries_match_brute_force():
+    rng = random.Random(42)
+    index = ObstacleIndex()
+    reference = set()
+
+    for _ in range(2000):
+        x, y = rng.randint(-15, 15), rng.randint(-15, 15)
+        if rng.random() < 0.6:
+            assert index.add(x, y) == (Position(x, y) not in reference)
+            reference.add(Position(x, y))
+        else:
+            assert index.discard(x, y) == (Position(x, y) in reference)
+            reference.discard(Position(x, y))
+
+        origin = (rng.randint(-15, 15), rng.randint(-15, 15))
+        direction = rng.choice(list(Direction))
+        distance = rng.randint(0, 30)
+        assert index.first_obstacle(
+            origin, direction, distance
+        ) == brute_force_first_obstacle(reference, origin, direction, distance)
+
+    assert index == reference
+
+
+@pytest.mark.parametrize("count", [0, 3, 40, 400])
+def test_any_within_matches_brute_force(count):
+    rng = random.Random(count)
+    obstacles = {
+        Position(rng.randint(-20, 20), rng.randint(-20, 20)) for _ in range(count)
+    }
+    index = ObstacleIndex(obstacles)
+
+    for _ in range(300):
+        min_x, min_y = rng.randint(-25, 25), rng.randint(-25, 25)
+        max_x, max_y = min_x + rng.randint(0, 30), min_y + rng.randint(0, 8)
+        if rng.random() < 0.5:
+            min_x, min_y, max_x, max_y = min_y, min_x, max_y, max_x
+        expected = any(
+            min_x <= x <= max_x and min_y <= y <= max_y for x, y in obstacles
+        )
+        assert index.any_within(min_x, min_y, max_x, max_y) == expected
+
+
+@pytest.mark.asyncio
+async def test_segment_executor_gets_an_obstacle_index():
+    processor = CommandProcessor(AsyncMock())
+    with patch.object(
+        processor, "get_obstacles", new_callable=AsyncMock
+    ) as mock_get_obstacles:
+        mock_get_obstacles.return_value = {Position(1, 4), Position(3, 5)}
+
+        index = await processor.load_executor_obstacles(SegmentCommandExecutor())
+
+    assert isinstance(index, ObstacleIndex)
+    assert index.first_obstacle((1, 0), Direction.NORTH) == Position(1, 4)
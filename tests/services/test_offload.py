@@ -0,0 +1,204 @@
+import random
+
+import pytest
+
+from src.models.robot import Direction, Position
+from src.services import metrics
+from src.services.command_processor import CommandProcessor
+from src.services.obstacle_cache import ObstacleCache
+from src.services.offload import (
+    ExecutionOffloader,
+    decode_obstacles,
+    encode_obstacles,
+)
+from src.services.robot_service import get_command_executor
+from src.services.trajectory import TrajectoryRecorder
+from tests.factories import ObstacleFactory
+
+
+@pytest.fixture
+def offloader():
+    # Obstacle versions restart with every test database, so each test gets
+    # workers of its own
+    offloader = ExecutionOffloader(workers=1, min_length=50)
+    try:
+        yield offloader
+    finally:
+        offloader.shutdown()
+
+
+async def add_obstacles(session, positions):
+    for x, y in positions:
+        session.add(ObstacleFactory(position_x=x, position_y=y))
+    await session.commit()
+
+
+def random_commands(rng, length):
+    return "".join(rng.choice("FFFBLR") for _ in range(length))
+
+
+def test_obstacle_snapshot_round_trips():
+    obstacles = {Position(0, 0), Position(-5, 3), Position(2**31 - 1, -(2**31))}
+    snapshot = encode_obstacles(obstacles)
+
+    assert len(snapshot) == 8 * len(obstacles)
+    assert decode_obstacles(snapshot) == obstacles
+    assert decode_obstacles(encode_obstacles(set())) == set()
+
+
+def test_should_offload_only_long_commands():
+    assert ExecutionOffloader(workers=1, min_length=50).should_offload(50)
+    assert not ExecutionOffloader(workers=1, min_length=50).should_offload(49)
+    assert not ExecutionOffloader(workers=0, min_length=50).should_offload(50)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", ["stepwise", "segment", "compiled"])
+async def test_offloaded_results_match_inline(async_db_session, offloader, executor):
+    rng = random.Random(7)
+    await add_obstacles(
+        async_db_session,
+        {(rng.randint(-8, 8), rng.randint(-8, 8)) for _ in range(20)} - {(0, 0)},
+    )
+    cache = ObstacleCache()
+    inline = CommandProcessor(async_db_session, get_command_executor(executor), cache)
+    offloading = CommandProcessor(
+        async_db_session, get_command_executor(executor), cache, offloader
+    )
+
+    for _ in range(5):
+        commands = random_commands(rng, 120)
+        expected_recorder, recorder = TrajectoryRecorder(), TrajectoryRecorder()
+        expected = await inline.process_commands(
+            commands, (0, 0), Direction.NORTH, expected_recorder
+        )
+        result = await offloading.process_commands(
+            commands, (0, 0), Direction.NORTH, recorder
+        )
+        assert result == expected
+        assert recorder.encode() == expected_recorder.encode()
+
+    batch = [random_commands(rng, 30) for _ in range(4)]
+    expected_recorders = [TrajectoryRecorder() for _ in batch]
+    recorders = [TrajectoryRecorder() for _ in batch]
+    expected = await inline.process_command_batch(
+        batch, (1, 1), Direction.EAST, expected_recorders
+    )
+    assert (
+        await offloading.process_command_batch(batch, (1, 1), Direction.EAST, recorders)
+        == expected
+    )
+    assert [r.encode() for r in recorders] == [r.encode() for r in expected_recorders]
+
+    # Every task ran on one version, so the obstacles were sent once
+    assert offloader.offloaded == 6
+    assert offloader.snapshots_sent == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_offloads_long_chunks(async_db_session, offloader):
+    await add_obstacles(async_db_session, [(3, 100)])
+    cache = ObstacleCache()
+    inline = CommandProcessor(async_db_session, obstacle_cache=cache)
+    offloading = CommandProcessor(
+        async_db_session, obstacle_cache=cache, offloader=offloader
+    )
+    chunks = ["F" * 60, "RFFFL", "F" * 60, "F" * 60]
+
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    expected = await inline.process_command_stream(stream(), (0, 0), Direction.NORTH)
+    result = await offloading.process_command_stream(stream(), (0, 0), Direction.NORTH)
+
+    assert result == expected
+    assert result["obstacle_detected"] is True
+    assert result["position"] == {"x": 3, "y": 99}
+    # The short chunk ran inline and the stream stopped at the obstacle
+    assert offloader.offloaded == 2
+
+
+@pytest.mark.asyncio
+async def test_offloaded_obstacle_after_inline_chunks_counts_once(
+    async_db_session, offloader
+):
+    await add_obstacles(async_db_session, [(0, 30)])
+    processor = CommandProcessor(
+        async_db_session, obstacle_cache=ObstacleCache(), offloader=offloader
+    )
+
+    async def stream():
+        for chunk in ["FFFFF", "F" * 60]:
+            yield chunk
+
+    result = await processor.process_command_stream(stream(), (0, 0), Direction.NORTH)
+    assert result["position"] == {"x": 0, "y": 29}
+    assert offloader.offloaded == 1
+    assert metrics.obstacle_hits.value() == 1
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_sent_again_for_a_new_version(async_db_session, offloader):
+    cache = ObstacleCache()
+    processor = CommandProcessor(
+        async_db_session, obstacle_cache=cache, offloader=offloader
+    )
+    commands = "F" * 100
+
+    result = await processor.process_commands(commands, (0, 0), Direction.NORTH)
+    assert result["position"] == {"x": 0, "y": 100}
+    await processor.process_commands(commands, (0, 0), Direction.NORTH)
+    assert offloader.snapshots_sent == 1
+
+    await add_obstacles(async_db_session, [(0, 10)])
+    result = await processor.process_commands(commands, (0, 0), Direction.NORTH)
+    assert result["position"] == {"x": 0, "y": 9}
+    assert result["obstacle_detected"] is True
+    assert offloader.snapshots_sent == 2
+
+
+@pytest.mark.asyncio
+async def test_offloaded_execution_is_measured(async_db_session, offloader):
+    processor = CommandProcessor(
+        async_db_session, obstacle_cache=ObstacleCache(), offloader=offloader
+    )
+    await processor.process_commands("F" * 100, (0, 0), Direction.NORTH)
+    await processor.process_commands("F" * 10, (0, 0), Direction.NORTH)
+
+    assert metrics.execution_duration.count(("stepwise", "process")) == 1
+    assert metrics.execution_duration.count(("stepwise", "inline")) == 1
+    assert metrics.offload_queue_duration.count() == 1
+    assert offloader.stats() == {
+        "workers": 1,
+        "min_length": 50,
+        "offloaded": 1,
+        "snapshots_sent": 1,
+        "pending": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_workers_start_before_the_first_task(offloader):
+    await offloader.start()
+    (worker,) = offloader._workers
+    assert worker.pool._processes
+    assert offloader.stats()["offloaded"] == 0
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_resent_when_a_worker_lacks_it(offloader):
+    # As if the task carrying the snapshot was cancelled before it ran
+    await offloader.start()
+    offloader._workers[0].version = 3
+
+    results, _ = await offloader.execute(
+        "stepwise", {Position(0, 2)}, 3, (0, 0), Direction.NORTH, ["FFF"]
+    )
+    assert results[0]["position"] == {"x": 0, "y": 1}
+    assert results[0]["obstacle_detected"] is True
+    assert offloader.snapshots_sent == 1
+
+    # The worker keeps the resent snapshot
+    await offloader.execute("stepwise", set(), 3, (0, 0), Direction.NORTH, ["FFF"])
+    assert offloader.snapshots_sent == 1
@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from src.models.robot import Direction, Position, Robot
+from src.services.obstacle_index import ObstacleIndex
+from src.services.path_planner import (
+    NoPathError,
+    PathPlanner,
+    PlanningBudgetError,
+    plan_path,
+)
+
+
+def replay(commands, start, direction, obstacles):
+    """Run commands on a Robot, failing if it enters an obstacle"""
+    robot = Robot(start, direction)
+    for command in commands:
+        robot.process_command(command)
+        assert robot.position not in obstacles
+    return robot
+
+
+def shortest_length(obstacles, start, direction, target, limit=12):
+    """Length of the shortest command string, by breadth-first search on Robot"""
+    frontier = [(Position(*start), direction)]
+    seen = set(frontier)
+    for length in range(limit + 1):
+        if any(position == target for position, _ in frontier):
+            return length
+        following = []
+        for position, heading in frontier:
+            for command in "FBLR":
+                robot = Robot(position, heading)
+                robot.process_command(command)
+                state = (robot.position, robot.direction)
+                if robot.position not in obstacles and state not in seen:
+                    seen.add(state)
+                    following.append(state)
+        frontier = following
+    return None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_plans_are_shortest_and_avoid_obstacles(seed):
+    rng = random.Random(seed)
+    obstacles = {
+        Position(rng.randint(-4, 4), rng.randint(-4, 4)) for _ in range(20)
+    } - {Position(0, 0)}
+    target = Position(rng.randint(-4, 4), rng.randint(-4, 4))
+    direction = rng.choice(list(Direction))
+    expected = shortest_length(obstacles, (0, 0), direction, target)
+    if target in obstacles or expected is None:
+        return
+
+    plan = plan_path(ObstacleIndex(obstacles), (0, 0), direction, target)
+    assert plan.optimal
+    assert len(plan.commands) == expected
+    robot = replay(plan.commands, (0, 0), direction, obstacles)
+    assert robot.position == target
+    assert robot.direction == plan.direction
+
+
+def test_plan_counts_rotations():
+    plan = plan_path(set(), (0, 0), Direction.NORTH, (0, -3))
+    assert plan.commands == "BBB"
+
+    plan = plan_path(set(), (0, 0), Direction.NORTH, (2, 1))
+    assert len(plan.commands) == 4
+    assert plan.rotations == 1
+
+
+def test_unreachable_targets():
+    with pytest.raises(NoPathError):
+        plan_path({Position(1, 1)}, (0, 0), Direction.NORTH, (1, 1))
+
+    # A start walled in on all four sides can only turn
+    walls = {Position(0, 1), Position(0, -1), Position(1, 0), Position(-1, 0)}
+    with pytest.raises(NoPathError):
+        plan_path(walls, (0, 0), Direction.NORTH, (5, 5))
+
+
+def test_budget_and_weighted_fallback():
+    # A target enclosed by a ring is searched for until the budget runs out
+    ring = {Position(x, y) for x in range(8, 13) for y in range(8, 13)} - {
+        Position(10, 10)
+    }
+    with pytest.raises(PlanningBudgetError):
+        plan_path(ring, (0, 0), Direction.NORTH, (10, 10), max_expansions=500)
+
+    rng = random.Random(0)
+    obstacles = ObstacleIndex(
+        (rng.randint(-60, 60), rng.randint(-60, 60)) for _ in range(2000)
+    )
+    obstacles.discard(0, 0)
+    obstacles.discard(50, -40)
+    with pytest.raises(PlanningBudgetError):
+        plan_path(obstacles, (0, 0), Direction.NORTH, (50, -40), max_expansions=50)
+
+    exact = plan_path(obstacles, (0, 0), Direction.NORTH, (50, -40))
+    plan = plan_path(
+        obstacles,
+        (0, 0),
+        Direction.NORTH,
+        (50, -40),
+        max_expansions=exact.expanded - 1,
+        fallback_weight=1.5,
+    )
+    assert not plan.optimal
+    assert len(exact.commands) <= len(plan.commands) <= 1.5 * len(exact.commands)
+    assert replay(plan.commands, (0, 0), Direction.NORTH, obstacles).position == (
+        50,
+        -40,
+    )
+
+
+def test_planner_caches_per_obstacle_version():
+    planner = PathPlanner(max_size=2)
+    obstacles = {Position(0, 2)}
+    plan, cached = planner.plan(obstacles, 1, (0, 0), Direction.NORTH, (0, 4))
+    assert not cached
+    assert planner.plan(obstacles, 1, (0, 0), Direction.NORTH, (0, 4)) == (plan, True)
+
+    # Unreachable targets are remembered too
+    for _ in range(2):
+        with pytest.raises(NoPathError):
+            planner.plan(obstacles, 1, (0, 0), Direction.NORTH, (0, 2))
+    assert planner.stats()["hits"] == 2
+
+    # A new obstacle version drops every plan
+    other, cached = planner.plan(set(), 2, (0, 0), Direction.NORTH, (0, 4))
+    assert not cached
+    assert other.commands == "FFFF"
+    assert planner.stats()["size"] == 1
@@ -0,0 +1,110 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.services.metrics import pool_checkout_duration, pool_checkout_timeouts
+from src.services.pool import (
+    POOL_STATS,
+    PoolStats,
+    ReplicaTimedQueuePool,
+    TimedQueuePool,
+    install_idle_pre_ping,
+    pool_stats,
+    pool_status,
+)
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    pool_stats.reset()
+    yield engine
+    await engine.dispose()
+    pool_stats.reset()
+
+
+def test_pool_stats_window():
+    stats = PoolStats()
+    stats.record(0.002)
+    stats.record(0.004)
+    stats.record(0.5, timed_out=True)
+
+    assert stats.to_dict() == {
+        "checkouts": 2,
+        "timeouts": 1,
+        "wait_avg_seconds": pytest.approx(0.506 / 3),
+        "wait_max_seconds": 0.5,
+    }
+    assert stats.take_window() == (3, pytest.approx(0.506 / 3))
+    assert stats.take_window() == (0, 0.0)
+    assert stats.checkouts == 2
+
+
+@pytest.mark.asyncio
+async def test_checkout_timeouts_are_counted(engine):
+    async with engine.connect():
+        status = pool_status(engine.pool)
+        assert status["checked_out"] == 1
+        assert status["size"] == 1
+        assert status["overflow"] == 0
+        with pytest.raises(PoolTimeoutError):
+            async with engine.connect():
+                pass
+
+    status = pool_status(engine.pool)
+    assert status["checked_out"] == 0
+    assert status["checkouts"] == 1
+    assert status["timeouts"] == 1
+    assert status["wait_max_seconds"] >= 0.05
+    assert pool_checkout_timeouts.value(("primary",)) == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_pre_ping_replaces_dead_connections(engine, monkeypatch):
+    install_idle_pre_ping(engine, idle_seconds=0.0)
+    pings = []
+
+    def failing_ping(dbapi_connection):
+        pings.append(dbapi_connection)
+        if len(pings) == 1:
+            raise OSError("connection reset")
+        return True
+
+    monkeypatch.setattr(engine.sync_engine.dialect, "do_ping", failing_ping)
+
+    # A fresh connection has never been checked in, so it is not pinged
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    assert pings == []
+
+    # The idle connection fails its ping and is swapped for a new one
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT 1"))).scalar() == 1
+    assert len(pings) == 1
+
+
+@pytest.mark.asyncio
+async def test_replica_pool_is_tracked_separately(tmp_path):
+    replica = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}",
+        poolclass=ReplicaTimedQueuePool,
+    )
+    POOL_STATS["replica"].reset()
+    pool_stats.reset()
+    try:
+        async with replica.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        assert pool_status(replica.pool)["checkouts"] == 1
+        assert pool_stats.checkouts == 0
+        assert pool_checkout_duration.count(("replica",)) == 1
+        assert pool_checkout_duration.count(("primary",)) == 0
+    finally:
+        await replica.dispose()
+        POOL_STATS["replica"].reset()
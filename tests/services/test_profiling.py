@@ -0,0 +1,71 @@
+import marshal
+
+from src.models.robot import Direction, Robot
+from src.services.profiling import RequestProfiler, parse_profile_kinds
+from src.services.robot_service import RobotCommandExecutor
+
+
+def run_profiled(profiler, kinds, sampled=False):
+    capture = profiler.start(kinds)
+    assert capture is not None
+    RobotCommandExecutor.execute_commands(Robot((0, 0), Direction.NORTH), "FRFL" * 50)
+    return profiler.finish(capture, "POST", "/api/v1/commands", sampled)
+
+
+def test_parse_profile_kinds():
+    assert parse_profile_kinds("cpu") == ("cpu",)
+    assert parse_profile_kinds("Memory, cpu") == ("cpu", "memory")
+    assert parse_profile_kinds("all") == ("cpu", "memory")
+    assert parse_profile_kinds("disk") == ()
+    assert parse_profile_kinds(None) == ()
+
+
+def test_profiles_are_capped_and_written(tmp_path):
+    profiler = RequestProfiler(enabled=True, max_profiles=2, directory=str(tmp_path))
+    profiles = [run_profiled(profiler, ("cpu", "memory")) for _ in range(3)]
+
+    assert [p.id for p in profiler.profiles()] == [profiles[2].id, profiles[1].id]
+    assert profiler.get(profiles[0].id) is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f"{p.id}{suffix}" for p in profiles[1:] for suffix in (".prof", ".memory.txt")
+    )
+
+    latest = profiles[2]
+    assert "execute_commands" in latest.cpu_report
+    assert latest.peak_memory is not None
+    assert latest.memory_report
+    stats = marshal.loads((tmp_path / f"{latest.id}.prof").read_bytes())
+    assert any(name == "execute_commands" for _, _, name in stats)
+
+    profiler.clear()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sampled_profiles_build_an_aggregate():
+    profiler = RequestProfiler(enabled=True, sample_rate=1.0)
+    assert profiler.choose(()) == (("cpu",), True)
+    assert profiler.choose((), sampleable=False) == ((), False)
+    assert profiler.aggregate_report() is None
+
+    for _ in range(3):
+        run_profiled(profiler, ("cpu",), sampled=True)
+
+    assert profiler.profiles() == []
+    assert profiler.stats()["sampled"] == 3
+    report = profiler.aggregate_report("robot_service")
+    assert "execute_commands" in report
+    assert "process_command" not in report  # Robot.process_command is in robot.py
+
+
+def test_one_profile_at_a_time():
+    profiler = RequestProfiler(enabled=True)
+    capture = profiler.start(("cpu",))
+    assert profiler.start(("cpu",)) is None
+    profiler.finish(capture, "GET", "/", False)
+    assert profiler.stats()["skipped"] == 1
+    assert profiler.start(("cpu",)) is not None
+
+
+def test_disabled_profiler_chooses_nothing():
+    profiler = RequestProfiler(enabled=False, sample_rate=1.0)
+    assert profiler.choose(("cpu",)) == ((), False)
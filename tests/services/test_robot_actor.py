@@ -0,0 +1,189 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, update
+
+from src.main import app
+from src.models.database import CommandHistory, IdempotencyRecord, RobotState
+from src.services.robot_actor import RobotActorRegistry, get_command_actors
+from src.services.robot_state import RobotNotFoundError, provision_robots
+from src.settings import settings
+
+
+@pytest.fixture
+async def actors(async_session_factory):
+    registry = RobotActorRegistry(async_session_factory)
+    yield registry
+    await registry.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_actor_coalesces_queued_commands(actors, async_db_session):
+    commands = ["F", "F", "R", "F", "X", "L", "B"]
+    results = await asyncio.gather(
+        *(actors.submit("default", command) for command in commands)
+    )
+
+    assert [result["position"] for result in results] == [
+        {"x": 0, "y": 1},
+        {"x": 0, "y": 2},
+        {"x": 0, "y": 2},
+        {"x": 1, "y": 2},
+        {"x": 1, "y": 2},
+        {"x": 1, "y": 2},
+        {"x": 1, "y": 1},
+    ]
+    actor = actors.get("default")
+    assert actor.batches == 1
+    assert actor.commands == len(commands)
+
+    history = await async_db_session.scalars(
+        select(CommandHistory.command).order_by(CommandHistory.id)
+    )
+    assert history.all() == commands
+    robot_state = await async_db_session.scalar(select(RobotState))
+    assert (robot_state.position_x, robot_state.position_y) == (1, 1)
+    assert robot_state.version == 1
+
+
+@pytest.mark.asyncio
+async def test_actor_keeps_state_between_batches(actors, async_db_session):
+    await actors.submit("default", "FF")
+    result = await actors.submit("default", "RF")
+
+    assert result["position"] == {"x": 1, "y": 2}
+    assert actors.get("default").batches == 2
+    robot_state = await async_db_session.scalar(select(RobotState))
+    assert robot_state.version == 2
+
+
+@pytest.mark.asyncio
+async def test_actor_reloads_state_after_external_write(actors, async_db_session):
+    await actors.submit("default", "F")
+
+    # Another worker moves the robot and bumps the row version
+    await async_db_session.execute(
+        update(RobotState).values(
+            position_x=5, position_y=5, version=RobotState.version + 1
+        )
+    )
+    await async_db_session.commit()
+
+    result = await actors.submit("default", "F")
+    assert result["position"] == {"x": 5, "y": 6}
+    assert actors.get("default").conflicts == 1
+
+
+@pytest.mark.asyncio
+async def test_actor_for_unknown_robot(actors):
+    with pytest.raises(RobotNotFoundError):
+        await actors.submit("ghost", "F")
+
+
+@pytest.mark.asyncio
+async def test_idle_actor_is_removed(actors, monkeypatch):
+    monkeypatch.setattr(settings, "COMMAND_ACTOR_IDLE_TIMEOUT", 0.01)
+    actor = actors.get("default")
+    await actors.submit("default", "F")
+    await asyncio.sleep(0.05)
+
+    assert actor.closed is True
+    assert actors.stats()["actors"] == 0
+    assert actors.get("default") is not actor
+
+
+@pytest.mark.asyncio
+async def test_commands_endpoint_uses_actors(
+    client, actors, async_db_session, monkeypatch
+):
+    monkeypatch.setattr(settings, "COMMAND_ACTORS_ENABLED", True)
+    app.dependency_overrides[get_command_actors] = lambda: actors
+    await provision_robots(async_db_session, [{"robot_id": "rover-1"}])
+    await async_db_session.commit()
+
+    responses = await asyncio.gather(
+        *(
+            client.post("/api/v1/robots/rover-1/commands", json={"command": "F"})
+            for _ in range(5)
+        )
+    )
+    assert sorted(r.json()["position"]["y"] for r in responses) == [1, 2, 3, 4, 5]
+
+    status = (await client.get("/api/v1/robots/rover-1/status")).json()
+    assert status["position"] == {"x": 0, "y": 5}
+    count = await async_db_session.scalar(select(func.count(CommandHistory.id)))
+    assert count == 5
+
+    response = await client.post("/api/v1/robots/ghost/commands", json={"command": "F"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_keyed_commands_are_saved_with_their_key(
+    client, actors, async_db_session, monkeypatch
+):
+    monkeypatch.setattr(settings, "COMMAND_ACTORS_ENABLED", True)
+    app.dependency_overrides[get_command_actors] = lambda: actors
+    headers = {"Idempotency-Key": "move-1"}
+
+    first = await client.post(
+        "/api/v1/commands", json={"command": "F"}, headers=headers
+    )
+    retry = await client.post(
+        "/api/v1/commands", json={"command": "F"}, headers=headers
+    )
+    assert first.json() == retry.json()
+    assert retry.headers["Idempotency-Replayed"] == "true"
+
+    # The move and its key were committed by the request's own session
+    assert actors.stats()["actors"] == 0
+    status = (await client.get("/api/v1/status")).json()
+    assert status["position"] == {"x": 0, "y": 1}
+    count = await async_db_session.scalar(select(func.count(IdempotencyRecord.id)))
+    assert count == 1
+
+    # Unkeyed requests still go through the actor, which loads the saved state
+    response = await client.post("/api/v1/commands", json={"command": "F"})
+    assert response.json()["position"] == {"x": 0, "y": 2}
+    assert actors.get("default").commands == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_uses_actors(
+    client, actors, async_db_session, monkeypatch
+):
+    monkeypatch.setattr(settings, "COMMAND_ACTORS_ENABLED", True)
+    app.dependency_overrides[get_command_actors] = lambda: actors
+
+    single, batch = await asyncio.gather(
+        client.post("/api/v1/commands", json={"command": "F"}),
+        client.post("/api/v1/commands/batch", json={"commands": ["F", "RF"]}),
+    )
+    # The batch ran back to back, before or after the single command
+    positions = [result["position"] for result in batch.json()["results"]]
+    if single.json()["position"] == {"x": 0, "y": 1}:
+        assert positions == [{"x": 0, "y": 2}, {"x": 1, "y": 2}]
+    else:
+        assert positions == [{"x": 0, "y": 1}, {"x": 1, "y": 1}]
+
+    actor = actors.get("default")
+    assert actor.commands == 3
+    count = await async_db_session.scalar(select(func.count(CommandHistory.id)))
+    assert count == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_writes_fall_back_to_the_version_check(
+    client, actors, async_db_session, monkeypatch
+):
+    monkeypatch.setattr(settings, "COMMAND_ACTORS_ENABLED", True)
+    app.dependency_overrides[get_command_actors] = lambda: actors
+    await client.post("/api/v1/commands", json={"command": "F"})
+
+    # Streams are not queued on the actor, whose copy of the state goes stale
+    response = await client.post("/api/v1/commands/stream", json={"command": "FF"})
+    assert response.status_code == 200
+
+    response = await client.post("/api/v1/commands", json={"command": "F"})
+    assert response.json()["position"] == {"x": 0, "y": 4}
+    assert actors.get("default").conflicts == 1
@@ -0,0 +1,140 @@
+import random
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.models.robot import Direction, Position, Robot
+from src.services.command_processor import CommandProcessor
+from src.services.robot_service import (
+    CompiledCommandExecutor,
+    RobotCommandExecutor,
+    SegmentCommandExecutor,
+    get_command_executor,
+    iter_segments,
+    iter_steps,
+    status_of,
+)
+
+
+def run_both(start, direction, commands, obstacles):
+    stepwise_robot = Robot(start, direction)
+    segment_robot = Robot(start, direction)
+    expected = RobotCommandExecutor.execute_commands(
+        stepwise_robot, commands, obstacles
+    )
+    actual = SegmentCommandExecutor.execute_commands(segment_robot, commands, obstacles)
+    return expected, actual, stepwise_robot, segment_robot
+
+
+@pytest.mark.parametrize(
+    "commands,obstacles",
+    [
+        ("", set()),
+        ("FFFF", set()),
+        ("FFFF", {Position(0, 3)}),
+        ("BBBB", {Position(0, -2)}),
+        ("FFRFFLBB", {Position(2, 2)}),
+        ("FXFYRZF", set()),
+        ("LLLLLF", {Position(-1, 0)}),
+        ("RRRRRRB", {Position(-1, 0)}),
+        ("FLFFFRFLB", {Position(1, 4), Position(3, 5), Position(7, 4)}),
+    ],
+)
+def test_segment_executor_matches_stepwise(commands, obstacles):
+    expected, actual, stepwise_robot, segment_robot = run_both(
+        (0, 0), Direction.NORTH, commands, obstacles
+    )
+    assert actual == expected
+    assert segment_robot.position == stepwise_robot.position
+    assert segment_robot.direction == stepwise_robot.direction
+    assert segment_robot.obstacle_detected == stepwise_robot.obstacle_detected
+
+
+def test_segment_executor_random_differential():
+    rng = random.Random(1969)
+    for _ in range(500):
+        obstacles = {
+            Position(rng.randint(-10, 10), rng.randint(-10, 10))
+            for _ in range(rng.randint(0, 40))
+        }
+        commands = "".join(rng.choice("FFFFBBLRX") for _ in range(rng.randint(0, 200)))
+        start = (rng.randint(-10, 10), rng.randint(-10, 10))
+        direction = rng.choice(list(Direction))
+
+        expected, actual, stepwise_robot, segment_robot = run_both(
+            start, direction, commands, obstacles
+        )
+        assert actual == expected, (start, direction, commands, obstacles)
+        assert segment_robot.position == stepwise_robot.position
+
+
+def test_segment_executor_ignores_obstacle_at_start():
+    robot = Robot((0, 0), Direction.NORTH)
+    result = SegmentCommandExecutor.execute_commands(robot, "FF", {Position(0, 0)})
+    assert result["position"] == {"x": 0, "y": 2}
+    assert result["obstacle_detected"] is False
+
+
+def test_get_command_executor():
+    assert type(get_command_executor("stepwise")) is RobotCommandExecutor
+    assert type(get_command_executor("segment")) is SegmentCommandExecutor
+    assert type(get_command_executor("compiled")) is CompiledCommandExecutor
+
+    with pytest.raises(ValueError):
+        get_command_executor("teleport")
+
+
+@pytest.mark.asyncio
+async def test_command_processor_uses_selected_executor():
+    processor = CommandProcessor(AsyncMock(), executor=SegmentCommandExecutor())
+    processor.get_obstacles = AsyncMock(return_value={Position(0, 5)})
+
+    result = await processor.process_commands("F" * 10, (0, 0), Direction.NORTH)
+    assert isinstance(processor.executor, SegmentCommandExecutor)
+    assert result["position"] == {"x": 0, "y": 4}
+    assert result["obstacle_detected"] is True
+
+
+def test_iter_steps_yields_every_valid_command():
+    robot = Robot((0, 0), Direction.NORTH)
+    points = list(iter_steps(robot, "FXRFF", {Position(3, 1)}))
+
+    assert [(p.offset, p.command, p.position, p.direction) for p in points] == [
+        (0, "F", Position(0, 1), Direction.NORTH),
+        (2, "R", Position(0, 1), Direction.EAST),
+        (3, "F", Position(1, 1), Direction.EAST),
+        (4, "F", Position(2, 1), Direction.EAST),
+    ]
+    assert robot.obstacle_detected is False
+
+
+def test_iter_segments_stops_before_obstacle():
+    robot = Robot((0, 0), Direction.NORTH)
+    points = list(iter_segments(robot, "FFFLLFFFFFR", {Position(0, -2)}))
+
+    assert [(p.offset, p.command, p.length, p.position) for p in points] == [
+        (2, "F", 3, Position(0, 3)),
+        (4, "L", 2, Position(0, 3)),
+        (8, "F", 4, Position(0, -1)),
+    ]
+    assert robot.position == Position(0, -1)
+    assert robot.direction == Direction.SOUTH
+    assert robot.obstacle_detected is True
+
+
+def test_trajectories_end_where_the_executor_ends():
+    rng = random.Random(7)
+    for _ in range(200):
+        obstacles = {
+            Position(rng.randint(-6, 6), rng.randint(-6, 6)) for _ in range(15)
+        }
+        commands = "".join(rng.choice("FFBLRX") for _ in range(60))
+        expected = RobotCommandExecutor.execute_commands(
+            Robot((0, 0), Direction.EAST), commands, obstacles
+        )
+
+        for trace in (iter_steps, iter_segments):
+            robot = Robot((0, 0), Direction.EAST)
+            for _ in trace(robot, commands, obstacles):
+                pass
+            assert status_of(robot) == expected
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from src.models.database import RobotState
+from src.models.robot import Direction, Position
+from src.services.robot_state import RobotNotFoundError, provision_robots
+from src.services.state_cache import RobotStateCache
+
+
+@pytest.mark.asyncio
+async def test_miss_loads_from_database_then_hits(async_db_session):
+    await provision_robots(
+        async_db_session,
+        [{"robot_id": "rover-1", "position_x": 2, "direction": "EAST"}],
+    )
+    await async_db_session.commit()
+    cache = RobotStateCache()
+
+    entry, hit = await cache.get(async_db_session, "rover-1")
+    assert not hit
+    assert (entry.position, entry.direction, entry.version) == (
+        Position(2, 0),
+        Direction.EAST,
+        1,
+    )
+
+    # Later reads do not touch the database
+    await async_db_session.execute(update(RobotState).values(position_x=9))
+    await async_db_session.commit()
+    entry, hit = await cache.get(async_db_session, "rover-1")
+    assert hit
+    assert entry.position == Position(2, 0)
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+@pytest.mark.asyncio
+async def test_default_robot_starts_cold(async_db_session):
+    cache = RobotStateCache()
+    entry, _ = await cache.get(async_db_session, "default")
+    assert (entry.position, entry.direction, entry.version) == (
+        Position(0, 0),
+        Direction.NORTH,
+        0,
+    )
+
+    with pytest.raises(RobotNotFoundError):
+        await cache.get(async_db_session, "ghost")
+    assert cache.stats()["size"] == 1
+
+
+def test_older_versions_do_not_replace_newer_state():
+    cache = RobotStateCache()
+    cache.put("default", Position(0, 2), Direction.NORTH, 3)
+    cache.put("default", Position(0, 1), Direction.NORTH, 2)
+    assert cache.peek("default").position == Position(0, 2)
+
+    cache.put("default", Position(1, 2), Direction.EAST, 4, datetime(2025, 1, 1))
+    entry = cache.peek("default")
+    assert (entry.position, entry.updated_at) == (Position(1, 2), datetime(2025, 1, 1))
+
+
+def test_entries_expire_after_max_age(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.services.state_cache.time.monotonic", lambda: now[0])
+    cache = RobotStateCache(max_age=5.0)
+    cache.put("default", Position(0, 1), Direction.NORTH, 1)
+
+    now[0] += 4.0
+    assert cache.peek("default") is not None
+    now[0] += 2.0
+    assert cache.peek("default") is None
@@ -0,0 +1,98 @@
+import random
+import zlib
+
+import pytest
+
+from src.models.robot import Direction, Position, Robot
+from src.services.robot_service import (
+    CompiledCommandExecutor,
+    RobotCommandExecutor,
+    SegmentCommandExecutor,
+    iter_steps,
+)
+from src.services.trajectory import (
+    InvalidTrajectoryError,
+    TrajectoryRecorder,
+    TrajectoryRun,
+    iter_trajectory,
+    iter_trajectory_cells,
+)
+
+
+def visited_cells(start, direction, commands, obstacles):
+    robot = Robot(start, direction)
+    cells = [Position(*start)]
+    for point in iter_steps(robot, commands, obstacles):
+        if point.position != cells[-1]:
+            cells.append(point.position)
+    return cells
+
+
+def record(executor, start, direction, commands, obstacles):
+    recorder = TrajectoryRecorder()
+    executor.execute_commands(Robot(start, direction), commands, obstacles, recorder)
+    return recorder
+
+
+def test_runs_are_delta_encoded():
+    recorder = record(RobotCommandExecutor, (-3, 2), Direction.NORTH, "FFRFFFLB", set())
+    start, runs = iter_trajectory(recorder.encode())
+
+    assert start == Position(-3, 2)
+    assert list(runs) == [
+        TrajectoryRun(Direction.NORTH, 2, Position(-3, 4)),
+        TrajectoryRun(Direction.EAST, 3, Position(0, 4)),
+        TrajectoryRun(Direction.SOUTH, 1, Position(0, 3)),
+    ]
+    assert recorder.steps == 6
+
+
+@pytest.mark.parametrize(
+    "executor",
+    [RobotCommandExecutor, SegmentCommandExecutor, CompiledCommandExecutor],
+)
+def test_recorded_cells_match_visited_cells(executor):
+    rng = random.Random(11)
+    for _ in range(200):
+        obstacles = {
+            Position(rng.randint(-6, 6), rng.randint(-6, 6)) for _ in range(10)
+        }
+        commands = "".join(rng.choice("FFBLRX") for _ in range(rng.randint(0, 80)))
+        start = (rng.randint(-6, 6), rng.randint(-6, 6))
+        direction = rng.choice(list(Direction))
+
+        recorder = record(executor, start, direction, commands, obstacles)
+        assert list(iter_trajectory_cells(recorder.encode())) == visited_cells(
+            start, direction, commands, obstacles
+        )
+
+
+def test_million_step_path_takes_kilobytes():
+    recorder = TrajectoryRecorder()
+    robot = Robot((0, 0), Direction.NORTH)
+    SegmentCommandExecutor.execute_commands(
+        robot, ("F" * 100 + "R" + "F" * 150 + "R") * 4000, None, recorder
+    )
+    blob = recorder.encode()
+
+    assert recorder.steps == 1_000_000
+    assert len(blob) < 4096
+    assert sum(run.length for run in iter_trajectory(blob)[1]) == 1_000_000
+
+
+def test_single_steps_compress():
+    recorder = TrajectoryRecorder()
+    RobotCommandExecutor.execute_commands(
+        Robot((0, 0), Direction.NORTH), "FB" * 500_000, None, recorder
+    )
+    assert recorder.steps == 1_000_000
+    assert len(recorder.encode()) < 16 * 1024
+
+
+def test_invalid_trajectories_are_rejected():
+    with pytest.raises(InvalidTrajectoryError):
+        iter_trajectory(b"not zlib")
+    with pytest.raises(InvalidTrajectoryError):
+        iter_trajectory(zlib.compress(bytes([99, 0, 0])))
+    with pytest.raises(InvalidTrajectoryError):
+        iter_trajectory(zlib.compress(bytes([1])))